@@ -0,0 +1,2 @@
+from .synthetic import generate_lines, write_dict_file
+from .suite import run_benchmarks, compare_results, save_results, load_results, make_filter, AREAS
@@ -0,0 +1,76 @@
+import argparse
+import json
+import sys
+import tempfile
+from dictmanager import UnfilteredDict
+from .suite import AREAS, compare_results, load_results, run_benchmarks, save_results
+
+# Usage (from the top directory of the repository):
+#   python -m benchmarks run --sizes 10k 1M -o results.json
+#   python -m benchmarks compare baseline.json results.json
+# compare exits with status 1 if there are regressions.
+
+
+def parse_size(s: str) -> int:
+    factors = {"k": 10**3, "m": 10**6}
+    if s[-1].lower() in factors:
+        return int(float(s[:-1]) * factors[s[-1].lower()])
+    return int(s)
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks on synthetic dictionaries")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run the benchmarks and write the results as JSON")
+    run.add_argument("--sizes", nargs="+", type=parse_size, default=[10**4, 10**5], help="numbers of lines of the synthetic dicts, e.g. 10k 1M (default: 10k 100k)")
+    run.add_argument("--repeat", type=int, default=3, help="repetitions per benchmark, the best time is reported")
+    run.add_argument("--areas", nargs="+", choices=AREAS, default=None, help="only run these benchmarks")
+    run.add_argument("--workdir", default=None, help="directory for the synthetic dicts and their cache (default: temporary)")
+    run.add_argument("--workers", type=int, default=0, help="number of worker processes for the State benchmarks")
+    run.add_argument("--no-numpy", action="store_true", help="disable the numpy backend")
+    run.add_argument("--trie", action="store_true", help="evaluate positional filters via the trie")
+    run.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    run.add_argument("--baseline", default=None, help="compare with these results afterwards")
+    run.add_argument("--threshold", type=float, default=1.2)
+    compare = commands.add_parser("compare", help="flag regressions of some results compared to a baseline")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=1.2, help="report benchmarks that got slower by more than this factor (default: 1.2)")
+    compare.add_argument("--min-seconds", type=float, default=1e-3, help="ignore benchmarks faster than this (default: 0.001)")
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        UnfilteredDict.use_numpy = not args.no_numpy
+        UnfilteredDict.use_trie = args.trie
+        log = lambda s: print(s, file=sys.stderr)
+        if args.workdir is None:
+            with tempfile.TemporaryDirectory() as workdir:
+                results = run_benchmarks(args.sizes, workdir, repeat=args.repeat, num_workers=args.workers, areas=args.areas, log=log)
+        else:
+            results = run_benchmarks(args.sizes, args.workdir, repeat=args.repeat, num_workers=args.workers, areas=args.areas, log=log)
+        if args.output is None:
+            print(json.dumps(results, indent=1, sort_keys=True))
+        else:
+            save_results(results, args.output)
+        if args.baseline is None:
+            return 0
+        return report_regressions(load_results(args.baseline), results, threshold=args.threshold)
+    return report_regressions(load_results(args.baseline), load_results(args.current), threshold=args.threshold, min_seconds=args.min_seconds)
+
+
+def report_regressions(baseline: dict, current: dict, *, threshold: float, min_seconds: float = 1e-3) -> int:
+    regressions = compare_results(baseline, current, threshold=threshold, min_seconds=min_seconds)
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    for name in missing:
+        print(f"not run: {name}", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions (threshold {threshold}, {len(current['results'])} benchmarks).", file=sys.stderr)
+        return 0
+    print(f"{len(regressions)} regressions (threshold {threshold}):", file=sys.stderr)
+    for name, old, new in regressions:
+        print(f"    {name}: {old:.4f}s -> {new:.4f}s ({new / old:.2f}x)", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
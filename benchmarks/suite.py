@@ -0,0 +1,232 @@
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Optional
+from dictmanager import DictSpecification, UnfilteredDict
+from dictmanager.cache import CACHE_DIR_ENV
+from dictmanager.npbackend import np
+from filters import Filter, FilterMaker, apply_filters, apply_filters_with_mask_tiers
+from frontends.simplefrontend import FILTERS, NORMALIZERS
+from state import State
+from .synthetic import write_dict_file
+
+# The benchmarks themselves. Each benchmark has a name of the form "<area>/<what>/n=<number of lines>" and its result
+# is the best (i.e. minimal) wall time in seconds over a number of repetitions. Results are stored as JSON, see
+# run_benchmarks and compare_results.
+
+MAX_ERRORS = 3  # fuzzy benchmarks are run for max_errors = 0, ..., MAX_ERRORS
+
+# Input for each filter in FILTERS, as it would be entered by the user (keyed by the description of the FilterMaker).
+# New entries of FILTERS need an entry here, otherwise the benchmarks fail.
+FILTER_INPUTS: dict[str, list] = {
+    "Match length exactly": [8],
+    "Ensure maximal length": [9],
+    "Ensure minimal length": [5],
+    "Ensure that a substring is contained (in any order, with multiplicity)": ["nae"],
+    "A given position is in a set of characters": [2, "aeiou"],
+    "Some characters are equal": [2, 5],
+    "Filter by (partial knowledge of) morse code": ["3 .- * 2"],
+    "Match regular expression": ["[^aeiou]*e.*n"],
+    "Anagram of given letters (fuzzy: letters added or removed)": ["leinsart"],
+    "Match a letter pattern (e.g. ab.bba$ as in cryptograms)": ["abcb.d$"],
+}
+
+# A typical combination of fuzzy filters, used to benchmark apply_filters and State.
+COMBINED_INPUTS: list[tuple[str, list]] = [
+    ("A given position is in a set of characters", [1, "bdfkst"]),
+    ("Some characters are equal", [3, 6]),
+    ("Filter by (partial knowledge of) morse code", ["* 1 .- 3"]),
+]
+
+
+def make_filter(fm: FilterMaker, inputs: list) -> Filter:
+    """
+    runs the protocol of the FilterMaker fm (as SimpleFrontEnd does), answering the prompts with inputs.
+    """
+    gen = fm.create_filter_protocol()
+    x = next(gen)
+    for value in inputs + [StopIteration]:
+        if x is None or isinstance(x, Filter):
+            break
+        x = gen.send(value)
+    if not isinstance(x, Filter):
+        raise ValueError(f"Inputs {inputs} do not create a filter for {fm}")
+    return x
+
+
+def _maker(description: str) -> FilterMaker:
+    for fm in FILTERS:
+        if fm.description == description:
+            return fm
+    raise KeyError(description)
+
+
+def _best_of(fun: Callable[[], object], repeat: int, *, warmup: bool = False) -> float:
+    """
+    minimal wall time of repeat calls of fun. With warmup, fun is called once more beforehand, so that data structures
+    built on first use (such as the indexes of a dict) are not included.
+    """
+    if warmup:
+        fun()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fun()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _fresh_dict(path: str, normalizer: Callable) -> UnfilteredDict:
+    return UnfilteredDict(DictSpecification(path, normalizer=normalizer))
+
+
+def bench_loading(path: str, n: int, results: dict[str, float], *, repeat: int):
+    """
+    UnfilteredDict.reload with every normalizer, with and without the on-disk cache
+    """
+    for normalizer in NORMALIZERS.values():
+        name = normalizer.__name__
+        u = UnfilteredDict(DictSpecification(path, normalizer=normalizer, use_cache=False))
+        results[f"reload/{name}/n={n}"] = _best_of(u.reload, repeat)
+        u = UnfilteredDict(DictSpecification(path, normalizer=normalizer))  # creates the cache file
+        results[f"reload_cached/{name}/n={n}"] = _best_of(u.reload, repeat)
+
+
+def bench_indexes(path: str, n: int, results: dict[str, float]):
+    """
+    building the data structures of a dict on first use (measured once, as they are cached)
+    """
+    u = _fresh_dict(path, NORMALIZERS["Normalize Umlauts et al."])
+    for what in ["charmatrix", "position_index", "anagram_index", "morse_trie", "trie"]:
+        start = time.perf_counter()
+        built = getattr(u, what)
+        if built is not None:
+            results[f"index/{what}/n={n}"] = time.perf_counter() - start
+
+
+def bench_filters(u: UnfilteredDict, n: int, results: dict[str, float], *, repeat: int):
+    """
+    each filter of FILTERS on the whole dict, for all error budgets the filter supports
+    """
+    everything = u.bits_in_length_range()
+    for fm in FILTERS:
+        fil = make_filter(fm, FILTER_INPUTS[fm.description])
+        name = fm.description
+        for max_errors in range(MAX_ERRORS + 1 if fil.allow_errors else 1):
+            results[f"filter/{name}/e={max_errors}/n={n}"] = _best_of(
+                lambda: apply_filters_with_mask_tiers([fil], u, everything, max_errors=max_errors), repeat, warmup=True)
+
+
+def bench_combined(u: UnfilteredDict, n: int, results: dict[str, float], *, repeat: int):
+    """
+    the filters of COMBINED_INPUTS together, both on bitsets (as State does) and on plain lists (apply_filters)
+    """
+    filters = [make_filter(_maker(description), inputs) for description, inputs in COMBINED_INPUTS]
+    everything = u.bits_in_length_range()
+    for max_errors in range(MAX_ERRORS + 1):
+        results[f"combined/mask_tiers/e={max_errors}/n={n}"] = _best_of(
+            lambda: apply_filters_with_mask_tiers(filters, u, everything, max_errors=max_errors), repeat, warmup=True)
+        results[f"combined/apply_filters/e={max_errors}/n={n}"] = _best_of(
+            lambda: apply_filters(filters, u.L, max_errors=max_errors), repeat, warmup=True)
+
+
+def bench_state(path: str, n: int, results: dict[str, float], *, repeat: int, num_workers: int = 0):
+    """
+    the operations of State that the frontend triggers, starting from a fresh State with the filters of
+    COMBINED_INPUTS (in the DefaultGroup, allowing MAX_ERRORS errors).
+    """
+    timings: dict[str, float] = {}
+
+    def timed(what: str, fun: Callable[[], object]):
+        start = time.perf_counter()
+        fun()
+        timings[what] = min(timings.get(what, float("inf")), time.perf_counter() - start)
+
+    for _ in range(repeat):
+        state = State([DictSpecification(path, normalizer=NORMALIZERS["Normalize Umlauts et al."])], error_limit=MAX_ERRORS, do_eval=True, num_workers=num_workers)
+        try:
+            for description, inputs in COMBINED_INPUTS:
+                fil = make_filter(_maker(description), inputs)
+                timed(f"add_filter/{description}", lambda: state.add_filter(fil))
+            timed("compute_filtered_dicts", state.compute_filtered_dicts)
+            timed("count_filtered", lambda: [state.count_filtered(i) for i in range(1, len(state.dict_specs)+1)])
+            timed("filtered_dicts", lambda: list(state.filtered_dicts))
+            timed("toggle_filter/off", lambda: state.toggle_filter(1))
+            timed("toggle_filter/on", lambda: state.toggle_filter(1))
+            timed("set_max_errors/decrease", lambda: state.set_max_errors(1))
+            timed("set_max_errors/increase", lambda: state.set_max_errors(MAX_ERRORS))
+            timed("delete_filter", lambda: state.delete_filter(1))
+        finally:
+            state.set_num_workers(0)
+    for what, seconds in timings.items():
+        results[f"state/{what}/n={n}"] = seconds
+
+
+def run_benchmarks(sizes: list[int], workdir: str, *, repeat: int = 3, num_workers: int = 0, areas: Optional[list[str]] = None, log: Callable[[str], None] = print) -> dict:
+    """
+    runs the benchmarks for synthetic dicts with the given numbers of lines, which are created in workdir (and reused
+    if already present). The on-disk cache also lives in workdir.
+    areas restricts the benchmarks that are run (see AREAS), None means all of them.
+    Returns the results in the format used by compare_results.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.environ[CACHE_DIR_ENV] = os.path.join(workdir, "cache")
+    areas = AREAS if areas is None else areas
+    results: dict[str, float] = {}
+    for n in sizes:
+        path = os.path.join(workdir, f"synthetic-{n}.txt")
+        if not os.path.exists(path):
+            log(f"Creating {path}")
+            write_dict_file(path, n, seed=n)
+        if "loading" in areas:
+            log(f"n={n}: loading")
+            bench_loading(path, n, results, repeat=repeat)
+        if "indexes" in areas:
+            log(f"n={n}: indexes")
+            bench_indexes(path, n, results)
+        if "filters" in areas or "combined" in areas:
+            u = _fresh_dict(path, NORMALIZERS["Normalize Umlauts et al."])
+            if "filters" in areas:
+                log(f"n={n}: filters")
+                bench_filters(u, n, results, repeat=repeat)
+            if "combined" in areas:
+                log(f"n={n}: combined filters")
+                bench_combined(u, n, results, repeat=repeat)
+        if "state" in areas:
+            log(f"n={n}: state")
+            bench_state(path, n, results, repeat=repeat, num_workers=num_workers)
+    meta = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "python": sys.version.split()[0], "platform": platform.platform(),
+            "numpy": np.__version__ if np is not None else None, "use_numpy": UnfilteredDict.use_numpy,
+            "use_trie": UnfilteredDict.use_trie, "num_workers": num_workers, "repeat": repeat, "sizes": sizes}
+    return {"meta": meta, "results": results}
+
+
+AREAS = ["loading", "indexes", "filters", "combined", "state"]
+
+
+def save_results(results: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline: dict, current: dict, *, threshold: float = 1.2, min_seconds: float = 1e-3) -> list[tuple[str, float, float]]:
+    """
+    Returns the regressions of current compared to baseline as a list of (name, baseline seconds, current seconds):
+    benchmarks that got slower by more than the factor threshold. Benchmarks that take less than min_seconds in both
+    runs are ignored, as they are dominated by noise.
+    """
+    regressions = []
+    for name, new in sorted(current["results"].items()):
+        old = baseline["results"].get(name)
+        if old is None or max(old, new) < min_seconds:
+            continue
+        if new > threshold * old:
+            regressions += [(name, old, new)]
+    return regressions
@@ -0,0 +1,65 @@
+import random
+from typing import Iterator
+
+# Synthetic German-like dictionaries for benchmarking:
+# Words are built from syllables with German letter frequencies in mind (including umlauts, ß and the odd accented
+# letter), so that the normalizers, the indexes and the filters see realistic inputs. Compounds, capitalized nouns and
+# street names (with spaces, hyphens, slashes and abbreviations) are mixed in, which also produces some duplicates
+# after normalization, as real dict files do.
+
+_ONSETS = ["", "b", "bl", "br", "ch", "d", "dr", "f", "fl", "fr", "g", "gl", "gr", "h", "j", "k", "kl", "kn", "kr",
+           "l", "m", "n", "p", "pf", "pl", "pr", "qu", "r", "s", "sch", "schl", "schm", "schn", "schr", "schw", "sp",
+           "spr", "st", "str", "t", "tr", "w", "z", "zw"]
+_VOWELS = ["a", "e", "i", "o", "u", "ä", "ö", "ü", "au", "ei", "eu", "ie", "ee", "aa", "oo", "é", "à"]
+_CODAS = ["", "", "", "b", "ch", "ck", "d", "f", "ff", "g", "k", "l", "ll", "m", "mm", "n", "nd", "ng", "nn", "nt",
+          "r", "rn", "rt", "s", "ss", "ß", "st", "t", "tt", "tz", "x", "z"]
+_SUFFIXES = ["", "", "", "en", "er", "ern", "es", "chen", "lein", "ung", "heit", "keit", "lich", "isch", "bar", "los",
+             "schaft", "tum", "in", "innen"]
+_STREET_TYPES = ["straße", "str.", "weg", "platz", "allee", "gasse", "ring", "damm", " Hbf", " Bf", "hof"]
+_STREET_PREFIXES = ["", "", "", "Am ", "An der ", "Alte ", "Neue ", "Hinter dem ", "St.-"]
+
+
+def _syllable(rng: random.Random) -> str:
+    return rng.choice(_ONSETS) + rng.choice(_VOWELS) + rng.choice(_CODAS)
+
+
+def _word(rng: random.Random) -> str:
+    num_syllables = min(1 + int(rng.expovariate(0.8)), 5)
+    ret = "".join(_syllable(rng) for _ in range(num_syllables)) + rng.choice(_SUFFIXES)
+    if rng.random() < 0.4:
+        ret = ret.capitalize()
+    if rng.random() < 0.05:
+        ret += "-" + _word(rng).capitalize()
+    return ret
+
+
+def _street(rng: random.Random) -> str:
+    name = _word(rng).capitalize()
+    if rng.random() < 0.1:
+        name += "/" + _word(rng).capitalize()
+    return rng.choice(_STREET_PREFIXES) + name + rng.choice(_STREET_TYPES)
+
+
+def generate_lines(num_entries: int, *, seed: int = 0, streets: bool = False) -> Iterator[str]:
+    """
+    yields num_entries lines (with newlines) of a synthetic dict file. With streets, the lines look like street and
+    station names (as in dicts/Dortmund.txt), otherwise like the words of a German word list (such as ngerman).
+    The output only depends on the arguments.
+    """
+    rng = random.Random(seed)
+    make = _street if streets else _word
+    for _ in range(num_entries):
+        yield make(rng) + "\n"
+
+
+def write_dict_file(path: str, num_entries: int, *, seed: int = 0, streets: bool = False):
+    """
+    writes a synthetic dict file (see generate_lines) to path
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        lines = generate_lines(num_entries, seed=seed, streets=streets)
+        while True:
+            chunk = [line for _, line in zip(range(65536), lines)]
+            if not chunk:
+                break
+            f.writelines(chunk)
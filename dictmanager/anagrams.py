@@ -0,0 +1,132 @@
+import itertools
+from typing import Iterator, Optional
+from .indexes import letter_histogram
+from .manager import UnfilteredDict
+from .npbackend import np, HISTOGRAM_ALPHABET
+
+# Multi-word anagrams: split a multiset of letters into several entries of the dicts.
+# As for the anagram index (see indexes.py), only the letters a-z count and other characters of entries are ignored.
+# Entries with the same letters are interchangeable, so the search runs over the distinct letter histograms of the
+# entries that fit into the letters at all and only expands them into actual entries for each solution.
+# Histograms are packed into Python ints with one field per letter and a guard bit on top of each field, so checking
+# whether a histogram fits into the remaining letters (and removing it) is a single subtraction.
+
+_LETTERS = frozenset(HISTOGRAM_ALPHABET)
+
+
+def _candidate_entries(u: UnfilteredDict, hist: tuple[int, ...], min_letters: int, max_letters: int) -> list[str]:
+    """
+    the entries of u whose letters are a sub-multiset of hist, with between min_letters and max_letters letters
+    """
+    start, _ = u.length_range(min_letters, None)  # entries are at least as long as their number of letters
+    cm = u.charmatrix
+    if cm is not None:
+        ids = np.arange(start, u.size)
+        for c in range(len(HISTOGRAM_ALPHABET)):
+            if len(ids) == 0:
+                break
+            ids = ids[cm.histogram[ids, c] <= hist[c]]
+        num_letters = cm.histogram[ids].sum(axis=1, dtype=np.int32)
+        ids = ids[(num_letters >= min_letters) & (num_letters <= max_letters)]
+        return [u.L[i] for i in ids.tolist()]
+    present = {c for c, n in zip(HISTOGRAM_ALPHABET, hist) if n > 0}
+    out = []
+    for word in u.L[start:]:
+        if (set(word.lower()) - present) & _LETTERS:
+            continue
+        word_hist = letter_histogram(word)
+        if min_letters <= sum(word_hist) <= max_letters and all(a <= b for a, b in zip(word_hist, hist)):
+            out.append(word)
+    return out
+
+
+def multiword_anagrams(dicts: list[UnfilteredDict], letters: str, num_words: int, *, lengths: Optional[list[int]] = None, limit: Optional[int] = None) -> Iterator[tuple[str, ...]]:
+    """
+    yields all combinations of num_words entries of the (active) dicts that together consist of exactly the letters of
+    letters. lengths optionally prescribes the numbers of letters of the words (in any order).
+    Each combination is yielded once (as a tuple of entries, shorter ones first), as soon as it is found. The same
+    entry may occur several times. Stops after limit combinations.
+    """
+    assert num_words >= 1
+    if lengths is not None:
+        assert len(lengths) == num_words
+        lengths = sorted(lengths)
+    hist = letter_histogram(letters)
+    total = sum(hist)
+    if lengths is not None and sum(lengths) != total:
+        return
+    min_letters = 1 if lengths is None else max(lengths[0], 1)
+    max_letters = total - (num_words - 1) * min_letters if lengths is None else lengths[-1]
+
+    width = max(hist).bit_length() + 1
+    guards = sum(1 << (width * (c+1) - 1) for c in range(len(hist)))
+
+    def pack(h: tuple[int, ...]) -> int:
+        return sum(n << (width * c) for c, n in enumerate(h))
+
+    entries_by_key: dict[int, list[str]] = {}
+    size_of: dict[int, int] = {}
+    letters_of: dict[int, int] = {}  # bitmask of the letters that occur
+    seen = set()
+    for u in dicts:
+        if not u.is_active:
+            continue
+        for word in _candidate_entries(u, hist, min_letters, max_letters):
+            if word in seen:
+                continue
+            seen.add(word)
+            word_hist = letter_histogram(word)
+            key = pack(word_hist)
+            if key not in entries_by_key:
+                entries_by_key[key] = []
+                size_of[key] = sum(word_hist)
+                letters_of[key] = sum(1 << c for c, n in enumerate(word_hist) if n > 0)
+            entries_by_key[key].append(word)
+
+    # Words of a combination are chosen in the order of keys (by size first), which makes each combination unique.
+    keys = sorted(entries_by_key, key=lambda k: (size_of[k], k))
+    position = {k: p for p, k in enumerate(keys)}
+    field_mask = (1 << (width - 1)) - 1
+
+    def letters_in(packed: int) -> int:
+        return sum(1 << c for c in range(len(hist)) if (packed >> (width * c)) & field_mask)
+
+    def search(candidates: list[int], remaining: int, remaining_size: int, chosen: list[int]) -> Iterator[list[int]]:
+        words_left = num_words - len(chosen)
+        wanted = None if lengths is None else lengths[len(chosen)]
+        if words_left == 1:
+            # The last word is determined by the remaining letters.
+            p = position.get(remaining)
+            if p is not None and candidates and p >= candidates[0] and (wanted is None or remaining_size == wanted):
+                yield chosen + [remaining]
+            return
+        # Histogram pruning: only keys that fit into the remaining letters are passed on, and every remaining letter
+        # must still occur in one of them.
+        fitting = []
+        covered = 0
+        for p in candidates:
+            key = keys[p]
+            if ((remaining | guards) - key) & guards == guards:
+                fitting.append(p)
+                covered |= letters_of[key]
+        if letters_in(remaining) & ~covered:
+            return
+        for k, p in enumerate(fitting):
+            key = keys[p]
+            size = size_of[key]
+            if size * words_left > remaining_size:
+                break  # all later words are at least as long
+            if wanted is not None and size != wanted:
+                if size > wanted:
+                    break
+                continue
+            yield from search(fitting[k:], remaining - key, remaining_size - size, chosen + [key])
+
+    found = 0
+    for solution in search(list(range(len(keys))), pack(hist), total, []):
+        groups = [(key, len(list(repeated))) for key, repeated in itertools.groupby(solution)]
+        for combination in itertools.product(*[itertools.combinations_with_replacement(entries_by_key[key], m) for key, m in groups]):
+            yield tuple(word for words in combination for word in words)
+            found += 1
+            if limit is not None and found >= limit:
+                return
@@ -0,0 +1,138 @@
+import hashlib
+import inspect
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Callable, Optional
+from .loader import LoadStatistics
+
+# On-disk cache of normalized dictionaries.
+# A cache file consists of a fixed header followed by the deduplicated, normalized entries (sorted by length first,
+# then alphabetically, as in UnfilteredDict) as a single
+# utf-8 encoded blob, separated by newlines. The header contains a digest of the cache key, so a stale cache file is
+# never used, and the statistics from loading the original file. The file is read via mmap, so loading is essentially one decode and one split.
+
+CACHE_DIR_ENV = "RAETSEL_CACHE_DIR"
+
+_MAGIC = b"RTSLDICT"
+_FORMAT_VERSION = 3
+# magic, format version, key digest, number of entries, length of blob, load statistics (lines, entries, duplicates, rejected)
+_HEADER = struct.Struct("<8sI32sQQQQQQ")
+
+
+def default_cache_dir() -> Path:
+    """
+    directory for the cache files. Can be overridden by the environment variable RAETSEL_CACHE_DIR
+    """
+    d = os.environ.get(CACHE_DIR_ENV)
+    if d:
+        return Path(d)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    if xdg:
+        return Path(xdg) / "raetsel"
+    return Path.home() / ".cache" / "raetsel"
+
+
+def normalizer_identity(normalizer: Callable) -> str:
+    """
+    Returns a string that identifies the normalizer, including a version.
+    Normalizers with an "identity" attribute (see normalizers.TableNormalizer) provide this themselves. Otherwise, the
+    version is taken from a "version" attribute of the normalizer (if any) and a hash of the source file of the
+    module defining it, so editing the normalizers automatically invalidates the cache.
+    """
+    identity = getattr(normalizer, "identity", None)
+    if isinstance(identity, str):
+        return identity
+    name = f"{getattr(normalizer, '__module__', '?')}.{getattr(normalizer, '__qualname__', repr(normalizer))}"
+    version = str(getattr(normalizer, "version", 0))
+    try:
+        source_file = inspect.getsourcefile(normalizer)
+        with open(source_file, "rb") as f:
+            source_hash = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    except (TypeError, OSError):
+        source_hash = "nosource"
+    return f"{name}:{version}:{source_hash}"
+
+
+def file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+
+
+def cache_key(path: str, encoding: Optional[str], normalizer: Callable) -> bytes:
+    """
+    computes the key (as a digest) of the cache entry for the given dict file, encoding and normalizer.
+    Raises OSError if the file does not exist.
+    """
+    st = os.stat(path)
+    key = {"path": os.path.abspath(path),
+           "mtime": st.st_mtime_ns,
+           "size": st.st_size,
+           "hash": file_digest(path),
+           "encoding": encoding,
+           "normalizer": normalizer_identity(normalizer),
+           }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).digest()
+
+
+def cache_file(path: str, encoding: Optional[str], normalizer: Callable, cache_dir: Optional[Path] = None) -> Path:
+    """
+    file name of the cache file. Note that this does not depend on the file contents, so outdated cache files get
+    overwritten rather than accumulating.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    slot = f"{os.path.abspath(path)}|{encoding}|{getattr(normalizer, '__module__', '?')}.{getattr(normalizer, '__qualname__', '?')}"
+    name = hashlib.sha256(slot.encode()).hexdigest()[:24]
+    return cache_dir / f"{name}.dict"
+
+
+def load_cached(target: Path, key: bytes) -> Optional[tuple[list[str], LoadStatistics]]:
+    """
+    Returns the cached list of entries and load statistics from the given cache file, or None if there is no valid
+    cache entry for key.
+    """
+    try:
+        with open(target, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if len(mm) < _HEADER.size:
+                    return None
+                magic, version, digest, num_entries, blob_len, *stats = _HEADER.unpack_from(mm)
+                if magic != _MAGIC or version != _FORMAT_VERSION or digest != key:
+                    return None
+                if len(mm) != _HEADER.size + blob_len:
+                    return None
+                if num_entries == 0:
+                    return [], LoadStatistics(*stats)
+                entries = mm[_HEADER.size:].decode("utf-8").split("\n")
+    except (OSError, ValueError):
+        return None
+    if len(entries) != num_entries:
+        return None
+    return entries, LoadStatistics(*stats)
+
+
+def store_cached(target: Path, key: bytes, entries: list[str], stats: LoadStatistics) -> bool:
+    """
+    Writes the given (normalized, sorted and deduplicated) entries and load statistics to the given cache file.
+    Returns whether this was successful. Failure to write the cache is not an error.
+    """
+    if any("\n" in entry for entry in entries):
+        return False  # cannot be represented in our format
+    blob = "\n".join(entries).encode("utf-8")
+    tmp = target.with_suffix(f".tmp{os.getpid()}")
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, key, len(entries), len(blob), stats.lines, stats.entries, stats.duplicates, stats.rejected))
+            f.write(blob)
+        os.replace(tmp, target)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return False
+    return True
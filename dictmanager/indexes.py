@@ -0,0 +1,554 @@
+import math
+import random
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional, Union
+from utils import bitset, morse
+from .npbackend import np, CharMatrix, HISTOGRAM_ALPHABET
+
+
+class PositionIndex:
+    """
+    Inverted index for a dict (given by its list of entries, sorted by length, and the length offsets, see
+    UnfilteredDict), mapping (position, character) to the bitset (see utils/bitset.py) of the ids of all entries that
+    have that character at that (1-indexed) position.
+    The bitsets for a given position are computed on first use (using the numpy representation, if given).
+    """
+
+    words: list[str]
+    size: int
+    length_offsets: list[int]
+    charmatrix: Optional[CharMatrix]
+    _by_position: dict[int, dict[str, int]]
+
+    def __init__(self, words: list[str], length_offsets: list[int], charmatrix: Optional[CharMatrix] = None):
+        self.words = words
+        self.size = len(words)
+        self.length_offsets = length_offsets
+        self.charmatrix = charmatrix
+        self._by_position = {}
+
+    @property
+    def nbytes(self) -> int:
+        """
+        (approximate) memory used by the bitsets computed so far
+        """
+        return sum(sys.getsizeof(bits) for bitsets in self._by_position.values() for bits in bitsets.values())
+
+    def length_at_least(self, n: int) -> int:
+        """
+        bitset of all entries of length at least n
+        """
+        if n <= 0:
+            return bitset.range_bits(0, self.size)
+        if n >= len(self.length_offsets):
+            return 0
+        return bitset.range_bits(self.length_offsets[n], self.size)
+
+    def length_between(self, min_length: Optional[int], max_length: Optional[int]) -> int:
+        """
+        bitset of all entries with min_length <= length <= max_length, None meaning no restriction.
+        """
+        out = self.length_at_least(0 if min_length is None else min_length)
+        if max_length is not None:
+            out &= ~self.length_at_least(max_length + 1)
+        return out
+
+    def bitsets_at(self, pos: int) -> dict[str, int]:
+        """
+        Returns a dict that maps each character c to the bitset of entries with character c at position pos
+        """
+        assert pos >= 1
+        if pos not in self._by_position and self.charmatrix is not None:
+            start = self.length_offsets[pos] if pos < len(self.length_offsets) else self.size
+            column = self.charmatrix.char_at(np.arange(start, self.size), pos)
+            bitsets = {}
+            for code in np.unique(column).tolist():
+                mask = np.zeros(self.size, dtype=bool)
+                mask[start:] = column == code
+                bitsets[chr(code)] = bitset.from_bool_array(mask)
+            self._by_position[pos] = bitsets
+        if pos not in self._by_position:
+            words = self.words
+            start = self.length_offsets[pos] if pos < len(self.length_offsets) else self.size
+            num_bytes = (self.size >> 3) + 1
+            by_char: dict[str, bytearray] = {}
+            for i in range(start, self.size):
+                c = words[i][pos-1]
+                data = by_char.get(c)
+                if data is None:
+                    data = by_char[c] = bytearray(num_bytes)
+                data[i >> 3] |= 1 << (i & 7)
+            self._by_position[pos] = {c: int.from_bytes(data, "little") for c, data in by_char.items()}
+        return self._by_position[pos]
+
+    def any_of(self, pos: int, chars: str) -> int:
+        """
+        bitset of all entries whose pos'th (1-indexed) character is among chars
+        """
+        bitsets = self.bitsets_at(pos)
+        out = 0
+        for c in set(chars):
+            out |= bitsets.get(c, 0)
+        return out
+
+
+def letter_histogram(word: str) -> tuple[int, ...]:
+    """
+    number of occurrences of each letter of HISTOGRAM_ALPHABET in word (case-insensitive); other characters are ignored.
+    """
+    word = word.lower()
+    return tuple([word.count(c) for c in HISTOGRAM_ALPHABET])
+
+
+def anagram_signature(word: str) -> str:
+    """
+    the letters of word (lowercased, only those of HISTOGRAM_ALPHABET) in sorted order. Two entries are anagrams of each
+    other iff they have the same signature.
+    """
+    word = word.lower()
+    if not (word.isascii() and word.isalpha()):
+        word = "".join([c for c in word if c in _LETTERS])
+    return "".join(sorted(word))
+
+
+_LETTERS = frozenset(HISTOGRAM_ALPHABET)
+# (Fixed) random 64-bit weights for the fingerprints of letter histograms (see AnagramIndex).
+_FINGERPRINT_WEIGHTS = [random.Random(c).getrandbits(64) | 1 for c in range(len(HISTOGRAM_ALPHABET))]
+
+
+def nearby_histograms(hist: tuple[int, ...], max_distance: int) -> list[list[tuple[int, ...]]]:
+    """
+    out[d] are all letter histograms that differ from hist by removing and adding a total of exactly d letters (for
+    d <= max_distance). Removing and adding the same letter is not considered, so each histogram occurs only once.
+    """
+    out: list[list[tuple[int, ...]]] = [[] for _ in range(max_distance+1)]
+    num_letters = len(hist)
+
+    def add(current: list[int], c: int, budget: int, distance: int, removed: set[int]):
+        # adds letters c, c+1, ... that were not removed
+        out[distance].append(tuple(current))
+        if budget == 0:
+            return
+        for k in range(c, num_letters):
+            if k not in removed:
+                current[k] += 1
+                add(current, k, budget - 1, distance + 1, removed)
+                current[k] -= 1
+
+    def remove(current: list[int], c: int, budget: int, distance: int, removed: set[int]):
+        # removes letters c, c+1, ..., then continues with adding
+        add(current, 0, budget, distance, removed)
+        if budget == 0:
+            return
+        for k in range(c, num_letters):
+            if current[k] > 0:
+                current[k] -= 1
+                removed.add(k)
+                remove(current, k, budget - 1, distance + 1, removed)
+                current[k] += 1
+                if current[k] == hist[k]:
+                    removed.discard(k)
+
+    remove(list(hist), 0, max_distance, 0, set())
+    return out
+
+
+def count_nearby_histograms(hist: tuple[int, ...], max_distance: int) -> int:
+    """
+    upper bound for the total number of histograms returned by nearby_histograms(hist, max_distance), computed without
+    enumerating them: the number of ways to remove i letters of hist times the number of ways to add j arbitrary
+    letters, summed over i + j <= max_distance.
+    """
+    removals = [1]  # removals[i]: number of sub-multisets of size i of hist (coefficients of prod_c (1 + ... + x^h_c))
+    for n in hist:
+        if n == 0:
+            continue
+        new = [0] * min(len(removals) + n, max_distance + 1)
+        for i, ways in enumerate(removals):
+            for k in range(i, min(i + n, max_distance) + 1):
+                new[k] += ways
+        removals = new
+    num_letters = len(hist)
+    return sum(ways * math.comb(num_letters + j - 1, j) for i, ways in enumerate(removals) for j in range(max_distance - i + 1))
+
+
+class AnagramIndex:
+    """
+    Index for a dict that maps the letter histogram (equivalently, the anagram_signature) of an entry to the ids of all
+    entries with that histogram, so exact anagrams are found without looking at the entries. Anagrams with up to k
+    letters added or removed are found by looking up all nearby histograms (see nearby_histograms).
+
+    With the numpy backend, the index is a sorted array of 64-bit fingerprints of the rows of CharMatrix.histogram
+    (together with the ids in that order), which is much smaller than a dict with an entry per distinct signature.
+    Lookups are binary searches (vectorized over all queried histograms), and the hits are compared to the actual
+    histograms, so collisions of fingerprints do not matter. Without numpy, it is a dict from signatures to ids.
+    """
+
+    size: int
+    charmatrix: Optional[CharMatrix]
+    _keys: Optional["np.ndarray"]  # sorted fingerprints
+    _order: Optional["np.ndarray"]  # _order[k] is the id of the entry with fingerprint _keys[k]
+    _by_signature: Optional[dict[str, list[int]]]
+
+    def __init__(self, words: list[str], charmatrix: Optional[CharMatrix] = None):
+        self.size = len(words)
+        self.charmatrix = charmatrix
+        self._keys = None
+        self._order = None
+        self._by_signature = None
+        if charmatrix is not None:
+            keys = self._fingerprints(charmatrix.histogram)
+            self._order = np.argsort(keys, kind="stable").astype(np.int32)
+            self._keys = keys[self._order]
+        else:
+            by_signature: dict[str, list[int]] = {}
+            for i, word in enumerate(words):
+                by_signature.setdefault(anagram_signature(word), []).append(i)
+            self._by_signature = by_signature
+
+    @staticmethod
+    def _fingerprints(hists: "np.ndarray") -> "np.ndarray":
+        keys = np.zeros(len(hists), dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            for c, weight in enumerate(_FINGERPRINT_WEIGHTS):
+                keys += hists[:, c].astype(np.uint64) * np.uint64(weight)
+        return keys
+
+    @property
+    def nbytes(self) -> int:
+        """
+        (approximate) memory used by the index
+        """
+        if self._keys is not None:
+            return self._keys.nbytes + self._order.nbytes
+        return sys.getsizeof(self._by_signature) + sum(sys.getsizeof(s) + sys.getsizeof(ids) + 8 * len(ids) for s, ids in self._by_signature.items())
+
+    def ids_with_histograms(self, hists: list[tuple[int, ...]]) -> list[int]:
+        """
+        the (unsorted) ids of all entries whose letter histogram is among hists (which must be distinct)
+        """
+        if not hists:
+            return []
+        if self._by_signature is not None:
+            out = []
+            for hist in hists:
+                out += self._by_signature.get("".join([c * n for c, n in zip(HISTOGRAM_ALPHABET, hist)]), [])
+            return out
+        if any(n > 255 for hist in hists for n in hist):
+            hists = [hist for hist in hists if max(hist) <= 255]  # histograms are capped at 255, see CharMatrix
+        queries = np.array(hists, dtype=np.uint8).reshape(len(hists), len(HISTOGRAM_ALPHABET))
+        query_keys = self._fingerprints(queries)
+        starts = np.searchsorted(self._keys, query_keys, side="left")
+        ends = np.searchsorted(self._keys, query_keys, side="right")
+        lengths = ends - starts
+        if lengths.sum() == 0:
+            return []
+        which = np.repeat(np.arange(len(hists)), lengths)
+        positions = np.repeat(ends - np.cumsum(lengths), lengths) + np.arange(lengths.sum())
+        ids = self._order[positions]
+        exact = (self.charmatrix.histogram[ids] == queries[which]).all(axis=1)
+        return ids[exact].tolist()
+
+    def tier_ids(self, hist: tuple[int, ...], max_errors: int = 0) -> list[list[int]]:
+        """
+        out[d] are the (unsorted) ids of all entries whose letter histogram differs from hist by a total of exactly d
+        letters added or removed, for d <= max_errors.
+        """
+        return [self.ids_with_histograms(hists) for hists in nearby_histograms(hist, max_errors)]
+
+    def tiers(self, hist: tuple[int, ...], max_errors: int = 0) -> list[int]:
+        """
+        bitset version of tier_ids
+        """
+        return [bitset.from_ids(ids, self.size) if ids else 0 for ids in self.tier_ids(hist, max_errors)]
+
+
+def word_shape(word: str, length: Optional[int] = None) -> bytes:
+    """
+    canonical shape of (the first length characters of) word: the position of the first occurrence of each character.
+    Two words have the same shape iff they are equal up to renaming characters (e.g. "otto" and "anna"), and the shape
+    of a prefix is the prefix of the shape.
+    """
+    return bytes(map(word.index, word if length is None else word[:length]))
+
+
+class PrefixGroups:
+    """
+    The entries of a dict of length at least length, grouped by a key (as bytes) computed from their first length
+    characters, such as their shape (see word_shape). start is the first id of such an entry (all later ids are also of
+    length at least length), keys[g] is the key of group g and group_of[i - start] is the group of the entry with id i.
+    The ids of the entries of group g are order[bounds[g]:bounds[g+1]].
+    """
+    length: int
+    start: int
+    keys: list[bytes]
+    group_by_key: dict[bytes, int]
+    group_of: Union["np.ndarray", list[int]]
+    order: Union["np.ndarray", list[int]]
+    bounds: list[int]
+
+    def __init__(self, length: int, start: int, keys: list[bytes], group_of, order, bounds: list[int]):
+        self.length = length
+        self.start = start
+        self.keys = keys
+        self.group_by_key = {key: g for g, key in enumerate(keys)}
+        self.group_of = group_of
+        self.order = order
+        self.bounds = bounds
+
+    @classmethod
+    def from_rows(cls, start: int, rows: "np.ndarray") -> "PrefixGroups":
+        """
+        groups the entries with ids start, start+1, ... by the rows of the uint8-matrix rows (numpy version)
+        """
+        length = rows.shape[1]
+        as_bytes = np.ascontiguousarray(rows).view(np.dtype((np.void, length))).ravel()
+        unique, group_of = np.unique(as_bytes, return_inverse=True)
+        group_of = group_of.astype(np.int32).ravel()
+        order = (np.argsort(group_of, kind="stable") + start).astype(np.int32)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(group_of, minlength=len(unique)))]).tolist()
+        return cls(length, start, [row.tobytes() for row in unique], group_of, order, bounds)
+
+    @classmethod
+    def from_keys(cls, length: int, start: int, keys: Iterable[bytes]) -> "PrefixGroups":
+        """
+        groups the entries with ids start, start+1, ... by the given keys
+        """
+        group_by_key: dict[bytes, int] = {}
+        group_of = []
+        for key in keys:
+            g = group_by_key.get(key)
+            if g is None:
+                g = group_by_key[key] = len(group_by_key)
+            group_of.append(g)
+        counts = [0 for _ in group_by_key]
+        for g in group_of:
+            counts[g] += 1
+        bounds = [0]
+        for n in counts:
+            bounds.append(bounds[-1] + n)
+        order = sorted(range(start, start + len(group_of)), key=lambda i: group_of[i - start])
+        return cls(length, start, list(group_by_key), group_of, order, bounds)
+
+    def key_matrix(self) -> "np.ndarray":
+        """
+        the keys as rows of a uint8-matrix (for vectorized computations over all groups)
+        """
+        return np.frombuffer(b"".join(self.keys), dtype=np.uint8).reshape(len(self.keys), self.length)
+
+    def ids_of(self, groups: list[int]) -> list[int]:
+        """
+        the (unsorted) ids of the entries in the given groups
+        """
+        out = []
+        for g in groups:
+            ids = self.order[self.bounds[g]:self.bounds[g+1]]
+            out += ids if isinstance(ids, list) else ids.tolist()
+        return out
+
+    def bits_of(self, groups: list[int], size: int) -> int:
+        """
+        bitset (over all size entries of the dict) of the entries in the given groups
+        """
+        if not groups:
+            return 0
+        if isinstance(self.group_of, list) or sum(self.bounds[g+1] - self.bounds[g] for g in groups) < (size >> 6):
+            return bitset.from_ids(self.ids_of(groups), size)
+        selected = np.zeros(len(self.keys), dtype=bool)
+        selected[groups] = True
+        mask = np.zeros(size, dtype=bool)
+        mask[self.start:] = selected[self.group_of]
+        return bitset.from_bool_array(mask)
+
+    def values_of(self, ids: "np.ndarray", values: "np.ndarray") -> "np.ndarray":
+        """
+        values[g] for the group g of each of the given ids, which must be at least start
+        """
+        return values[np.asarray(self.group_of)[ids - self.start]]
+
+    @property
+    def nbytes(self) -> int:
+        if np is not None and isinstance(self.group_of, np.ndarray):
+            return self.group_of.nbytes + self.order.nbytes + sum(map(sys.getsizeof, self.keys))
+        return 8 * (len(self.group_of) + len(self.order)) + sum(map(sys.getsizeof, self.keys))
+
+
+class ShapeIndex:
+    """
+    Index for a dict from word shapes (see word_shape) to entries, used for letter patterns as in cryptograms.
+    Shapes of whole entries are mostly distinct for long entries, so we rather index the shapes of prefixes: For each
+    queried length, the entries that are at least that long are grouped by the shape of their prefix of that length
+    (see PrefixGroups), computed on first use (with the numpy representation, if given).
+    """
+    words: list[str]
+    size: int
+    length_offsets: list[int]
+    charmatrix: Optional[CharMatrix]
+    _groups: dict[int, PrefixGroups]
+
+    def __init__(self, words: list[str], length_offsets: list[int], charmatrix: Optional[CharMatrix] = None):
+        self.words = words
+        self.size = len(words)
+        self.length_offsets = length_offsets
+        self.charmatrix = charmatrix
+        self._groups = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(groups.nbytes for groups in self._groups.values())
+
+    def groups(self, length: int) -> PrefixGroups:
+        assert 1 <= length < 256
+        if length not in self._groups:
+            start = self.length_offsets[length] if length < len(self.length_offsets) else self.size
+            if self.charmatrix is not None:
+                ids = np.arange(start, self.size)
+                columns = [self.charmatrix.char_at(ids, j+1) for j in range(length)]
+                shapes = np.empty((len(ids), length), dtype=np.uint8)
+                for j in range(length):
+                    first = np.full(len(ids), j, dtype=np.uint8)
+                    for k in range(j-1, -1, -1):
+                        first[columns[k] == columns[j]] = k
+                    shapes[:, j] = first
+                self._groups[length] = PrefixGroups.from_rows(start, shapes)
+            else:
+                self._groups[length] = PrefixGroups.from_keys(length, start, (word_shape(word, length) for word in self.words[start:]))
+        return self._groups[length]
+
+
+class _MorseLengths(dict):
+    # translation table for str.translate: characters without Morse code are mapped to length 0
+    def __missing__(self, key: int) -> int:
+        return 0
+
+
+_MORSE_LENGTHS = _MorseLengths({ord(c): len(code) for c, code in morse.MORSECODE.items()})
+
+
+def morse_lengths(word: str, length: Optional[int] = None) -> bytes:
+    """
+    the lengths of the Morse codes of (the first length characters of) word, 0 for characters without Morse code
+    """
+    return (word if length is None else word[:length]).translate(_MORSE_LENGTHS).encode("latin-1")
+
+
+class MorseIndex:
+    """
+    Morse data of a dict: For each queried length, the entries that are at least that long are grouped by the lengths
+    of the Morse codes of their first length characters (see morse_lengths and PrefixGroups), computed on first use
+    (with the numpy representation, if given). Patterns that only prescribe the code lengths are then answered by the
+    keys of the groups alone.
+    """
+    words: list[str]
+    size: int
+    length_offsets: list[int]
+    charmatrix: Optional[CharMatrix]
+    _groups: dict[int, PrefixGroups]
+
+    def __init__(self, words: list[str], length_offsets: list[int], charmatrix: Optional[CharMatrix] = None):
+        self.words = words
+        self.size = len(words)
+        self.length_offsets = length_offsets
+        self.charmatrix = charmatrix
+        self._groups = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(groups.nbytes for groups in self._groups.values())
+
+    def groups(self, length: int) -> PrefixGroups:
+        assert length >= 1
+        if length not in self._groups:
+            start = self.length_offsets[length] if length < len(self.length_offsets) else self.size
+            if self.charmatrix is not None:
+                ids = np.arange(start, self.size)
+                table = np.zeros(256, dtype=np.uint8)
+                for c, code in morse.MORSECODE.items():
+                    table[ord(c)] = len(code)
+                rows = np.empty((len(ids), length), dtype=np.uint8)
+                for j in range(length):
+                    rows[:, j] = table[self.charmatrix.char_at(ids, j+1)]
+                self._groups[length] = PrefixGroups.from_rows(start, rows)
+            else:
+                self._groups[length] = PrefixGroups.from_keys(length, start, (morse_lengths(word, length) for word in self.words[start:]))
+        return self._groups[length]
+
+
+class _MorseCodes(dict):
+    # translation table for str.translate: characters without Morse code are dropped
+    def __missing__(self, key: int) -> None:
+        return None
+
+
+_MORSE_CODES = _MorseCodes({ord(c): code for c, code in morse.MORSECODE.items()})
+_MORSE_CODES.update({ord(c.upper()): code for c, code in morse.MORSECODE.items()})
+
+
+def morse_code(word: str) -> str:
+    """
+    the Morse code of word without separators between the letters; characters without Morse code are ignored
+    """
+    return word.translate(_MORSE_CODES)
+
+
+class MorseTrie:
+    """
+    Implicit trie of the Morse codes (see morse_code) of the entries of a dict, for decoding Morse streams without
+    separators (see dictmanager/morsestream.py):
+    codes is the sorted list of the distinct nonempty codes, and the entries with code codes[k] are
+    ids[starts[k]:starts[k+1]]. A node of the trie (i.e. a prefix of codes) is the range of codes that start with it,
+    and descending to a child narrows the range by bisection. Since '-' < '.' < '/', the codes below prefix + '-' are
+    those in [prefix + '-', prefix + '.') and the codes below prefix + '.' those in [prefix + '.', prefix + '/').
+    """
+    codes: list[str]
+    starts: array
+    ids: array
+
+    def __init__(self, words: list[str]):
+        code_of = [morse_code(word) for word in words]
+        order = sorted((i for i in range(len(words)) if code_of[i]), key=code_of.__getitem__)
+        self.codes = []
+        self.starts = array("i")
+        self.ids = array("i", order)
+        for k, i in enumerate(order):
+            if not self.codes or self.codes[-1] != code_of[i]:
+                self.codes.append(code_of[i])
+                self.starts.append(k)
+        self.starts.append(len(order))
+
+    @property
+    def nbytes(self) -> int:
+        return sys.getsizeof(self.codes) + sum(map(sys.getsizeof, self.codes)) + self.starts.itemsize * len(self.starts) + self.ids.itemsize * len(self.ids)
+
+    def ids_of(self, k: int) -> array:
+        """
+        the ids of the entries with code codes[k]
+        """
+        return self.ids[self.starts[k]:self.starts[k+1]]
+
+    def matches(self, stream: str, start: int = 0, max_errors: int = 0) -> list[tuple[int, int, int]]:
+        """
+        Returns all codes that agree with a piece stream[start:end] of the stream up to at most max_errors symbols (the
+        pieces of the stream and the codes have the same length, so errors are dots read as dashes and vice versa) as
+        triples (end, number of errors, k), where k is the index of the code in codes.
+        """
+        out = []
+        # depth-first traversal of the nodes at Hamming distance at most max_errors from a piece of the stream
+        stack = [("", 0, len(self.codes), 0)]
+        codes = self.codes
+        while stack:
+            prefix, lo, hi, errors = stack.pop()
+            if prefix and codes[lo] == prefix:  # the shortest code below a node is the node itself
+                out.append((start + len(prefix), errors, lo))
+                lo += 1
+            position = start + len(prefix)
+            if position >= len(stream) or lo == hi:
+                continue
+            middle = bisect_left(codes, prefix + ".", lo, hi)
+            for symbol, child_lo, child_hi in (("-", lo, middle), (".", middle, bisect_left(codes, prefix + "/", middle, hi))):
+                child_errors = errors + (symbol != stream[position])
+                if child_lo < child_hi and child_errors <= max_errors:
+                    stack.append((prefix + symbol, child_lo, child_hi, child_errors))
+        return out
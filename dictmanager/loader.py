@@ -0,0 +1,84 @@
+import bz2
+import gzip
+import itertools
+import lzma
+from typing import Callable, Optional, TextIO, Union
+
+# Streaming loader for dict files: The file is read line by line and the normalized entries are deduplicated while
+# reading, so apart from the current line we only ever hold the set of distinct entries. This set is then turned into
+# the sorted list of entries used by UnfilteredDict.
+
+COMPRESSED_OPENERS = {".gz": gzip.open, ".xz": lzma.open, ".bz2": bz2.open}
+CHUNK_SIZE = 4096  # number of lines that are normalized at once
+
+
+class LoadStatistics:
+    """
+    Statistics about loading a dict file:
+    lines is the number of lines read, entries the number of entries produced by the normalizer (including
+    duplicates), duplicates the number of entries that were dropped as duplicates and rejected the number of lines
+    for which the normalizer produced no entry at all.
+    """
+    lines: int
+    entries: int
+    duplicates: int
+    rejected: int
+
+    def __init__(self, lines: int = 0, entries: int = 0, duplicates: int = 0, rejected: int = 0):
+        self.lines = lines
+        self.entries = entries
+        self.duplicates = duplicates
+        self.rejected = rejected
+
+    @property
+    def unique(self) -> int:
+        return self.entries - self.duplicates
+
+    def __str__(self) -> str:
+        return f"{self.lines} lines read, {self.entries} entries produced, {self.duplicates} duplicates dropped, {self.rejected} lines rejected"
+
+
+def open_dict_file(path: str, encoding: Optional[str] = None, mode: str = "r") -> TextIO:
+    """
+    opens the dict file as text for reading (mode "r") or writing (mode "w").
+    Files ending in .gz, .xz or .bz2 are (de)compressed on the fly.
+    """
+    for suffix, opener in COMPRESSED_OPENERS.items():
+        if path.endswith(suffix):
+            return opener(path, mode + "t", encoding=encoding)
+    return open(path, mode, encoding=encoding)
+
+
+def load_entries(path: str, encoding: Optional[str], normalizer: Callable[[str], Union[str, list[str]]]) -> tuple[list[str], LoadStatistics]:
+    """
+    reads the dict file and returns the distinct normalized entries, sorted by length first, then alphabetically,
+    together with statistics about the loading.
+    """
+    stats = LoadStatistics()
+    seen = set()
+    add = seen.add
+    # Normalizers may provide a batch version normalize_many (see normalizers.py), which we feed with chunks of lines.
+    normalize_many = getattr(normalizer, "normalize_many", None)
+    if normalize_many is None:
+        normalize_many = lambda lines: list(map(normalizer, lines))
+    with open_dict_file(path, encoding) as f:
+        while True:
+            lines = list(itertools.islice(f, CHUNK_SIZE))
+            if not lines:
+                break
+            stats.lines += len(lines)
+            for normalized_entries in normalize_many(lines):
+                if not normalized_entries:
+                    stats.rejected += 1
+                    continue
+                if isinstance(normalized_entries, str):
+                    normalized_entries = [normalized_entries]
+                stats.entries += len(normalized_entries)
+                for entry in normalized_entries:
+                    add(entry)
+    stats.duplicates = stats.entries - len(seen)
+    entries = list(seen)
+    del seen
+    entries.sort()
+    entries.sort(key=len)  # this is stable, so we end up sorting by length, then alphabetically.
+    return entries, stats
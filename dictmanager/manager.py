@@ -1,5 +1,16 @@
-from typing import Optional, Callable, Union
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+from typing import Iterator, Optional, Callable, Union
 from pathlib import PurePath
+from . import cache
+from .loader import LoadStatistics, load_entries
+from .npbackend import CharMatrix
+from .indexes import PositionIndex, AnagramIndex, ShapeIndex, MorseIndex, MorseTrie
+from .trie import Trie
+from utils import bitset
 
 def _identity(x: str) -> Union[str, list[str]]:
     return x
@@ -16,10 +27,11 @@ class DictSpecification:
     The latter is relevant because we may want to (de-)serialize the specification even if the file is missing or is
     changing.
 
-    path denotes the file path that we use to load the dict
+    path denotes the file path that we use to load the dict (.gz, .xz and .bz2 files are decompressed on the fly)
     normalizer is a function str -> str | list[str] that is used to preprocess each entry (e.g. umlaut-normalization)
     encoding is forwarded to open
     display is the name displayed to the user (default: filename without path)
+    use_cache denotes whether the normalized dict should be cached on disk (see cache.py)
     """
 
     path: str  # file path
@@ -27,8 +39,10 @@ class DictSpecification:
     encoding: Optional[str]  # encoding
     normalizer: Callable[[str], Union[str, list[str]]]
     status: int
-    def __init__(self, path: str, *, normalizer=_identity, display: Optional[str] = None, encoding: Optional[str] = None, status: int = _STATUS_ACTIVE):
+    use_cache: bool
+    def __init__(self, path: str, *, normalizer=_identity, display: Optional[str] = None, encoding: Optional[str] = None, status: int = _STATUS_ACTIVE, use_cache: bool = True):
         self.path = path
+        self.use_cache = use_cache
         self.normalizer = normalizer
         if display is None:
             self.display = PurePath(path).name
@@ -53,49 +67,274 @@ class DictSpecification:
 class UnfilteredDict:
     """
     UnfilteredDict is the actual dictionary loaded using the specification
+    The entries in L are sorted by length first, then alphabetically. The entries of length n are
+    L[length_offsets[n]:length_offsets[n+1]]. Entries are still shown to the user in alphabetical order, see
+    iter_sorted_words_of.
     """
     spec: DictSpecification
     L: list[str]
+    length_offsets: list[int]
     size: int
     status: int
     error: Optional[Exception]
+    load_stats: Optional[LoadStatistics]  # statistics about reading the file, None if not loaded (from a file)
+    _charmatrix: Optional[CharMatrix]
+    _charmatrix_built: bool
+    _position_index: Optional[PositionIndex]
+    _anagram_index: Optional[AnagramIndex]
+    _shape_index: Optional[ShapeIndex]
+    _morse_index: Optional[MorseIndex]
+    _morse_trie: Optional[MorseTrie]
+    _index: Optional[dict[str, int]]  # maps entries to their ids (=position in L)
+    _trie: Optional[Trie]
+    _build_lock: threading.RLock  # held while building one of the representations above, see _build
+    use_numpy: bool = True  # whether to use the numpy backend for filter evaluation (if numpy is available)
+    use_trie: bool = False  # whether to evaluate positional filters by traversing a trie (see trie.py)
 
     def __init__(self, spec: DictSpecification):
         self.spec = spec
         self.L = []
+        self.length_offsets = [0]
         self.status = spec.status
+        self._charmatrix = None
+        self._charmatrix_built = False
+        self._position_index = None
+        self._anagram_index = None
+        self._shape_index = None
+        self._morse_index = None
+        self._morse_trie = None
+        self._index = None
+        self._trie = None
+        self._build_lock = threading.RLock()
         self.reload()
 
+    @classmethod
+    def from_entries(cls, entries: list[str], display: str = "<memory>") -> "UnfilteredDict":
+        """
+        creates an (active) dict directly from already normalized entries without touching the disk. The entries must
+        be free of duplicates and sorted by length, then alphabetically (as L is).
+        """
+        spec = DictSpecification(display, display=display, use_cache=False, status=_STATUS_INACTIVE)
+        ret = cls(spec)
+        ret.status = _STATUS_ACTIVE
+        ret.L = entries
+        ret._compute_length_offsets()
+        return ret
+
     def reload(self):
         """
         (re-)loads the Unfiltered dict from disk.
+        If possible, the normalized dict is read from (or written to) the on-disk cache.
         """
         self.L = []
+        self.length_offsets = [0]
         self.error = None
+        self.load_stats = None
+        self._charmatrix = None
+        self._charmatrix_built = False
+        self._position_index = None
+        self._anagram_index = None
+        self._shape_index = None
+        self._morse_index = None
+        self._morse_trie = None
+        self._index = None
+        self._trie = None
         if self.status == _STATUS_INACTIVE:
             return
 
         normalizer = self.spec.normalizer
+        key = None
+        cache_file = cache.cache_file(self.spec.path, self.spec.encoding, normalizer)
 
         try:
-            with open(self.spec.path, "r", encoding=self.spec.encoding) as f:
-                lines = f.readlines()
-                for entry in lines:
-                    normalized_entries = normalizer(entry)
-                    if normalized_entries:
-                        self.L += normalized_entries
+            if self.spec.use_cache:
+                key = cache.cache_key(self.spec.path, self.spec.encoding, normalizer)
+                cached = cache.load_cached(cache_file, key)
+                if cached is not None:
+                    self.L, self.load_stats = cached
+                    self._compute_length_offsets()
+                    return
+            self.L, self.load_stats = load_entries(self.spec.path, self.spec.encoding, normalizer)
         except Exception as E:
             self.status = _STATUS_FAILURE
             self.error = E
             self.L = []
-        self.L = list(set(self.L)) # remove duplicates
-        self.L.sort()
+            return
+        self._compute_length_offsets()
+        if key is not None:
+            cache.store_cached(cache_file, key, self.L, self.load_stats)
+
+    def _compute_length_offsets(self):
+        max_length = len(self.L[-1]) if self.L else -1
+        self.length_offsets = [bisect.bisect_left(self.L, n, key=len) for n in range(max_length + 2)]
+
+    def length_range(self, min_length: Optional[int] = None, max_length: Optional[int] = None) -> tuple[int, int]:
+        """
+        Returns (start, end) such that L[start:end] are exactly the entries with min_length <= length <= max_length.
+        None means no restriction.
+        """
+        longest = len(self.length_offsets) - 2
+        lo = 0 if min_length is None else min(max(min_length, 0), longest + 1)
+        hi = longest if max_length is None else min(max_length, longest)
+        if hi < lo:
+            return self.length_offsets[lo], self.length_offsets[lo]
+        return self.length_offsets[lo], self.length_offsets[hi+1]
+
+    def bits_in_length_range(self, min_length: Optional[int] = None, max_length: Optional[int] = None) -> int:
+        """
+        bitset (see utils/bitset.py) of the ids of all entries with min_length <= length <= max_length
+        """
+        return bitset.range_bits(*self.length_range(min_length, max_length))
+
+    def bitset_of(self, entries: list[str]) -> int:
+        """
+        bitset of the ids of the given entries, which must be contained in L.
+        """
+        return bitset.from_ids(self.ids_of(entries), self.size)
+
+    def ids_of(self, entries: list[str]) -> list[int]:
+        """
+        the ids of the given entries, which must be contained in L.
+        """
+        index = self._build("_index", lambda: {w: i for i, w in enumerate(self.L)})
+        return list(map(index.__getitem__, entries))
+
+    def words_of(self, bits: int) -> list[str]:
+        """
+        the entries whose ids are in the given bitset
+        """
+        L = self.L
+        return [L[i] for i in bitset.to_ids(bits)]
 
+    def iter_words_of(self, bits: int, chunk_size: int = 1 << 16) -> Iterator[list[str]]:
+        """
+        the entries whose ids are in the given bitset, in chunks (see bitset.iter_id_chunks)
+        """
+        L = self.L
+        for ids in bitset.iter_id_chunks(bits, chunk_size):
+            yield [L[i] for i in ids]
+
+    def iter_sorted_words_of(self, bits: int, chunk_size: int = 1 << 16) -> Iterator[list[str]]:
+        """
+        the entries whose ids are in the given bitset in alphabetical order (the order in which they are shown to the
+        user), in chunks of at most chunk_size entries. The entries of each length are in alphabetical order already
+        (see L), so they are merged lazily instead of sorting all of them at once.
+        """
+        runs = []
+        for n in range(len(self.length_offsets) - 1):
+            of_length = bits & bitset.range_bits(self.length_offsets[n], self.length_offsets[n+1])
+            if of_length != 0:
+                runs += [itertools.chain.from_iterable(self.iter_words_of(of_length, chunk_size))]
+        merged = heapq.merge(*runs)
+        while True:
+            chunk = list(itertools.islice(merged, chunk_size))
+            if not chunk:
+                return
+            yield chunk
 
     @property
     def size(self):
         return len(self.L)
 
+    def _build(self, attribute: str, factory: Callable[[], object]):
+        """
+        the value of the given attribute, which is set to factory() first if it is None. Filters of several queries
+        (server, background evaluation) may run concurrently on the same dict, so the check is repeated under
+        _build_lock and each representation is built only once.
+        """
+        value = getattr(self, attribute)
+        if value is None:
+            with self._build_lock:
+                value = getattr(self, attribute)
+                if value is None:
+                    value = factory()
+                    setattr(self, attribute, value)
+        return value
+
+    @property
+    def charmatrix(self) -> Optional[CharMatrix]:
+        """
+        numpy representation of the dict used to speed up filter evaluation, created on first use.
+        None if the numpy backend is not available (or disabled).
+        """
+        if not self.use_numpy or len(self.L) == 0:
+            return None
+        if not self._charmatrix_built:
+            with self._build_lock:
+                if not self._charmatrix_built:
+                    self._charmatrix = CharMatrix.from_words(self.L)
+                    self._charmatrix_built = True
+        return self._charmatrix
+
+    @property
+    def position_index(self) -> PositionIndex:
+        """
+        inverted (position, character) index of the dict, see indexes.py. The actual bitsets are computed on first use.
+        """
+        return self._build("_position_index", lambda: PositionIndex(self.L, self.length_offsets, self.charmatrix))
+
+    @property
+    def anagram_index(self) -> AnagramIndex:
+        """
+        index from letter histograms to entries (for anagram lookups), see indexes.py. Created on first use.
+        """
+        return self._build("_anagram_index", lambda: AnagramIndex(self.L, self.charmatrix))
+
+    @property
+    def shape_index(self) -> ShapeIndex:
+        """
+        index from word shapes to entries (for letter patterns), see indexes.py. The groups for each length of the
+        pattern are computed on first use.
+        """
+        return self._build("_shape_index", lambda: ShapeIndex(self.L, self.length_offsets, self.charmatrix))
+
+    @property
+    def morse_index(self) -> MorseIndex:
+        """
+        Morse code lengths of the entries (for Morse patterns), see indexes.py. The groups for each length of the
+        pattern are computed on first use.
+        """
+        return self._build("_morse_index", lambda: MorseIndex(self.L, self.length_offsets, self.charmatrix))
+
+    @property
+    def morse_trie(self) -> MorseTrie:
+        """
+        implicit trie of the Morse codes of the entries (for decoding Morse streams without separators), see indexes.py
+        """
+        return self._build("_morse_trie", lambda: MorseTrie(self.L))
+
+    @property
+    def trie(self) -> Optional[Trie]:
+        """
+        trie of the entries, created on first use. None if use_trie is not set.
+        """
+        if not self.use_trie or len(self.L) == 0:
+            return None
+        return self._build("_trie", lambda: Trie(self.L))
+
+    def memory_report(self) -> str:
+        """
+        human-readable overview of the memory used by the representations of the dict that were built so far
+        """
+        list_bytes = sys.getsizeof(self.L) + sum(map(sys.getsizeof, self.L))
+        lines = [f"{self.spec.display}: {self.size} entries",
+                 f"    list of entries: {list_bytes / 2**20:.1f} MiB"]
+        if self._charmatrix is not None:
+            lines += [f"    numpy matrices: {self._charmatrix.nbytes / 2**20:.1f} MiB"]
+        if self._position_index is not None:
+            lines += [f"    position index: {self._position_index.nbytes / 2**20:.1f} MiB"]
+        if self._anagram_index is not None:
+            lines += [f"    anagram index: {self._anagram_index.nbytes / 2**20:.1f} MiB"]
+        if self._shape_index is not None:
+            lines += [f"    shape index: {self._shape_index.nbytes / 2**20:.1f} MiB"]
+        if self._morse_index is not None:
+            lines += [f"    Morse index: {self._morse_index.nbytes / 2**20:.1f} MiB"]
+        if self._morse_trie is not None:
+            lines += [f"    Morse trie: {self._morse_trie.nbytes / 2**20:.1f} MiB"]
+        if self._trie is not None:
+            lines += [f"    trie ({self._trie.num_nodes} nodes): {self._trie.nbytes / 2**20:.1f} MiB ({100 * self._trie.nbytes / max(list_bytes, 1):.0f}% of the list)"]
+        return "\n".join(lines)
+
     def make_active(self):
         self.status = _STATUS_ACTIVE
         self.reload()
@@ -0,0 +1,100 @@
+import itertools
+from typing import Iterator, Optional
+from .manager import UnfilteredDict
+
+# Decoding Morse streams without separators (neither between letters nor between words):
+# A stream of n symbols has exponentially many segmentations into letters, so instead of enumerating them, the Morse
+# codes of whole entries are matched against the stream, walking the implicit trie of the codes of each dict (see
+# MorseTrie in indexes.py) from every position that can be reached by a sequence of entries. This gives a graph on the
+# positions 0, ..., n of the stream with an edge from i to j for every code that matches stream[i:j] (up to a number of
+# symbol errors). Its size is bounded by n times the number of trie nodes visited per position (at most the length of
+# the longest code times the fan-out 2 per allowed error), independent of the number of segmentations.
+# A backward pass then records which totals of errors are achievable from each position with a given number of words,
+# so enumerating the decodings never runs into a dead end and takes time proportional to the output.
+
+STREAM_SYMBOLS = frozenset(".-")
+
+
+def parse_stream(text: str) -> str:
+    """
+    the Morse stream given by text (a string of '.' and '-'); whitespace is ignored
+    """
+    stream = "".join(text.split())
+    invalid = set(stream) - STREAM_SYMBOLS
+    if invalid:
+        raise ValueError(f"Invalid symbols in Morse stream: {''.join(sorted(invalid))}")
+    return stream
+
+
+def decode_morse_stream(dicts: list[UnfilteredDict], stream: str, *, max_words: int = 1, max_errors: int = 0, limit: Optional[int] = None) -> Iterator[tuple[int, tuple[str, ...]]]:
+    """
+    yields all sequences of at most max_words entries of the (active) dicts whose concatenated Morse codes (see
+    indexes.morse_code) agree with the stream (see parse_stream) up to at most max_errors symbols (dots read as dashes
+    or vice versa), as pairs (number of errors, tuple of entries). Exact decodings come first, then those with 1 error
+    and so on; within each number of errors, sequences whose first word has a longer Morse code come first. Stops after
+    limit sequences.
+    """
+    assert max_words >= 1 and max_errors >= 0
+    n = len(stream)
+    if n == 0:
+        return
+    tries = [(u.L, u.morse_trie) for u in dicts if u.is_active]
+
+    # Forward pass: the edges from each position that is reachable at all. min_errors and min_words are lower bounds
+    # for the errors and words needed to reach a position, used to prune positions and error budgets.
+    unreachable = max_errors + 1
+    min_errors = [unreachable] * (n + 1)
+    min_words = [max_words + 1] * (n + 1)
+    min_errors[0] = 0
+    min_words[0] = 0
+    edges: list[list[tuple[int, int, list[str]]]] = [[] for _ in range(n)]  # (end, errors, entries)
+    for i in range(n):
+        if min_errors[i] > max_errors or min_words[i] >= max_words:
+            continue
+        by_code: dict[str, tuple[int, int, list[str]]] = {}
+        seen = set()
+        for words, trie in tries:
+            for end, errors, k in trie.matches(stream, i, max_errors - min_errors[i]):
+                code = trie.codes[k]
+                if code not in by_code:
+                    by_code[code] = (end, errors, [])
+                entries = by_code[code][2]
+                for word_id in trie.ids_of(k):
+                    word = words[word_id]
+                    if word not in seen:
+                        seen.add(word)
+                        entries.append(word)
+        edges[i] = sorted(by_code.values(), key=lambda edge: (-edge[0], edge[1]))
+        for end, errors, _ in edges[i]:
+            min_errors[end] = min(min_errors[end], min_errors[i] + errors)
+            min_words[end] = min(min_words[end], min_words[i] + 1)
+
+    # Backward pass: achievable[i][w] is the bitmask of the numbers of errors (at most max_errors) with which the rest of
+    # the stream from position i can be decoded using at most w entries.
+    all_errors = (1 << (max_errors + 1)) - 1
+    achievable = [[0] * (max_words + 1) for _ in range(n)] + [[1] * (max_words + 1)]
+    for i in range(n - 1, -1, -1):
+        for w in range(1, max_words + 1):
+            mask = 0
+            for end, errors, _ in edges[i]:
+                mask |= achievable[end][w-1] << errors
+            achievable[i][w] = mask & all_errors
+
+    def search(i: int, words_left: int, budget: int, chosen: list[list[str]]) -> Iterator[list[list[str]]]:
+        if i == n:
+            yield chosen
+            return
+        for end, errors, entries in edges[i]:
+            if errors <= budget and (achievable[end][words_left-1] >> (budget - errors)) & 1:
+                yield from search(end, words_left - 1, budget - errors, chosen + [entries])
+
+    found = 0
+    for total in range(max_errors + 1):
+        if not (achievable[0][max_words] >> total) & 1:
+            continue
+        for solution in search(0, max_words, total, []):
+            for combination in itertools.product(*solution):
+                yield total, combination
+                found += 1
+                if limit is not None and found >= limit:
+                    return
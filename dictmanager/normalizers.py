@@ -1,110 +1,140 @@
+import hashlib
+import json
+from typing import Iterable, Optional
 
-def normalizeToAscii(inputstr: str) -> list[str]:
-    out = [inputstr]
-    if "/" in inputstr:
-        out += inputstr.split("/")
-    if " " in inputstr:
-        out += inputstr.split(" ")
+# Normalizers turn a line of a dict file into a list of entries.
+# They are described declaratively (see TableNormalizer), which is compiled into str.translate tables. This is both
+# much faster than chained str.replace calls and gives each normalizer a stable identity (used by the cache) that only
+# changes if the description does.
 
-    real_out = []
-    for w in out:
-        real_out += normalizeToAscii2(w)
-    return real_out
 
+class TableNormalizer:
+    """
+    Normalizer given by a declarative description. A line is processed as follows:
+    - The pieces are the whole line and, for each character in split_on that occurs in the line, the parts of the line
+      split at that character.
+    - Each piece is casefolded (if casefold is set), characters are replaced according to transliterate (which maps
+      single characters to strings) and the characters in delete are removed.
+    - Empty pieces and pieces that are not ASCII are dropped. All other pieces must be alphanumeric now (otherwise, the
+      description is missing some rule and we raise ValueError).
+    - For each (suffix, replacement) in suffix_variants, every normalized piece ending in suffix additionally gives an
+      entry with suffix replaced by replacement.
+    NOTE: The rules must not interfere with each other: no character that appears in a replacement may be deleted or
+    transliterated, and casefolding never produces characters from split_on.
+    """
+    name: str
+    casefold: bool
+    transliterate: dict[str, str]
+    delete: str
+    split_on: str
+    suffix_variants: list[tuple[str, str]]
+    version: int
+    identity: str  # stable identity of the normalizer, see cache.normalizer_identity
+    _table: dict[int, Optional[str]]  # transliterates and deletes, except for the characters in split_on and newlines
+    _split_table: dict[int, Optional[str]]  # deletes the characters in split_on
+
+    def __init__(self, name: str, *, transliterate: dict[str, str], delete: str = "", split_on: str = "", suffix_variants: Iterable[tuple[str, str]] = (), casefold: bool = True, version: int = 1):
+        assert all(len(c) == 1 for c in transliterate)
+        self.name = name
+        self.__name__ = name
+        self.__qualname__ = name
+        self.casefold = casefold
+        self.transliterate = dict(transliterate)
+        self.delete = delete
+        self.split_on = split_on
+        self.suffix_variants = list(suffix_variants)
+        self.version = version
+        # Splitting is done after translating, so the separators (and newlines, which separate lines in
+        # normalize_many) must survive the translation.
+        self._table = str.maketrans(self.transliterate | {c: None for c in delete if c not in split_on and c != "\n"})
+        self._split_table = str.maketrans({c: None for c in split_on + "\n" if c in delete})
+        description = {"casefold": casefold, "transliterate": self.transliterate, "delete": delete, "split_on": split_on,
+                       "suffix_variants": self.suffix_variants}
+        digest = hashlib.blake2b(json.dumps(description, sort_keys=True).encode(), digest_size=8).hexdigest()
+        self.identity = f"{self.__module__}.{name}:{version}:{digest}"
+
+    def __repr__(self) -> str:
+        return f"TableNormalizer({self.name!r})"
+
+    def _finish(self, line: str) -> list[str]:
+        """
+        normalizes a line (without newline) that was already casefolded and translated by _table.
+        """
+        pieces = [line]
+        for sep in self.split_on:
+            if sep in line:
+                pieces += line.split(sep)
+        if len(pieces) > 1:
+            pieces = [piece.translate(self._split_table) for piece in pieces]
+        out = []
+        for x in pieces:
+            if len(x) == 0 or not x.isascii():
+                continue
+            if not x.isalnum():
+                raise ValueError(f"Failing string {x} of length {len(x)}.")
+            out += [x]
+        if self.suffix_variants:
+            for normalized in out[:]:
+                for suffix, replacement in self.suffix_variants:
+                    if normalized.endswith(suffix):
+                        out += [normalized[:len(normalized)-len(suffix)] + replacement]
+        return out
+
+    def normalize_piece(self, piece: str) -> list[str]:
+        """
+        normalizes a single piece (without splitting or suffix variants)
+        """
+        if self.casefold:
+            piece = piece.casefold()
+        x = piece.translate(self._table).translate(self._split_table)
+        if len(x) == 0 or not x.isascii():
+            return []
+        if not x.isalnum():
+            raise ValueError(f"Failing string {x} of length {len(x)}.")
+        return [x]
+
+    def __call__(self, line: str) -> list[str]:
+        if self.casefold:
+            line = line.casefold()
+        return self._finish(line.translate(self._table).replace("\n", ""))
+
+    def normalize_many(self, lines: list[str]) -> list[list[str]]:
+        """
+        batch version of calling the normalizer on each line (which must not contain newlines except at the end):
+        casefolding and translating is done on all lines at once.
+        """
+        text = "".join(lines)
+        if self.casefold:
+            text = text.casefold()
+        # str.translate is much faster on ASCII strings, so we first get rid of the (few distinct) transliterated
+        # characters that actually occur. Replacing them one after another is fine, as replacements are never
+        # transliterated themselves.
+        for c, replacement in self.transliterate.items():
+            if c in text:
+                text = text.replace(c, replacement)
+        finish = self._finish
+        return [finish(line) for line in text.translate(self._table).split("\n")[:len(lines)]]
+
+
+_UMLAUTS = {"ö": "oe", "ä": "ae", "ü": "ue", "ß": "ss"}
+_ACCENTS = {"â": "a", "à": "a", "á": "a", "ã": "a", "å": "a",
+            "é": "e", "ê": "e", "è": "e", "ë": "e",
+            "í": "i", "ì": "i", "î": "i", "ï": "i",
+            "ó": "o", "ò": "o", "ô": "o", "ø": "o",
+            "ù": "u", "ú": "u", "û": "u",
+            "ñ": "n", "ç": "c", "æ": "ae"}
+_PUNCTUATION = "\n- .:,+()/"
+
+normalizeToAscii = TableNormalizer("normalizeToAscii", transliterate=_UMLAUTS | _ACCENTS, delete=_PUNCTUATION, split_on="/ ")
+
+normalizeStreets = TableNormalizer("normalizeStreets", transliterate=_UMLAUTS | _ACCENTS, delete=_PUNCTUATION, split_on="/ ",
+                                   suffix_variants=[("strasse", "str"), ("str", "strasse"),
+                                                    ("hbf", "hauptbahnhof"), ("hauptbahnhof", "hbf"),
+                                                    ("bf", "bahnhof"), ("bahnhof", "bf")])
 
 
 def normalizeToAscii2(inputstr: str) -> list[str]:
     """
     normalizes input string by lowercasing, replacing certain umlauts and removing punctuation.
     """
-    x = inputstr.casefold()
-    x = x.replace("ö", "oe")
-    x = x.replace("ä", "ae")
-    x = x.replace("ü", "ue")
-    x = x.replace("ß", "ss")
-    x = x.replace("\n", "")
-    x = x.replace("-", "")
-    x = x.replace(" ", "")
-    x = x.replace(".", "")
-    x = x.replace(":", "")
-    x = x.replace(",", "")
-    x = x.replace("+", "")
-
-    x = x.replace("â", "a")
-    x = x.replace("à", "a")
-    x = x.replace("á", "a")
-
-    x = x.replace("é", "e")
-    x = x.replace("ê", "e")
-    x = x.replace("è", "e")
-    x = x.replace("ë", "e")
-
-    x = x.replace("í", "i")
-    x = x.replace("ì", "i")
-    x = x.replace("î", "i")
-
-    x = x.replace("ó", "o")
-    x = x.replace("ò", "o")
-    x = x.replace("ô", "o")
-
-    x = x.replace("ù", "u")
-    x = x.replace("ú", "u")
-    x = x.replace("û", "u")
-
-    x = x.replace("ñ", "n")
-    x = x.replace("ã", "a")
-
-    x = x.replace("ç", "c")
-
-    x = x.replace("ç", "c")
-    x = x.replace("å", "a")
-    x = x.replace("ï", "i")
-    x = x.replace("ø", "o")
-    x = x.replace("æ", "ae")
-    x = x.replace(")", "")
-    x = x.replace("(", "")
-    x = x.replace("/", "")
-
-    if len(x) == 0:
-        return []
-
-    if not x.isascii():
-        return ""
-    if not x.isalnum():
-        print(f"Failing string {x} of length {len(x)}.")
-        assert False
-    # assert x.isalnum()
-
-    # for prefix in COMMONPREFIXES:
-    #        x = x.removeprefix(prefix)
-
-    return [x]
-
-def normalizeStreets(inputstr: str) -> str | list[str]:
-    inputs_normalized = normalizeToAscii(inputstr)
-
-    if not inputstr:
-        return []
-
-    out = inputs_normalized[:]
-
-    for normalized_input in inputs_normalized:
-        # Note "X" cannot appear in normalized_input, because the latter is lower-cased.
-        if normalized_input.endswith("strasse"):
-            out += [(normalized_input+"X").replace("strasseX", "str")]
-        if normalized_input.endswith("str"):
-            out += [(normalized_input + "X").replace("strX", "strasse")]
-
-        if normalized_input.endswith("hbf"):
-            out += [(normalized_input + "X").replace("hbfX", "hauptbahnhof")]
-
-        if normalized_input.endswith("hauptbahnhof"):
-            out += [(normalized_input + "X").replace("hauptbahnhofX", "hbf")]
-
-        if normalized_input.endswith("bf"):
-            out += [(normalized_input + "X").replace("bfX", "bahnhof")]
-
-        if normalized_input.endswith("bahnhof"):
-            out += [(normalized_input + "X").replace("bahnhofX", "bf")]
-
-    return out
\ No newline at end of file
+    return normalizeToAscii.normalize_piece(inputstr)
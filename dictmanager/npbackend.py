@@ -0,0 +1,117 @@
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY: bool = np is not None
+
+BUCKET_WIDTH = 8  # entries of length 1..8 go into the first bucket, 9..16 into the second etc.
+HISTOGRAM_ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+class CharMatrix:
+    """
+    CharMatrix is a (read-only) representation of a list of strings as numpy uint8-matrices, used to evaluate filters
+    in a vectorized way. Filters access it via ids (=indices into the list of words) given as numpy arrays.
+
+    Entries are grouped into buckets by length. The entries of bucket b (of length between BUCKET_WIDTH*b + 1 and
+    BUCKET_WIDTH*(b+1)) are stored as rows of a matrix with BUCKET_WIDTH*(b+1) columns, padded with 0.
+    Hence, column k of the matrix holds the (k+1)'th character (or 0 if the entry is too short).
+
+    NOTE: Only works if all entries are latin-1 (which is the case for all normalized entries).
+    """
+
+    words: list[str]
+    size: int
+    lengths: "np.ndarray"  # lengths[i] is the length of words[i]
+    buckets: list["np.ndarray"]  # buckets[b] is the matrix for bucket b
+    bucket_of: "np.ndarray"  # bucket_of[i] is the bucket that contains words[i]
+    row_of: "np.ndarray"  # row_of[i] is the row within the bucket that contains words[i]
+    _histogram: Optional["np.ndarray"]
+
+    def __init__(self, words: list[str]):
+        assert HAVE_NUMPY
+        self.words = words
+        self.size = len(words)
+        self.lengths = np.fromiter(map(len, words), dtype=np.int32, count=len(words))
+        self.bucket_of = np.maximum(self.lengths - 1, 0) // BUCKET_WIDTH
+        self.row_of = np.zeros(self.size, dtype=np.int64)
+        self.buckets = []
+        num_buckets = int(self.bucket_of.max()) + 1 if self.size > 0 else 0
+        for b in range(num_buckets):
+            width = BUCKET_WIDTH * (b+1)
+            ids = np.flatnonzero(self.bucket_of == b)
+            self.row_of[ids] = np.arange(len(ids))
+            padded = "".join([words[i].ljust(width, "\0") for i in ids.tolist()])
+            self.buckets += [np.frombuffer(padded.encode("latin-1"), dtype=np.uint8).reshape(len(ids), width)]
+        self._histogram = None
+
+    @classmethod
+    def from_words(cls, words: list[str]) -> Optional["CharMatrix"]:
+        """
+        Creates a CharMatrix for the given words, or returns None if not possible (no numpy or non-latin-1 entries)
+        """
+        if not HAVE_NUMPY:
+            return None
+        try:
+            return cls(words)
+        except UnicodeEncodeError:
+            return None
+
+    def all_ids(self) -> "np.ndarray":
+        return np.arange(self.size, dtype=np.int64)
+
+    def char_at(self, ids: "np.ndarray", pos: int) -> "np.ndarray":
+        """
+        Returns the pos'th (1-indexed) character (as uint8) of the entries with the given ids, 0 for entries that are
+        too short.
+        """
+        assert pos >= 1
+        out = np.zeros(len(ids), dtype=np.uint8)
+        if len(ids) == 0:
+            return out
+        bucket_of = self.bucket_of[ids]
+        for b in range((pos-1) // BUCKET_WIDTH, len(self.buckets)):
+            sel = np.flatnonzero(bucket_of == b)
+            if len(sel) > 0:
+                out[sel] = self.buckets[b][self.row_of[ids[sel]], pos-1]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        ret = sum(a.nbytes for a in [self.lengths, self.bucket_of, self.row_of] + self.buckets)
+        if self._histogram is not None:
+            ret += self._histogram.nbytes
+        return ret
+
+    @property
+    def histogram(self) -> "np.ndarray":
+        """
+        N x 26 uint8-matrix, where histogram[i, c] is the number of occurrences of the c'th letter of
+        HISTOGRAM_ALPHABET in words[i] (case-insensitive, capped at 255). Computed once on first use.
+        """
+        if self._histogram is None:
+            hist = np.zeros((self.size, len(HISTOGRAM_ALPHABET)), dtype=np.uint8)
+            for b in range(len(self.buckets)):
+                matrix = self.buckets[b]
+                ids = np.flatnonzero(self.bucket_of == b)
+                codes = matrix.astype(np.int32)
+                codes = np.where((codes >= ord("A")) & (codes <= ord("Z")), codes + (ord("a") - ord("A")), codes) - ord("a")
+                rows, cols = np.nonzero((codes >= 0) & (codes < len(HISTOGRAM_ALPHABET)))
+                counts = np.bincount(rows * len(HISTOGRAM_ALPHABET) + codes[rows, cols], minlength=len(ids) * len(HISTOGRAM_ALPHABET))
+                hist[ids] = np.minimum(counts, 255).reshape(len(ids), len(HISTOGRAM_ALPHABET))
+            self._histogram = hist
+        return self._histogram
+
+    def char_table(self, chars: str) -> "np.ndarray":
+        """
+        Returns a boolean lookup table t with t[c] == True iff the character c (as uint8) is among chars.
+        Note that t[0] is False unless chars contains the 0-character.
+        """
+        table = np.zeros(256, dtype=bool)
+        for c in chars:
+            if ord(c) < 256:
+                table[ord(c)] = True
+        return table
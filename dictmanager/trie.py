@@ -0,0 +1,131 @@
+import sys
+from array import array
+from typing import Optional
+
+
+class CharCondition:
+    """
+    Condition on a single character of an entry, used for trie traversal (see Trie.search):
+    The character at the (1-indexed) position pos must be among chars or, if same_as is given, must agree with the
+    character at the earlier position same_as. Entries shorter than pos violate the condition.
+    """
+    pos: int
+    chars: Optional[str]
+    same_as: Optional[int]
+
+    def __init__(self, pos: int, *, chars: Optional[str] = None, same_as: Optional[int] = None):
+        assert pos >= 1
+        assert (chars is None) != (same_as is None)
+        assert same_as is None or 1 <= same_as < pos
+        self.pos = pos
+        self.chars = chars
+        self.same_as = same_as
+
+
+class Trie:
+    """
+    Compact (array-based) trie of the entries of a dict, see UnfilteredDict.trie.
+    The nodes are numbered in depth-first preorder, with node 0 the root. Hence, the subtree of node n consists of the
+    nodes n, ..., n + size[n] - 1, and the next sibling of n (if any) is n + size[n].
+    node_chars[n] is the character on the edge leading to node n.
+    term_ids lists the ids of the entries in the order of the nodes where they end, and term_before[n] is the number of
+    entries that end before node n. Hence, an entry ends at n iff term_before[n+1] > term_before[n] (and its id is
+    term_ids[term_before[n]]) and the ids of all entries in the subtree of n are
+    term_ids[term_before[n]:term_before[n + size[n]]].
+    """
+    num_nodes: int
+    node_chars: str
+    size: array
+    term_before: array
+    term_ids: array
+
+    def __init__(self, words: list[str]):
+        node_chars = ["\0"]
+        parent = array("i", [-1])
+        terminal = array("i", [-1])
+        stack = [0]  # stack[d] is the node at depth d on the path to the previous word
+        previous = ""
+        # Inserting the words in lexicographic order creates the nodes in preorder.
+        for word_id in sorted(range(len(words)), key=words.__getitem__):
+            word = words[word_id]
+            common = 0
+            max_common = min(len(word), len(previous))
+            while common < max_common and word[common] == previous[common]:
+                common += 1
+            del stack[common+1:]
+            for c in word[common:]:
+                node_chars += [c]
+                parent.append(stack[-1])
+                terminal.append(-1)
+                stack += [len(node_chars) - 1]
+            terminal[stack[-1]] = word_id
+            previous = word
+        self.num_nodes = len(node_chars)
+        self.node_chars = "".join(node_chars)
+        size = array("i", [1]) * self.num_nodes
+        for n in range(self.num_nodes - 1, 0, -1):
+            size[parent[n]] += size[n]
+        self.size = size
+        self.term_ids = array("i", [t for t in terminal if t >= 0])
+        term_before = array("i", [0]) * (self.num_nodes + 1)
+        count = 0
+        for n in range(self.num_nodes):
+            term_before[n] = count
+            if terminal[n] >= 0:
+                count += 1
+        term_before[self.num_nodes] = count
+        self.term_before = term_before
+
+    @property
+    def nbytes(self) -> int:
+        """
+        (approximate) memory used by the trie
+        """
+        return sys.getsizeof(self.node_chars) + sum(a.itemsize * len(a) for a in (self.size, self.term_before, self.term_ids))
+
+    def search(self, conditions: list[CharCondition], *, min_length: int = 0, max_errors: int = 0) -> list[list[int]]:
+        """
+        Returns lists out[0], ..., out[max_errors] of entry ids, where out[e] contains the entries of length at least
+        min_length that violate exactly e of the conditions.
+        This is a depth-first traversal that cuts off every subtree as soon as the error budget is exceeded and
+        collects whole subtrees once there are no conditions left below.
+        """
+        out = [[] for _ in range(max_errors+1)]
+        max_pos = max([cond.pos for cond in conditions], default=0)
+        max_depth = max(max_pos, min_length)
+        by_pos = [[] for _ in range(max_pos+1)]
+        for cond in conditions:
+            by_pos[cond.pos] += [(frozenset(cond.chars) if cond.chars is not None else None, cond.same_as)]
+        # short_errors[d] is the number of conditions violated by an entry of length d, just because it is too short.
+        short_errors = [sum(1 for cond in conditions if cond.pos > d) for d in range(max_depth+1)]
+        node_chars = self.node_chars
+        size = self.size
+        term_before = self.term_before
+        term_ids = self.term_ids
+        path = [""] * (max_depth+1)
+
+        def visit(n: int, depth: int, errors: int):
+            if depth >= max_depth:
+                # No conditions below, all entries in this subtree have the same number of errors.
+                out[errors].extend(term_ids[term_before[n]:term_before[n + size[n]]])
+                return
+            k = term_before[n]
+            if term_before[n+1] > k and depth >= min_length and errors + short_errors[depth] <= max_errors:
+                out[errors + short_errors[depth]].append(term_ids[k])
+            pos = depth + 1
+            conds = by_pos[pos] if pos <= max_pos else []
+            m = n + 1
+            end = n + size[n]
+            while m < end:
+                c = node_chars[m]
+                cost = errors
+                for chars, same_as in conds:
+                    if (c not in chars) if chars is not None else (c != path[same_as]):
+                        cost += 1
+                if cost <= max_errors:
+                    path[pos] = c
+                    visit(m, pos, cost)
+                m += size[m]
+
+        visit(0, 0, 0)
+        return out
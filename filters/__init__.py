@@ -1,2 +1,3 @@
-from .defs import Filter, apply_filters, apply_filter_groups, Group, FilterWithGroup, FilterMaker
-from .simplefilters import LengthFilterExact, LengthFilterMin, LengthFilterMax, ContainsFilterMaker,PositionFilterMaker, PatternFilterMaker, RegexpFilterMaker, MorseFilterMaker
+from .defs import Filter, apply_filters, apply_filter_groups, apply_filters_with_tiers, apply_filter_to_tiers, merge_tiers, apply_filters_with_mask_tiers, apply_filter_to_mask_tiers, merge_mask_tiers, Group, FilterWithGroup, FilterMaker
+from .simplefilters import LengthFilterExact, LengthFilterMin, LengthFilterMax, ContainsFilterMaker, AnagramFilterMaker, PositionFilterMaker, PatternFilterMaker, IsomorphFilterMaker, RegexpFilterMaker, MorseFilterMaker, split_length_filters, filter_from_description
+from .stats import FilterStats, FilterRun, sample_filter_stats
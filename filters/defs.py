@@ -1,5 +1,16 @@
-from typing import Callable
+from typing import Callable, Iterator, Optional
 from abc import ABC, abstractmethod
+from dictmanager import UnfilteredDict
+from dictmanager.npbackend import np, CharMatrix
+from dictmanager.indexes import PositionIndex
+from dictmanager.trie import CharCondition
+from utils import bitset
+from .stats import FilterStats
+import time
+
+NP_DISCARD = 1 << 16  # error count that np_errors uses to mark entries that are discarded regardless of max_errors
+LIST_SOURCE = "<list>"  # name under which applications to plain lists (see apply_filters) are recorded in FilterStats.runs
+CHECK_CHUNK = 1 << 16  # number of entry ids a filter is applied to between two calls of check (see apply_filter_to_mask_tiers)
 
 class Filter(ABC):
     """
@@ -11,12 +22,14 @@ class Filter(ABC):
     priority: int  # priority of the filter. Lower priority filters get applied first. This is purely for efficiency. Default = 0
     display: str  # display this to the user
     active: bool  # is the filter active
+    stats: FilterStats  # measured pass rate and cost, used to order filters
 
     def __init__(self, *, allow_errors: bool = False, priority: int = 0, display: str, active: bool = True):
         self.allow_errors = allow_errors
         self.priority = priority
         self.display = display
         self.active = active
+        self.stats = FilterStats()
 
     def __str__(self) -> str:
         s: str = self.display
@@ -33,6 +46,14 @@ class Filter(ABC):
     def toggle_active(self):
         self.active = not self.active
 
+    def describe(self) -> Optional[dict]:
+        """
+        serializable (JSON-compatible) description of the filter, from which filter_from_description (see
+        simplefilters.py) recreates an equivalent filter. This is used to send filters to other processes.
+        Returns None if the filter cannot be described this way.
+        """
+        return None
+
     @abstractmethod
     def apply(self, input_list: list[str]) -> list[str]:
         """
@@ -51,6 +72,115 @@ class Filter(ABC):
         ret[0] = self.apply(input_list)
         return ret
 
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> Optional["np.ndarray"]:
+        """
+        vectorized version of apply_with_errors for the numpy backend (see dictmanager/npbackend.py):
+        Returns an integer array containing the number of errors for each entry of cm with the given ids, where
+        NP_DISCARD means that the entry is discarded.
+        Returns None if the filter does not support the numpy backend, in which case apply_with_errors is used.
+        """
+        return None
+
+    def bitmap_tiers(self, index: PositionIndex, candidates: int, *, max_errors: int = 0) -> Optional[list[int]]:
+        """
+        evaluation via the position index of a dict (see dictmanager/indexes.py) without looking at the entries:
+        candidates is a bitset (see utils/bitset.py) of entry ids. Outputs disjoint bitsets L[0], ..., L[max_errors]
+        as apply_with_errors would.
+        Returns None if the filter cannot be evaluated via the index.
+        """
+        return None
+
+    def trie_conditions(self) -> Optional[tuple[list[CharCondition], int]]:
+        """
+        description of the filter for evaluation via the trie of a dict (see dictmanager/trie.py): Returns conditions
+        and min_length such that entries shorter than min_length are discarded and the number of errors of all other
+        entries is the number of violated conditions.
+        Returns None if the filter cannot be described this way.
+        """
+        return None
+
+    def mask_tiers(self, source: UnfilteredDict, candidates: int, *, max_errors: int = 0) -> list[int]:
+        """
+        apply the filter to the entries of the dict source whose ids are in the bitset candidates.
+        Outputs disjoint bitsets L[0], ..., L[max_errors] (subsets of candidates) as apply_with_errors would.
+        By default, this uses the position index (via bitmap_tiers) or the numpy backend (via np_errors) if supported
+        and otherwise falls back to apply_with_errors on the actual entries. If the dict uses a trie, that is tried first.
+        """
+        ret = trie_mask_tiers([self], source, candidates, max_errors=max_errors)
+        if ret is not None:
+            return ret
+        ret = self.bitmap_tiers(source.position_index, candidates, max_errors=max_errors)
+        if ret is not None:
+            return ret
+        cm = source.charmatrix
+        if cm is not None:
+            ids = bitset.to_id_array(candidates)
+            errs = self.np_errors(cm, ids)
+            if errs is not None:
+                return tiers_from_error_counts(ids, errs, size=source.size, max_errors=max_errors)
+        filter_res = self.apply_with_errors(source.words_of(candidates), max_errors=max_errors)
+        return [source.bitset_of(filter_res[j]) if j < len(filter_res) else 0 for j in range(max_errors+1)]
+
+    def error_counts(self, source: UnfilteredDict, ids: "np.ndarray", *, max_errors: int = 0) -> "np.ndarray":
+        """
+        number of errors for each entry of source with the given ids (as a sorted numpy array), as an integer array.
+        Error counts larger than max_errors may be reported as NP_DISCARD.
+        Requires the numpy backend. Uses np_errors if supported and falls back to apply_with_errors otherwise.
+        """
+        errs = self.np_errors(source.charmatrix, ids)
+        if errs is not None:
+            return errs
+        errs = np.full(len(ids), NP_DISCARD, dtype=np.int32)
+        filter_res = self.apply_with_errors(source.words_of(bitset.from_id_array(ids, source.size)), max_errors=max_errors)
+        for j in range(len(filter_res)):
+            errs[np.searchsorted(ids, source.ids_of(filter_res[j]))] = j
+        return errs
+
+def tiers_from_error_counts(ids: "np.ndarray", errs: "np.ndarray", *, size: int, max_errors: int = 0) -> list[int]:
+    """
+    turns the error counts errs[k] of the entries with ids[k] into bitsets out[0], ..., out[max_errors], where out[i]
+    are the ids with exactly i errors.
+    """
+    out = [0 for _ in range(max_errors+1)]
+    keep = errs <= max_errors
+    ids = ids[keep]
+    errs = errs[keep]
+    if len(ids) == 0:
+        return out
+    for i in range(int(errs.max()) + 1):
+        out[i] = bitset.from_id_array(ids[errs == i], size)
+    return out
+
+def trie_mask_tiers(filters: list[Filter], source: UnfilteredDict, candidates: int, *, max_errors: int = 0) -> Optional[list[int]]:
+    """
+    evaluates all given filters together by a single traversal of the trie of source, where the error budget is
+    shared between the filters. Returns bitsets L[0], ..., L[max_errors] (subsets of candidates) as
+    apply_filters_with_mask_tiers would, or None if source has no trie or some filter does not support it.
+    """
+    trie = source.trie
+    if trie is None:
+        return None
+    conditions = []
+    min_length = 0
+    for fil in filters:
+        query = fil.trie_conditions()
+        if query is None:
+            return None
+        conditions += query[0]
+        min_length = max(min_length, query[1])
+    found = trie.search(conditions, min_length=min_length, max_errors=max_errors)
+    return [bitset.from_ids(ids, source.size) & candidates for ids in found]
+
+def binary_bitmap_tiers(candidates: int, passing: int, *, max_errors: int = 0, allow_errors: bool = True) -> list[int]:
+    """
+    implementation of bitmap_tiers for filters that either pass (no error) or fail (one error / discard)
+    """
+    out = [0 for _ in range(max_errors+1)]
+    out[0] = candidates & passing
+    if allow_errors and max_errors > 0:
+        out[1] = candidates & ~passing
+    return out
+
 def from_error_count(input_list: list[str], *, max_errors: int, fun: Callable[[str], int]) -> list[list[str]]:
     """
     from_error_count is an implementation for apply_with_errors from a callable fun(str) -> Number of errors
@@ -64,7 +194,7 @@ def from_error_count(input_list: list[str], *, max_errors: int, fun: Callable[[s
         if num_errs > max_errors:
             continue
         assert 0 <= num_errs <= max_errors
-        output_lists[num_errs] += [input_string]
+        output_lists[num_errs].append(input_string)
     return output_lists
 
 
@@ -90,11 +220,152 @@ class FilterWithGroup:
     def toggle_active(self):
         self.f.toggle_active()
 
-def apply_filters(filters: list[Filter], input_list: list[str], *, max_errors: int = 0) -> list[str]:
+def _check_chunks(candidates: int, size: int) -> Iterator[int]:
     """
-    apply all each filter among filters that is active on the given input list, allowing a total of max_errors errors.
+    splits the bitset candidates into (non-empty) parts of at most CHECK_CHUNK possible ids each
     """
+    for start in range(0, size, CHECK_CHUNK):
+        part = candidates & bitset.range_bits(start, start + CHECK_CHUNK)
+        if part != 0:
+            yield part
 
+def apply_filter_to_mask_tiers(individual_filter: Filter, source: UnfilteredDict, tiers: list[int], *, max_errors: int = 0, check: Optional[Callable[[], None]] = None) -> list[int]:
+    """
+    apply a single filter to the bitsets tiers[0], ..., tiers[max_errors] of ids of entries of source, where tiers[i]
+    contains all entries that so far succeeded with i total errors. Returns new bitsets of the same shape.
+    If given, check is called regularly (every CHECK_CHUNK entry ids) and may abort the evaluation by raising an
+    exception, so slow filters on large dicts can be cancelled.
+    """
+    if max_errors > 0 and source.charmatrix is not None and (source.trie is None or individual_filter.trie_conditions() is None):
+        return np_apply_filters_to_mask_tiers([individual_filter], source, tiers, max_errors=max_errors, check=check)
+    new_out = [0 for _ in range(max_errors+1)]
+    candidates = merge_mask_tiers(tiers)
+    if candidates == 0:
+        individual_filter.stats.record(0, 0, 0.0, source=source.spec.display, tier_sizes=[0] * (max_errors+1))
+        return new_out
+    # The number of errors of an entry does not depend on its tier, so we only evaluate the filter once.
+    start = time.perf_counter()
+    if check is None:
+        filter_res = individual_filter.mask_tiers(source, candidates, max_errors=max_errors)
+    else:
+        filter_res = [0 for _ in range(max_errors+1)]
+        for part in _check_chunks(candidates, source.size):
+            check()
+            for j, bits in enumerate(individual_filter.mask_tiers(source, part, max_errors=max_errors)[:max_errors+1]):
+                filter_res[j] |= bits
+    seconds = time.perf_counter() - start
+    for j in range(min(max_errors+1, len(filter_res))):
+        if filter_res[j] == 0:
+            continue
+        for i in range(max_errors-j+1):
+            if tiers[i] != 0:
+                new_out[i+j] |= tiers[i] & filter_res[j]
+    individual_filter.stats.record(bitset.count(candidates), bitset.count(filter_res[0]), seconds,
+                                   source=source.spec.display, tier_sizes=[bitset.count(tier) for tier in new_out])
+    return new_out
+
+def np_apply_filters_to_mask_tiers(filters: list[Filter], source: UnfilteredDict, tiers: list[int], *, max_errors: int = 0, check: Optional[Callable[[], None]] = None) -> list[int]:
+    """
+    error-vector engine for fuzzy groups (requires the numpy backend): equivalent to applying all active filters in
+    turn via apply_filter_to_mask_tiers.
+    Each filter only reports an array of error counts (see Filter.error_counts), which are added up. Entries that
+    exceed max_errors are dropped after each filter, and the tiers are only created at the end. Hence, the cost barely
+    depends on max_errors.
+    If given, check is called before every CHECK_CHUNK entries of each filter, see apply_filter_to_mask_tiers.
+    """
+    ids = bitset.to_id_array(merge_mask_tiers(tiers))
+    total_errs = np.zeros(len(ids), dtype=np.int32)
+    for i in range(1, len(tiers)):
+        if tiers[i] != 0:
+            total_errs[np.searchsorted(ids, bitset.to_id_array(tiers[i]))] = i
+    for individual_filter in filters:
+        if not individual_filter.active:
+            continue
+        if len(ids) == 0:
+            individual_filter.stats.record(0, 0, 0.0, source=source.spec.display, tier_sizes=[0] * (max_errors+1))
+            continue
+        start = time.perf_counter()
+        if check is None:
+            errs = individual_filter.error_counts(source, ids, max_errors=max_errors)
+        else:
+            parts = []
+            for k in range(0, len(ids), CHECK_CHUNK):
+                check()
+                parts += [individual_filter.error_counts(source, ids[k:k+CHECK_CHUNK], max_errors=max_errors)]
+            errs = np.concatenate(parts)
+        seconds = time.perf_counter() - start
+        words_in = len(ids)
+        total_errs += errs
+        keep = total_errs <= max_errors
+        ids = ids[keep]
+        total_errs = total_errs[keep]
+        individual_filter.stats.record(words_in, int(np.count_nonzero(errs == 0)), seconds, source=source.spec.display,
+                                       tier_sizes=np.bincount(total_errs, minlength=max_errors+1).tolist())
+    return tiers_from_error_counts(ids, total_errs, size=source.size, max_errors=max_errors)
+
+def apply_filters_with_mask_tiers(filters: list[Filter], source: UnfilteredDict, candidates: int, *, max_errors: int = 0, check: Optional[Callable[[], None]] = None) -> list[int]:
+    """
+    apply all each filter among filters that is active to the entries of source whose ids are in the bitset
+    candidates, allowing a total of max_errors errors.
+    Outputs disjoint bitsets out[0], ..., out[max_errors], where out[i] contains the entries with exactly i errors.
+    If given, check is called regularly and may abort the evaluation, see apply_filter_to_mask_tiers.
+    """
+    out = [0 for _ in range(max_errors+1)]
+    out[0] = candidates
+
+    if source.trie is not None:
+        # all filters that support it are evaluated by a single traversal of the trie.
+        trie_filters = [fil for fil in filters if fil.active and fil.trie_conditions() is not None]
+        if trie_filters:
+            if check is not None:
+                check()
+            start = time.perf_counter()
+            out = trie_mask_tiers(trie_filters, source, candidates, max_errors=max_errors)
+            seconds = (time.perf_counter() - start) / len(trie_filters)
+            tier_sizes = [bitset.count(tier) for tier in out]
+            for fil in trie_filters:
+                fil.stats.record(bitset.count(candidates), tier_sizes[0], seconds, source=source.spec.display, tier_sizes=tier_sizes)
+            filters = [fil for fil in filters if fil not in trie_filters]
+
+    if max_errors > 0 and source.charmatrix is not None:
+        return np_apply_filters_to_mask_tiers(filters, source, out, max_errors=max_errors, check=check)
+
+    for individual_filter in filters:
+        if individual_filter.active:
+            out = apply_filter_to_mask_tiers(individual_filter, source, out, max_errors=max_errors, check=check)
+    return out
+
+def merge_mask_tiers(tiers: list[int]) -> int:
+    ret = 0
+    for tier in tiers:
+        ret |= tier
+    return ret
+
+def apply_filter_to_tiers(individual_filter: Filter, tiers: list[list[str]], *, max_errors: int = 0) -> list[list[str]]:
+    """
+    apply a single filter to the lists tiers[0], ..., tiers[max_errors], where tiers[i] contains all elements that so
+    far succeeded with i total errors. Returns new lists of the same shape.
+    """
+    new_out: list[list[str]] = [[] for _ in range(max_errors+1)]
+    words_passed = 0
+    start = time.perf_counter()
+    for i in range(max_errors+1):
+        if len(tiers[i]) == 0:
+            continue
+        filter_res = individual_filter.apply_with_errors(tiers[i], max_errors=max_errors-i)
+        words_passed += len(filter_res[0])
+        for j in range(max_errors-i+1):
+            new_out[i+j] += filter_res[j]
+    individual_filter.stats.record(sum(map(len, tiers)), words_passed, time.perf_counter() - start,
+                                   source=LIST_SOURCE, tier_sizes=list(map(len, new_out)))
+    return new_out
+
+def apply_filters_with_tiers(filters: list[Filter], input_list: list[str], *, max_errors: int = 0) -> list[list[str]]:
+    """
+    apply all each filter among filters that is active on the given input list, allowing a total of max_errors errors.
+    Outputs the disjoint lists out[0], ..., out[max_errors], where out[i] contains the entries with exactly i errors.
+    NOTE: For dicts, apply_filters_with_mask_tiers is much more efficient.
+    """
     out: list[list[str]] = [[] for _ in range(max_errors+1)]
     out[0] = input_list[:]
 
@@ -102,17 +373,21 @@ def apply_filters(filters: list[Filter], input_list: list[str], *, max_errors: i
 
     for individual_filter in filters:
         if individual_filter.active:
-            new_out = [[] for _ in range(max_errors+1)]
-            for i in range(max_errors+1):
-                filter_res = individual_filter.apply_with_errors(out[i], max_errors=max_errors-i)
-                for j in range(max_errors-i+1):
-                    new_out[i+j] += filter_res[j]
-            out = new_out[:]
+            out = apply_filter_to_tiers(individual_filter, out, max_errors=max_errors)
+    return out
+
+def merge_tiers(tiers: list[list[str]]) -> list[str]:
     ret = []
-    for i in range(max_errors+1):
-        ret += out[i]
+    for tier in tiers:
+        ret += tier
     return ret
 
+def apply_filters(filters: list[Filter], input_list: list[str], *, max_errors: int = 0) -> list[str]:
+    """
+    apply all each filter among filters that is active on the given input list, allowing a total of max_errors errors.
+    """
+    return merge_tiers(apply_filters_with_tiers(filters, input_list, max_errors=max_errors))
+
 def apply_filter_groups(filters_by_group: dict[Group, list[Filter]], input_list: list[str]) -> list[str]:
     out = input_list[:]
     for gp, list_of_filters in filters_by_group.items():
@@ -128,6 +403,19 @@ class SimpleFilter(Filter):
     def apply(self, input_list: list[str]) -> list[str]:
         return [x for x in input_list if self.fun(x)]
 
+    def np_mask(self, cm: CharMatrix, ids: "np.ndarray") -> Optional["np.ndarray"]:
+        """
+        vectorized version of fun for the numpy backend: returns a boolean array that tells which entries pass, or None
+        if not supported. Subclasses that know what fun does should override this.
+        """
+        return None
+
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> Optional["np.ndarray"]:
+        mask = self.np_mask(cm, ids)
+        if mask is None:
+            return None
+        return np.where(mask, 0, NP_DISCARD).astype(np.int32)
+
 class BinaryFilter(Filter):
     def __init__(self, fun, display: str, *, priority: int = 0):
         super().__init__(allow_errors=True, display=display, priority=priority, active=True)
@@ -150,6 +438,19 @@ class BinaryFilter(Filter):
                 out[1] += [s]
         return out
 
+    def np_mask(self, cm: CharMatrix, ids: "np.ndarray") -> Optional["np.ndarray"]:
+        """
+        vectorized version of fun for the numpy backend: returns a boolean array that tells which entries pass, or None
+        if not supported. Subclasses that know what fun does should override this.
+        """
+        return None
+
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> Optional["np.ndarray"]:
+        mask = self.np_mask(cm, ids)
+        if mask is None:
+            return None
+        return (~mask).astype(np.int32)
+
 
 
 class FilterMaker(ABC):
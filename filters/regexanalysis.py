@@ -0,0 +1,156 @@
+import re
+from typing import Optional, Union
+
+try:
+    import re._parser as _parser  # Python >= 3.11
+    import re._constants as _constants
+except ImportError:
+    import sre_parse as _parser
+    import sre_constants as _constants
+
+# Static analysis of regular expressions (as used by RegexpFilter, which matches the whole entry):
+# We extract necessary conditions that can be checked much faster than the regexp itself, in particular via the
+# indexes of a dict (see dictmanager/indexes.py). Everything here errs on the safe side: whatever we cannot analyze
+# simply gives no condition.
+
+_VARIABLE = object()  # marks a part of the pattern of unknown or variable width
+_REPEATS = {_constants.MAX_REPEAT, _constants.MIN_REPEAT}
+if hasattr(_constants, "POSSESSIVE_REPEAT"):
+    _REPEATS.add(_constants.POSSESSIVE_REPEAT)
+_ZERO_WIDTH = {_constants.AT, _constants.ASSERT, _constants.ASSERT_NOT}
+_MAX_CHARSET = 256  # larger character classes are treated as matching anything
+
+# An atom is a part of the pattern that matches exactly one character: either a str of the allowed characters or None
+# if any character is allowed. Parts that are not atoms are represented by _VARIABLE.
+_Atom = Union[Optional[str], object]
+
+
+class RegexpAnalysis:
+    """
+    Necessary conditions for an entry to (fully) match a regular expression:
+    The length is between min_length and max_length (None meaning unbounded), the entry starts with prefix and ends
+    with suffix, every string in literals is a substring of the entry and for each pos, chars in positions.items()
+    (resp. end_positions), the pos'th character from the start (resp. end) is among chars. Positions are 1-indexed.
+    Literals that are already implied by the positions are not included in literals.
+    """
+    min_length: int
+    max_length: Optional[int]
+    prefix: str
+    suffix: str
+    literals: list[str]
+    positions: dict[int, str]
+    end_positions: dict[int, str]
+
+    def __init__(self):
+        self.min_length = 0
+        self.max_length = None
+        self.prefix = ""
+        self.suffix = ""
+        self.literals = []
+        self.positions = {}
+        self.end_positions = {}
+
+    def __str__(self) -> str:
+        return f"length {self.min_length}..{self.max_length}, prefix {self.prefix!r}, suffix {self.suffix!r}, literals {self.literals}, positions {self.positions}, end positions {self.end_positions}"
+
+
+def _charset(items) -> Optional[str]:
+    chars = set()
+    for op, av in items:
+        if op is _constants.LITERAL:
+            chars.add(chr(av))
+        elif op is _constants.RANGE and av[1] - av[0] < _MAX_CHARSET:
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        else:  # NEGATE, categories etc.
+            return None
+        if len(chars) > _MAX_CHARSET:
+            return None
+    return "".join(sorted(chars))
+
+
+def _atoms(subpattern, literals: list[str]) -> list[_Atom]:
+    """
+    turns the parsed (sub-)pattern into a list of atoms. Literal strings that occur in every match of parts that are not
+    turned into atoms (such as repeats) are added to literals.
+    """
+    out = []
+    for op, av in subpattern:
+        if op is _constants.LITERAL:
+            out += [chr(av)]
+        elif op is _constants.ANY or op is _constants.NOT_LITERAL:
+            out += [None]
+        elif op is _constants.IN:
+            out += [_charset(av)]
+        elif op is _constants.SUBPATTERN and not av[1] and not av[2]:  # group without flags
+            out += _atoms(av[-1], literals)
+        elif op in _REPEATS:
+            lo, hi, item = av
+            item_atoms = _atoms(item, literals if lo > 0 else [])
+            if lo == hi and _VARIABLE not in item_atoms:
+                out += item_atoms * lo
+            else:
+                if lo > 0:
+                    literals += _literal_runs(item_atoms)
+                out += [_VARIABLE]
+        elif op in _ZERO_WIDTH:
+            continue
+        else:  # branches, back references etc.
+            out += [_VARIABLE]
+    return out
+
+
+def _literal_runs(atoms: list[_Atom]) -> list[str]:
+    """
+    maximal runs of consecutive atoms that match a single fixed character
+    """
+    runs = []
+    current = ""
+    for atom in atoms + [_VARIABLE]:
+        if isinstance(atom, str) and len(atom) == 1:
+            current += atom
+        else:
+            if current:
+                runs += [current]
+            current = ""
+    return runs
+
+
+def _fixed_prefix(atoms: list[_Atom]) -> str:
+    ret = ""
+    for atom in atoms:
+        if not (isinstance(atom, str) and len(atom) == 1):
+            break
+        ret += atom
+    return ret
+
+
+def analyze_regexp(pattern: str) -> RegexpAnalysis:
+    """
+    analyzes the regular expression pattern, see RegexpAnalysis.
+    """
+    ret = RegexpAnalysis()
+    parsed = _parser.parse(pattern)
+    lo, hi = parsed.getwidth()
+    ret.min_length = lo
+    ret.max_length = hi if hi < _constants.MAXREPEAT else None
+    if parsed.state.flags & re.IGNORECASE:
+        return ret
+
+    literals = []
+    atoms = _atoms(parsed, literals)
+    variable = [k for k, atom in enumerate(atoms) if atom is _VARIABLE]
+    head = atoms if not variable else atoms[:variable[0]]
+    tail = [] if not variable else atoms[variable[-1]+1:]
+    if variable:
+        literals += _literal_runs(atoms[variable[0]+1:variable[-1]])
+    ret.positions = {k+1: atom for k, atom in enumerate(head) if atom is not None}
+    ret.end_positions = {k+1: atom for k, atom in enumerate(reversed(tail)) if atom is not None}
+    ret.prefix = _fixed_prefix(head)
+    ret.suffix = _fixed_prefix(list(reversed(tail)))[::-1] if variable else ""
+    # keep only the longest literals that are not contained in one another; prefix and suffix are checked anyway.
+    literals = sorted(set(literals), key=len, reverse=True)
+    ret.literals = []
+    for literal in literals:
+        if not any(literal in other for other in ret.literals + [ret.prefix, ret.suffix]):
+            ret.literals += [literal]
+    return ret
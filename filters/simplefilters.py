@@ -1,18 +1,74 @@
 import re
+from typing import Optional
 import utils.morse as morse
+from dictmanager import UnfilteredDict
+from dictmanager.npbackend import np, CharMatrix, HISTOGRAM_ALPHABET
+from dictmanager.indexes import PositionIndex, PrefixGroups, letter_histogram, count_nearby_histograms, word_shape
+from dictmanager.trie import CharCondition
+from .regexanalysis import RegexpAnalysis, analyze_regexp
+from utils import bitset
+
+from .defs import Filter, SimpleFilter, FilterMakerMaker, FilterMaker, from_error_count, BinaryFilter, NP_DISCARD, binary_bitmap_tiers
+
+class LengthFilter(SimpleFilter):
+    """
+    Filter that ensures min_length <= len(s) <= max_length, where None means no restriction.
+    """
+    min_length: Optional[int]
+    max_length: Optional[int]
+
+    def __init__(self, display: str, *, min_length: Optional[int] = None, max_length: Optional[int] = None):
+        self.min_length = min_length
+        self.max_length = max_length
+        def cond(s: str) -> bool:
+            return (min_length is None or len(s) >= min_length) and (max_length is None or len(s) <= max_length)
+        super().__init__(cond, display, priority=-10)
+
+    def describe(self) -> dict:
+        return {"type": "length", "display": self.display, "min_length": self.min_length, "max_length": self.max_length, "active": self.active}
+
+    def np_mask(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        lengths = cm.lengths[ids]
+        mask = np.ones(len(ids), dtype=bool)
+        if self.min_length is not None:
+            mask &= lengths >= self.min_length
+        if self.max_length is not None:
+            mask &= lengths <= self.max_length
+        return mask
+
+    def bitmap_tiers(self, index: PositionIndex, candidates: int, *, max_errors: int = 0) -> list[int]:
+        passing = index.length_between(self.min_length, self.max_length)
+        return binary_bitmap_tiers(candidates, passing, max_errors=max_errors, allow_errors=False)
+
+def split_length_filters(filters: list[Filter]) -> tuple[Optional[int], Optional[int], list[Filter]]:
+    """
+    combines all active LengthFilters among filters into a single range.
+    Returns min_length, max_length and the remaining filters.
+    """
+    min_length = None
+    max_length = None
+    rest = []
+    for fil in filters:
+        if isinstance(fil, LengthFilter) and fil.active:
+            if fil.min_length is not None:
+                min_length = fil.min_length if min_length is None else max(min_length, fil.min_length)
+            if fil.max_length is not None:
+                max_length = fil.max_length if max_length is None else min(max_length, fil.max_length)
+        else:
+            rest += [fil]
+    return min_length, max_length, rest
 
-from .defs import Filter, SimpleFilter, FilterMakerMaker, FilterMaker, from_error_count, BinaryFilter
 def make_length_filter_exact(i: int) -> Filter:
     assert i >= 0
-    return SimpleFilter(lambda s: len(s) == i, "Length is exactly %s." % i, priority=-10)
+    return LengthFilter("Length is exactly %s." % i, min_length=i, max_length=i)
 
 def make_length_filter_minimum(i: int) -> Filter:
     assert i >= 0
-    return SimpleFilter(lambda s: len(s) >= i, "Length is at least %s." % i, priority=-10)
+    return LengthFilter("Length is at least %s." % i, min_length=i)
 
 def make_length_filter_maximum(i: int) -> Filter:
     assert i >= 0
-    return SimpleFilter(lambda s: len(s) <= i, "Length is at most %s." % i, priority=-10)
+    return LengthFilter("Length is at most %s." % i, max_length=i)
 
 def _assert_fun(cond: bool):
     assert cond
@@ -24,7 +80,7 @@ class _LengthFilterMakerExact(FilterMakerMaker):
 
     @classmethod
     def initializeFilter(cls, i) -> Filter:
-        return SimpleFilter(lambda s: len(s) == i, f"Length is exactly {i}.", priority=-10)
+        return LengthFilter(f"Length is exactly {i}.", min_length=i, max_length=i)
 
 class _LengthFilterMakerMin(FilterMakerMaker):
     description = "Ensure minimal length"
@@ -35,7 +91,7 @@ class _LengthFilterMakerMin(FilterMakerMaker):
     @classmethod
     def initializeFilter(cls, *args) -> Filter:
         i = args[0]
-        return SimpleFilter(lambda s: len(s) >= i, f"Length is at least {i}.", priority=-10)
+        return LengthFilter(f"Length is at least {i}.", min_length=i)
 
 class _LengthFilterMakerMax(FilterMakerMaker):
     description = "Ensure maximal length"
@@ -46,7 +102,7 @@ class _LengthFilterMakerMax(FilterMakerMaker):
     @classmethod
     def initializeFilter(cls, *args) -> Filter:
         i = args[0]
-        return SimpleFilter(lambda s: len(s) <= i, f"Length is at most {i}.", priority=-10)
+        return LengthFilter(f"Length is at most {i}.", max_length=i)
 
 
 LengthFilterExact: FilterMaker = _LengthFilterMakerExact.make_FilterMaker()
@@ -76,6 +132,9 @@ class ContainsFilter(Filter):
         self.substring = substring
         self.table = maketable(substring)
 
+    def describe(self) -> dict:
+        return {"type": "contains", "substring": self.substring, "active": self.active}
+
     def apply(self, input_list: list[str]) -> list[str]:
         return self.apply_with_errors(input_list)[0]
 
@@ -91,6 +150,83 @@ class ContainsFilter(Filter):
             return actual_errors
         return from_error_count(input_list, max_errors=max_errors, fun=count_errors)
 
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        # number of errors is sum_c max(table[c] - occurrences[c], 0), computed via the precomputed letter histogram
+        hist = cm.histogram[ids]
+        num_errors = np.zeros(len(ids), dtype=np.int32)
+        for c, letter in enumerate(HISTOGRAM_ALPHABET):
+            needed = self.table[letter]
+            if needed > 0:
+                num_errors += np.maximum(needed - hist[:, c].astype(np.int32), 0)
+        return num_errors
+
+class AnagramFilter(Filter):
+    """
+    Filter that ensures that the entry is an anagram of letters, i.e. consists of the same letters with the same
+    multiplicities (only letters a-z count, other characters are ignored). In fuzzy mode, each letter that needs to be
+    added or removed counts as an error.
+    Evaluated by lookups in the anagram index of the dict (see dictmanager/indexes.py) rather than by looking at the
+    entries.
+    """
+    letters: str
+    histogram: tuple[int, ...]
+
+    def __init__(self, letters: str):
+        super().__init__(allow_errors=True, priority=-10, display=f"Is an anagram of {letters}")
+        self.letters = letters
+        self.histogram = letter_histogram(letters)
+
+    def describe(self) -> dict:
+        return {"type": "anagram", "letters": self.letters, "active": self.active}
+
+    def apply(self, input_list: list[str]) -> list[str]:
+        return self.apply_with_errors(input_list)[0]
+
+    def apply_with_errors(self, input_list: list[str], *, max_errors: int = 0) -> list[list[str]]:
+        def count_errors(input_string) -> int:
+            return sum([abs(a - b) for a, b in zip(letter_histogram(input_string), self.histogram)])
+        return from_error_count(input_list, max_errors=max_errors, fun=count_errors)
+
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        hist = cm.histogram[ids]
+        num_errors = np.zeros(len(ids), dtype=np.int32)
+        for c in range(len(HISTOGRAM_ALPHABET)):
+            num_errors += np.abs(hist[:, c].astype(np.int32) - self.histogram[c])
+        return num_errors
+
+    def _prefer_lookups(self, source: UnfilteredDict, num_candidates: int, max_errors: int) -> bool:
+        # The number of lookups in the index grows combinatorially with max_errors, so if it exceeds the number of
+        # candidates, it is cheaper to compare their histograms directly. A lookup costs about as much as checking an
+        # entry in Python, but much more than checking an entry with numpy.
+        per_lookup = 1 if source.charmatrix is None else 32
+        return per_lookup * count_nearby_histograms(self.histogram, max_errors) <= num_candidates
+
+    def mask_tiers(self, source: UnfilteredDict, candidates: int, *, max_errors: int = 0) -> list[int]:
+        if not self._prefer_lookups(source, bitset.count(candidates), max_errors):
+            return super().mask_tiers(source, candidates, max_errors=max_errors)
+        return [tier & candidates for tier in source.anagram_index.tiers(self.histogram, max_errors)]
+
+    def error_counts(self, source: UnfilteredDict, ids: "np.ndarray", *, max_errors: int = 0) -> "np.ndarray":
+        # Used by the engine for fuzzy groups
+        if not self._prefer_lookups(source, len(ids), max_errors):
+            return super().error_counts(source, ids, max_errors=max_errors)
+        errs = np.full(len(ids), NP_DISCARD, dtype=np.int32)
+        for d, found in enumerate(source.anagram_index.tier_ids(self.histogram, max_errors)):
+            if found:
+                errs[np.isin(ids, found)] = d
+        return errs
+
+class _AnagramFilterMakerMaker(FilterMakerMaker):
+    description = "Anagram of given letters (fuzzy: letters added or removed)"
+    prompts = {"Enter letters: ": str}
+    num_args = 1
+
+    @classmethod
+    def initializeFilter(cls, letters: str) -> Filter:
+        return AnagramFilter(letters)
+
+AnagramFilterMaker = _AnagramFilterMakerMaker.make_FilterMaker()
+
 class _ContainsFilterMakerMaker(FilterMakerMaker):
     description = "Ensure that a substring is contained (in any order, with multiplicity)"
     prompts = {"Enter substring: ": str}
@@ -103,6 +239,33 @@ class _ContainsFilterMakerMaker(FilterMakerMaker):
 ContainsFilterMaker = _ContainsFilterMakerMaker.make_FilterMaker()
 
 
+class PositionFilter(BinaryFilter):
+    """
+    Filter that ensures that the pos'th (1-indexed) character is among options.
+    """
+    pos: int
+    options: str
+
+    def __init__(self, pos: int, options: str):
+        options = options.lower()
+        self.pos = pos
+        self.options = options
+        def cond(s: str) -> bool:
+            return len(s) >= pos and s[pos-1] in options
+        super().__init__(cond, f"The {pos}'th character is among {options}.", priority=-5)
+
+    def describe(self) -> dict:
+        return {"type": "position", "pos": self.pos, "options": self.options, "active": self.active}
+
+    def np_mask(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        return cm.char_table(self.options)[cm.char_at(ids, self.pos)]
+
+    def bitmap_tiers(self, index: PositionIndex, candidates: int, *, max_errors: int = 0) -> list[int]:
+        return binary_bitmap_tiers(candidates, index.any_of(self.pos, self.options), max_errors=max_errors)
+
+    def trie_conditions(self) -> tuple[list[CharCondition], int]:
+        return [CharCondition(self.pos, chars=self.options)], 0
+
 class _PositionFilterMakerMaker(FilterMakerMaker):
     description = "A given position is in a set of characters"
     prompts = {"Enter position (1-indexed): ": int, "Enter possible characters: ": str}
@@ -111,14 +274,42 @@ class _PositionFilterMakerMaker(FilterMakerMaker):
 
     @classmethod
     def initializeFilter(cls, pos: int, options: str) -> Filter:
-        options = options.lower()
-        def cond(s: str) -> bool:
-            return len(s) >= pos and s[pos-1] in options
-        return BinaryFilter(cond, f"The {pos}'th character is among {options}.", priority=-5)
+        return PositionFilter(pos, options)
 
 PositionFilterMaker = _PositionFilterMakerMaker.make_FilterMaker()
 
 
+class PatternFilter(BinaryFilter):
+    """
+    Filter that ensures that the characters at positions pos1 < pos2 (1-indexed) agree.
+    """
+    pos1: int
+    pos2: int
+
+    def __init__(self, pos1: int, pos2: int):
+        assert pos2 > pos1
+        self.pos1 = pos1
+        self.pos2 = pos2
+        def cond(s: str) -> bool:
+            return len(s) >= pos2 and s[pos2-1] == s[pos1-1]
+        super().__init__(cond, f"The {pos1}th and {pos2}th characters agree.", priority=-5)
+
+    def describe(self) -> dict:
+        return {"type": "pattern", "pos1": self.pos1, "pos2": self.pos2, "active": self.active}
+
+    def np_mask(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        return (cm.lengths[ids] >= self.pos2) & (cm.char_at(ids, self.pos1) == cm.char_at(ids, self.pos2))
+
+    def bitmap_tiers(self, index: PositionIndex, candidates: int, *, max_errors: int = 0) -> list[int]:
+        first = index.bitsets_at(self.pos1)
+        passing = 0
+        for c, bits in index.bitsets_at(self.pos2).items():
+            passing |= bits & first.get(c, 0)
+        return binary_bitmap_tiers(candidates, passing, max_errors=max_errors)
+
+    def trie_conditions(self) -> tuple[list[CharCondition], int]:
+        return [CharCondition(self.pos2, same_as=self.pos1)], 0
+
 class _PatternFilterMakerMaker(FilterMakerMaker):
     description = "Some characters are equal"
     prompts = {"Enter first position (1-indexed): ": int, "Enter second position (1-indexed): ": int}
@@ -131,13 +322,195 @@ class _PatternFilterMakerMaker(FilterMakerMaker):
             raise ValueError("Positions are equal. This is bogus.")
         if pos1 > pos2:
             pos1, pos2 = pos2, pos1
-        assert pos2 > pos1
-        def cond(s: str) -> bool:
-            return len(s) >= pos2 and s[pos2-1] == s[pos1-1]
-        return BinaryFilter(cond, f"The {pos1}th and {pos2}th characters agree.", priority=-5)
+        return PatternFilter(pos1, pos2)
 
 PatternFilterMaker = _PatternFilterMakerMaker.make_FilterMaker()
 
+
+class IsomorphFilter(Filter):
+    """
+    Filter for letter patterns as in cryptograms (cf. patternfilter in textfilter_old.py): Equal symbols of the pattern
+    stand for equal characters and different symbols for different characters, "." matches any character and a "$"
+    at the end allows arbitrary further characters (otherwise, the length must match exactly).
+    In fuzzy mode, each position that breaks the pattern counts as an error, i.e. a position whose character differs
+    from the first position with the same symbol, or the first position of a symbol whose character already stands for
+    an earlier symbol.
+    Whether an entry matches only depends on its shape (see dictmanager/indexes.py), so the filter is evaluated once
+    for each distinct shape in the dict rather than for each entry.
+    """
+    pattern: str
+    symbols: str  # pattern without the "$"
+    length: int
+    open_end: bool
+    anchors: list[Optional[int]]  # anchors[i] is the first position with the same symbol as position i, None for "."
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern
+        self.open_end = pattern.endswith("$")
+        self.symbols = pattern[:-1] if self.open_end else pattern
+        if len(self.symbols) == 0 or "$" in self.symbols:
+            raise ValueError(f"Invalid pattern {pattern}: '$' may only occur at the end.")
+        self.length = len(self.symbols)
+        first: dict[str, int] = {}
+        self.anchors = [None if c == "." else first.setdefault(c, i) for i, c in enumerate(self.symbols)]
+        super().__init__(allow_errors=True, priority=-5, display=f"Matches the letter pattern {pattern}")
+
+    def describe(self) -> dict:
+        return {"type": "isomorph", "pattern": self.pattern, "active": self.active}
+
+    def shape_errors(self, shape: bytes) -> int:
+        """
+        number of errors of an entry whose shape (of the first self.length characters) is shape
+        """
+        errors = 0
+        taken = set()  # (shapes of) the characters that stand for the symbols so far
+        for i, anchor in enumerate(self.anchors):
+            if anchor is None:
+                continue
+            if anchor == i:
+                if shape[i] in taken:
+                    errors += 1
+                taken.add(shape[i])
+            elif shape[i] != shape[anchor]:
+                errors += 1
+        return errors
+
+    def _group_errors(self, groups: PrefixGroups) -> "np.ndarray":
+        """
+        shape_errors for the shape of each group (vectorized over the groups)
+        """
+        shapes = groups.key_matrix()
+        errors = np.zeros(len(groups.keys), dtype=np.int32)
+        earlier: list[int] = []  # first positions of the symbols so far
+        for i, anchor in enumerate(self.anchors):
+            if anchor is None:
+                continue
+            if anchor == i:
+                if earlier:
+                    errors += (shapes[:, earlier] == shapes[:, [i]]).any(axis=1)
+                earlier.append(i)
+            else:
+                errors += shapes[:, i] != shapes[:, anchor]
+        return errors
+
+    def apply(self, input_list: list[str]) -> list[str]:
+        return self.apply_with_errors(input_list)[0]
+
+    def apply_with_errors(self, input_list: list[str], *, max_errors: int = 0) -> list[list[str]]:
+        def count_errors(input_string) -> int:
+            if len(input_string) < self.length or (len(input_string) > self.length and not self.open_end):
+                return -1
+            return self.shape_errors(word_shape(input_string, self.length))
+        return from_error_count(input_list, max_errors=max_errors, fun=count_errors)
+
+    def mask_tiers(self, source: UnfilteredDict, candidates: int, *, max_errors: int = 0) -> list[int]:
+        candidates &= source.bits_in_length_range(self.length, None if self.open_end else self.length)
+        if candidates == 0:
+            return [0 for _ in range(max_errors+1)]
+        groups = source.shape_index.groups(self.length)
+        if max_errors == 0 and "." not in self.symbols:
+            # The only matching shape is that of the pattern itself.
+            g = groups.group_by_key.get(word_shape(self.symbols))
+            return [groups.bits_of([g], source.size) & candidates if g is not None else 0]
+        if np is not None:
+            errors = self._group_errors(groups).tolist()
+        else:
+            errors = list(map(self.shape_errors, groups.keys))
+        by_errors: list[list[int]] = [[] for _ in range(max_errors+1)]
+        for g, e in enumerate(errors):
+            if e <= max_errors:
+                by_errors[e].append(g)
+        return [groups.bits_of(gs, source.size) & candidates for gs in by_errors]
+
+    def error_counts(self, source: UnfilteredDict, ids: "np.ndarray", *, max_errors: int = 0) -> "np.ndarray":
+        groups = source.shape_index.groups(self.length)
+        start, end = source.length_range(self.length, None if self.open_end else self.length)
+        errs = np.full(len(ids), NP_DISCARD, dtype=np.int32)
+        sel = (ids >= start) & (ids < end)
+        if sel.any():
+            errs[sel] = groups.values_of(ids[sel], self._group_errors(groups))
+        return errs
+
+class _IsomorphFilterMakerMaker(FilterMakerMaker):
+    description = "Match a letter pattern (e.g. ab.bba$ as in cryptograms)"
+    prompts = {"Enter pattern. Equal symbols stand for equal characters, different symbols for different characters,\n'.' matches any character and a '$' at the end allows arbitrary further characters: ": str}
+    num_args = 1
+
+    @classmethod
+    def initializeFilter(cls, pattern: str) -> Filter:
+        return IsomorphFilter(pattern)
+
+IsomorphFilterMaker = _IsomorphFilterMakerMaker.make_FilterMaker()
+
+class RegexpFilter(SimpleFilter):
+    """
+    Filter that ensures that the entry matches the given regular expression (as a whole).
+    Before running the actual regexp, the candidates are narrowed down using the length, prefix, suffix etc. that
+    every match must have (see regexanalysis.py), mostly via the indexes of the dict.
+    """
+    regexp: str
+    analysis: RegexpAnalysis
+
+    def __init__(self, regexp: str):
+        self.regexp = regexp
+        compile_regexp = re.compile(regexp)
+        self.analysis = analyze_regexp(regexp)
+        def cond(s: str) -> bool:
+            return compile_regexp.fullmatch(s) is not None
+        super().__init__(cond, f"Matches regexp {regexp}", priority=5)
+
+    def narrow(self, index: PositionIndex, candidates: int) -> int:
+        """
+        restricts candidates (a bitset of entry ids) to the entries that satisfy the length and position conditions
+        of the analysis, using only the index.
+        """
+        analysis = self.analysis
+        candidates &= index.length_between(analysis.min_length, analysis.max_length)
+        for pos, chars in analysis.positions.items():
+            if candidates == 0:
+                return 0
+            candidates &= index.any_of(pos, chars)
+        if analysis.end_positions and candidates != 0:
+            # Positions from the end are positions from the start for each fixed length.
+            longest = len(index.length_offsets) - 2
+            max_length = longest if analysis.max_length is None else min(analysis.max_length, longest)
+            out = 0
+            for n in range(max(analysis.min_length, max(analysis.end_positions)), max_length + 1):
+                of_length = candidates & index.length_between(n, n)
+                for pos, chars in analysis.end_positions.items():
+                    if of_length == 0:
+                        break
+                    of_length &= index.any_of(n + 1 - pos, chars)
+                out |= of_length
+            candidates = out
+        return candidates
+
+    def np_narrow(self, cm: CharMatrix, candidates: int) -> int:
+        """
+        restricts candidates to the entries that contain the letters of each required literal (with multiplicity),
+        using the letter histogram of the numpy backend.
+        """
+        needed = np.zeros(len(HISTOGRAM_ALPHABET), dtype=np.int32)
+        for literal in self.analysis.literals:
+            table = maketable(literal)
+            needed = np.maximum(needed, [table[letter] for letter in HISTOGRAM_ALPHABET])
+        letters = np.flatnonzero(needed)
+        if needed.sum() < 2 or candidates == 0:
+            return candidates  # a single letter rarely removes enough entries to be worth it
+        ids = bitset.to_id_array(candidates)
+        for c in letters.tolist():
+            ids = ids[cm.histogram[ids, c] >= needed[c]]
+        return bitset.from_id_array(ids, cm.size)
+
+    def mask_tiers(self, source: UnfilteredDict, candidates: int, *, max_errors: int = 0) -> list[int]:
+        candidates = self.narrow(source.position_index, candidates)
+        if source.charmatrix is not None:
+            candidates = self.np_narrow(source.charmatrix, candidates)
+        return super().mask_tiers(source, candidates, max_errors=max_errors)
+
+    def describe(self) -> dict:
+        return {"type": "regexp", "regexp": self.regexp, "active": self.active}
+
 class _RegexpFilterMakerMaker(FilterMakerMaker):
     description = "Match regular expression"
     prompts = {"Enter regular expression required to match: ": str}
@@ -145,25 +518,40 @@ class _RegexpFilterMakerMaker(FilterMakerMaker):
 
     @classmethod
     def initializeFilter(cls, regexp) -> Filter:
-        compile_regexp = re.compile(regexp)
-        def cond(s: str) -> bool:
-            return compile_regexp.fullmatch(s) is not None
-        return SimpleFilter(cond, f"Matches regexp {regexp}")
+        return RegexpFilter(regexp)
 
 RegexpFilterMaker = _RegexpFilterMakerMaker.make_FilterMaker()
 
 
 class MorseFilter(Filter):
+    """
+    Filter that ensures that the i'th character is among must_match[i] (given by a Morse pattern, see
+    utils/morse.py) for each i. Longer entries are allowed. In fuzzy mode, each position that does not match counts
+    as an error.
+    Strict evaluation uses the position index (see bitmap_tiers). For fuzzy groups, each position restricts the
+    possible lengths of the Morse code of its character, which the Morse index of the dict (see dictmanager/indexes.py)
+    answers per group of entries. If the pattern only consists of code lengths (and "*"), that is all there is to check;
+    otherwise, only the remaining candidates are checked position by position.
+    """
     pattern: str
     must_match: list[str]
+    code_lengths: list[set[int]]  # code_lengths[i] are the lengths of the Morse codes of the characters in must_match[i]
+    lengths_only: bool  # whether must_match[i] consists of all characters with a Morse code length in code_lengths[i]
 
     def __init__(self, pattern):
         s = f"Must match the following Morse pattern: {pattern}"
         self.pattern = pattern
         parsed_pattern: list[str] = morse.parse_patterns(pattern)
         self.must_match: list[str] = [morse.make_morse_matches(p) for p in parsed_pattern]
+        self.code_lengths = [{len(morse.MORSECODE[c]) for c in chars} for chars in self.must_match]
+        self.lengths_only = all(
+            set(chars) == {c for c, code in morse.MORSECODE.items() if len(code) in lengths}
+            for chars, lengths in zip(self.must_match, self.code_lengths))
         super().__init__(allow_errors=True, priority=-2, display=s)
 
+    def describe(self) -> dict:
+        return {"type": "morse", "pattern": self.pattern, "active": self.active}
+
     def apply_with_errors(self, input_list: list[str], *, max_errors: int = 0) -> list[list[str]]:
         def count_errors(input_string) -> int:
             if len(input_string) < len(self.must_match):
@@ -178,6 +566,62 @@ class MorseFilter(Filter):
     def apply(self, input_list: list[str]) -> list[str]:
         return self.apply_with_errors(input_list)[0]
 
+    def np_errors(self, cm: CharMatrix, ids: "np.ndarray") -> "np.ndarray":
+        num_errors = np.zeros(len(ids), dtype=np.int32)
+        for i in range(len(self.must_match)):
+            num_errors += ~cm.char_table(self.must_match[i])[cm.char_at(ids, i+1)]
+        num_errors[cm.lengths[ids] < len(self.must_match)] = NP_DISCARD
+        return num_errors
+
+    def bitmap_tiers(self, index: PositionIndex, candidates: int, *, max_errors: int = 0) -> list[int]:
+        # out[e] are the candidates with e errors among the positions considered so far.
+        # For each position, the candidates not matching it move up one tier (i.e. we add the bitsets).
+        # We can never have more errors than positions.
+        limit = min(max_errors, len(self.must_match))
+        out = [0 for _ in range(limit+1)]
+        out[0] = candidates & index.length_at_least(len(self.must_match))
+        for i in range(len(self.must_match)):
+            matches = index.any_of(i+1, self.must_match[i])
+            new_out = [0 for _ in range(limit+1)]
+            for e in range(limit+1):
+                new_out[e] |= out[e] & matches
+                if e < limit:
+                    new_out[e+1] |= out[e] & ~matches
+            out = new_out
+        return out + [0 for _ in range(max_errors - limit)]
+
+    def trie_conditions(self) -> tuple[list[CharCondition], int]:
+        return [CharCondition(i+1, chars=self.must_match[i]) for i in range(len(self.must_match))], len(self.must_match)
+
+    def _group_errors(self, groups: PrefixGroups) -> list[int]:
+        """
+        number of positions whose code length does not fit for each group of the Morse index, which is a lower bound
+        for the number of errors of its entries (and exact if lengths_only)
+        """
+        if np is None:
+            return [sum([key[i] not in lengths for i, lengths in enumerate(self.code_lengths)]) for key in groups.keys]
+        keys = groups.key_matrix()
+        errors = np.zeros(len(groups.keys), dtype=np.int32)
+        for i, lengths in enumerate(self.code_lengths):
+            table = np.ones(256, dtype=bool)
+            table[list(lengths)] = False
+            errors += table[keys[:, i]]
+        return errors.tolist()
+
+    def error_counts(self, source: UnfilteredDict, ids: "np.ndarray", *, max_errors: int = 0) -> "np.ndarray":
+        num_positions = len(self.must_match)
+        if num_positions == 0:
+            return super().error_counts(source, ids, max_errors=max_errors)
+        groups = source.morse_index.groups(num_positions)
+        errs = np.full(len(ids), NP_DISCARD, dtype=np.int32)
+        sel = ids >= groups.start
+        if sel.any():
+            errs[sel] = groups.values_of(ids[sel], np.array(self._group_errors(groups), dtype=np.int32))
+        if not self.lengths_only:
+            check = np.flatnonzero(errs <= max_errors)
+            errs[check] = self.np_errors(source.charmatrix, ids[check])
+        return errs
+
 class _MorseFilterMakerMaker(FilterMakerMaker):
     description = "Filter by (partial knowledge of) morse code"
     prompts = {"Valid conditions are\n - 1,2,3,4: Characters' morse code has that length.\n - a-z: must match that character.\n - '*': match any character\n - a sequence of '.','-' and '?'s: Match character with corresponding morse code.\nEnter list of conditions. Separate morse-code by whitespace: ": str}
@@ -187,4 +631,32 @@ class _MorseFilterMakerMaker(FilterMakerMaker):
     def initializeFilter(cls, pattern) -> Filter:
         return MorseFilter(pattern)
 
-MorseFilterMaker = _MorseFilterMakerMaker.make_FilterMaker()
\ No newline at end of file
+MorseFilterMaker = _MorseFilterMakerMaker.make_FilterMaker()
+
+
+def filter_from_description(description: dict) -> Filter:
+    """
+    recreates a filter from the output of its describe method. Raises ValueError for unknown descriptions.
+    """
+    kind = description.get("type")
+    if kind == "length":
+        fil = LengthFilter(description["display"], min_length=description["min_length"], max_length=description["max_length"])
+    elif kind == "contains":
+        fil = ContainsFilter(description["substring"])
+    elif kind == "anagram":
+        fil = AnagramFilter(description["letters"])
+    elif kind == "position":
+        fil = PositionFilter(description["pos"], description["options"])
+    elif kind == "pattern":
+        fil = PatternFilter(description["pos1"], description["pos2"])
+    elif kind == "isomorph":
+        fil = IsomorphFilter(description["pattern"])
+    elif kind == "regexp":
+        fil = RegexpFilter(description["regexp"])
+    elif kind == "morse":
+        fil = MorseFilter(description["pattern"])
+    else:
+        raise ValueError(f"Unknown filter description {description}")
+    if not description.get("active", True):
+        fil.make_inactive()
+    return fil
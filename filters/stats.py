@@ -0,0 +1,110 @@
+import random
+import time
+from typing import Optional
+from utils import bitset
+
+SAMPLE_SIZE = 1000  # number of entries used to estimate the statistics of a filter before it is run for real
+
+
+class FilterRun:
+    """
+    A single application of a filter to a dict (or list): wall time, number of input entries and number of output
+    entries in each error tier, i.e. tier_sizes[e] entries have e errors in total after applying the filter.
+    """
+    seconds: float
+    words_in: int
+    tier_sizes: list[int]
+
+    def __init__(self, seconds: float, words_in: int, tier_sizes: list[int]):
+        self.seconds = seconds
+        self.words_in = words_in
+        self.tier_sizes = tier_sizes
+
+    def __str__(self) -> str:
+        return f"{1000 * self.seconds:.1f}ms, {self.words_in} in, out {' / '.join(map(str, self.tier_sizes))}"
+
+
+class FilterStats:
+    """
+    Measured statistics of a filter: how many entries it was applied to, how many passed (without error) and how
+    long this took. This is used to order the filters within a group (see State._evaluation_order).
+    Before a filter was actually run, the statistics may be estimated from a sample (see sample_filter_stats).
+    Additionally, the most recent application of the filter to each dict is kept in runs (keyed by the displayed name
+    of the dict), which is shown by the frontend.
+    """
+    words_in: int
+    words_passed: int
+    seconds: float
+    sampled: bool  # whether the statistics are only estimated from a sample
+    runs: dict[str, FilterRun]
+
+    def __init__(self):
+        self.words_in = 0
+        self.words_passed = 0
+        self.seconds = 0.0
+        self.sampled = False
+        self.runs = {}
+
+    def record(self, words_in: int, words_passed: int, seconds: float, *, sampled: bool = False, source: Optional[str] = None, tier_sizes: Optional[list[int]] = None):
+        """
+        records an application of the filter. If source (the name of the dict) and tier_sizes (see FilterRun) are
+        given, this also replaces the recorded run for source.
+        """
+        if sampled and self.has_data and not self.sampled:
+            return
+        if source is not None and tier_sizes is not None and not sampled:
+            self.runs[source] = FilterRun(seconds, words_in, tier_sizes)
+        if words_in == 0:
+            # says nothing about cost or pass rate, so it must not replace an estimate either
+            return
+        if self.sampled and not sampled:
+            # actual measurements replace estimates
+            self.words_in, self.words_passed, self.seconds = 0, 0, 0.0
+        self.words_in += words_in
+        self.words_passed += words_passed
+        self.seconds += seconds
+        self.sampled = sampled
+
+    @property
+    def has_data(self) -> bool:
+        return self.words_in > 0
+
+    @property
+    def pass_rate(self) -> float:
+        return self.words_passed / self.words_in if self.words_in > 0 else 1.0
+
+    @property
+    def seconds_per_word(self) -> float:
+        return self.seconds / self.words_in if self.words_in > 0 else 0.0
+
+    @property
+    def expected_cost(self) -> float:
+        """
+        Cost per entry divided by the fraction of entries that get removed. Running filters with lower expected cost
+        first minimizes the total time (for independent filters).
+        """
+        return self.seconds_per_word / max(1.0 - self.pass_rate, 1e-6)
+
+    def __str__(self) -> str:
+        if not self.has_data:
+            return "no statistics yet"
+        s = f"passes {100 * self.pass_rate:.1f}%, {1e6 * self.seconds_per_word:.2f}µs per entry"
+        if self.sampled:
+            s += " (estimated)"
+        return s
+
+
+def sample_filter_stats(fil, source, *, sample_size: int = SAMPLE_SIZE):
+    """
+    estimates the statistics of the filter fil by running it on a (reproducible) random sample of the dict source.
+    The filter is run once untimed first, so building the indexes it uses on first use (such as the anagram index or
+    the trie) does not count towards its cost per entry.
+    """
+    if source.size == 0:
+        return
+    sample = random.Random(0).sample(range(source.size), min(sample_size, source.size))
+    candidates = bitset.from_ids(sample, source.size)
+    fil.mask_tiers(source, candidates, max_errors=0)
+    start = time.perf_counter()
+    res = fil.mask_tiers(source, candidates, max_errors=0)
+    fil.stats.record(len(sample), bitset.count(res[0]), time.perf_counter() - start, sampled=True)
@@ -0,0 +1,95 @@
+import shutil
+import sys
+from typing import Callable, Iterable, Iterator, Optional
+
+# Output of (potentially huge) lists of entries to the terminal:
+# The entries are laid out in columns, where the column width is computed per page (so a few long entries only widen
+# the columns of their own page) and each page is written with a single write call. Writing line by line (or even
+# word by word) is what makes printing tens of thousands of entries slow, in particular on a remote terminal.
+
+COLUMN_SEP = 3  # minimal number of spaces between columns
+PAGE_ROWS = 40  # rows per page if the size of the terminal is unknown
+
+
+def tier_header(errors: int) -> str:
+    return f"--- {errors} deviation{'' if errors == 1 else 's'} ---"
+
+
+def layout_pages(chunks: Iterable[tuple[int, list[str]]], width: int, rows: int, *, headers: bool = False) -> Iterator[str]:
+    """
+    lays out the entries given as pairs (number of errors, chunk of entries) (see State.iter_filtered) in pages of
+    at most rows lines of at most width characters (unless a single entry is longer) and yields the pages as strings.
+    With headers, every tier of entries with the same number of errors starts with a line tier_header(errors).
+    """
+    rows = max(rows, 2)
+    lines: list[str] = []
+    page: list[str] = []  # entries of the current block of lines, i.e. the current tier on the current page
+    max_len = 0
+    current_errors: Optional[int] = None
+
+    def flush_block():
+        nonlocal page, max_len
+        if page:
+            column_width = max_len + COLUMN_SEP
+            columns = max(width // column_width, 1)
+            for k in range(0, len(page), columns):
+                lines.append("".join([entry.ljust(column_width) for entry in page[k:k+columns]]).rstrip())
+        page = []
+        max_len = 0
+
+    for errors, words in chunks:
+        for word in words:
+            if errors != current_errors:
+                flush_block()
+                current_errors = errors
+                if headers:
+                    if len(lines) + 1 >= rows:
+                        yield "\n".join(lines)
+                        lines = []
+                    lines.append(tier_header(errors))
+            # The capacity of the page shrinks with the length of its longest entry, so we check whether word still
+            # fits if it determines the column width. If not, the page is finished and word starts the next one.
+            new_max_len = max(max_len, len(word))
+            columns = max(width // (new_max_len + COLUMN_SEP), 1)
+            if len(page) + 1 > (rows - len(lines)) * columns:
+                flush_block()
+                yield "\n".join(lines)
+                lines = []
+                new_max_len = len(word)
+            page.append(word)
+            max_len = new_max_len
+    flush_block()
+    if lines:
+        yield "\n".join(lines)
+
+
+def page_output(pages: Iterable[str], *, interactive: Optional[bool] = None, ask: Callable[[str], str] = input, out=None) -> bool:
+    """
+    writes the pages (see layout_pages) to out (default: sys.stdout). If interactive (default: whether stdin and
+    stdout are terminals), the user is asked to continue after each page except the last one.
+    Returns False if the user stopped before the last page.
+    """
+    out = sys.stdout if out is None else out
+    if interactive is None:
+        interactive = sys.stdin.isatty() and out.isatty()
+    pages = iter(pages)
+    page = next(pages, None)
+    number = 1
+    while page is not None:
+        out.write(page + "\n")
+        out.flush()
+        page = next(pages, None)
+        if page is not None and interactive:
+            answer = ask(f"-- Page {number}: press enter for the next page, q to stop --")
+            if answer.strip().lower().startswith("q"):
+                return False
+        number += 1
+    return True
+
+
+def terminal_size(default_width: int) -> tuple[int, int]:
+    """
+    (width, rows per page) to use for paging; the given width is used if the terminal size is unknown.
+    """
+    size = shutil.get_terminal_size((default_width, PAGE_ROWS + 2))
+    return size.columns, max(size.lines - 2, 2)  # leave room for the prompt
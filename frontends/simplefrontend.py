@@ -1,7 +1,11 @@
-from state import State
-from filters import Filter, FilterMaker, LengthFilterMin, LengthFilterExact, LengthFilterMax, ContainsFilterMaker, PositionFilterMaker, PatternFilterMaker, RegexpFilterMaker, MorseFilterMaker
+from state import State, BackgroundEvaluator
+from filters import Filter, FilterMaker, LengthFilterMin, LengthFilterExact, LengthFilterMax, ContainsFilterMaker, AnagramFilterMaker, PositionFilterMaker, PatternFilterMaker, IsomorphFilterMaker, RegexpFilterMaker, MorseFilterMaker
 import re
 from dictmanager import normalizeStreets, normalizeToAscii, DictSpecification
+from dictmanager.loader import open_dict_file
+from dictmanager.morsestream import parse_stream
+from typing import Iterable
+from .pager import layout_pages, page_output, terminal_size
 
 _RUN_EXIT = 0
 _RUN_MAIN = 1
@@ -10,8 +14,10 @@ _RUN_GROUPS = 3
 
 PRETTYWIDTH = 300
 DISPLAY_COLUMNS = 8
+MULTIWORD_ANAGRAM_LIMIT = 1000
+MORSE_STREAM_LIMIT = 1000
 
-FILTERS: list[FilterMaker] = [LengthFilterExact, LengthFilterMax, LengthFilterMin, ContainsFilterMaker, PositionFilterMaker, PatternFilterMaker, MorseFilterMaker, RegexpFilterMaker]
+FILTERS: list[FilterMaker] = [LengthFilterExact, LengthFilterMax, LengthFilterMin, ContainsFilterMaker, PositionFilterMaker, PatternFilterMaker, MorseFilterMaker, RegexpFilterMaker, AnagramFilterMaker, IsomorphFilterMaker]
 NORMALIZERS = {"Prepropress strees names": normalizeStreets,
                "Normalize Umlauts et al.": normalizeToAscii}
 
@@ -19,32 +25,31 @@ def wait_for_enter():
     input("Press enter to continue.")
 
 class SimpleFrontEnd:
+    background: bool = True  # evaluate the filters in a background thread, so the menu does not block
+    evaluator: BackgroundEvaluator | None
+
     def __init__(self):
-        pass
+        self.evaluator = None
 
 
     @classmethod
     def pretty_print_dict(cls, d: list[str]):
-        if len(d) == 0:
+        cls.pretty_print_chunks([(0, d)], len(d))
+
+    @classmethod
+    def pretty_print_chunks(cls, chunks: Iterable[tuple[int, list[str]]], total: int, *, headers: bool = False):
+        """
+        prints total many entries, given as pairs (number of errors, chunk of entries) (see State.iter_filtered),
+        page by page.
+        """
+        if total == 0:
             print("***NO ENTRY MATCHES THE FILTERS***")
-        elif len(d) <= 10:
-            for entry in d:
-                print(entry)
+        elif total <= 10 and not headers:
+            print("\n".join([entry for _, words in chunks for entry in words]))
         else:
-            max_len = max([len(entry) for entry in d]) + 3
-            words_per_column = PRETTYWIDTH // max_len
-            # print(max_len, words_per_column)
-            # wait_for_enter()
-            if words_per_column == 0:
-                words_per_column = 1
-            for index in range(len(d)):
-                sep = ""
-                if index % words_per_column == words_per_column-1:
-                    sep = "\n"
-                print("{0:<{width}}".format(d[index], width=max_len), end=sep)
-            print("\n\n", end="")
-
-
+            width, rows = terminal_size(PRETTYWIDTH)
+            page_output(layout_pages(chunks, width, rows, headers=headers))
+            print()
 
     @classmethod
     def continue_read_number(cls, read_input: str, message: str) -> int | None:
@@ -92,23 +97,111 @@ class SimpleFrontEnd:
         return read_number
 
 
+    def wait_for_dict(self, state: State, dict_index: int) -> bool:
+        """
+        waits until the dict with the given (1-based) index is evaluated. Returns False if the user aborted (Ctrl-C).
+        """
+        if self.evaluator is None or not state.is_pending(dict_index):
+            return True
+        print(f"Waiting for the filters to be evaluated on {state.unfiltered_dicts[dict_index - 1]}. Press Ctrl-C to abort.")
+        try:
+            self.evaluator.wait_for(dict_index)
+        except KeyboardInterrupt:
+            print("Aborted.")
+            return False
+        return True
+
     def command_print(self, state: State, read_input: str):
         dict_index = self.get_dict_index(state, read_input)
         if dict_index is None:
             return
-        self.pretty_print_dict(state.filtered_dicts[dict_index - 1])
+        if not self.wait_for_dict(state, dict_index):
+            return
+        tier_sizes = state.count_filtered_tiers(dict_index)
+        self.pretty_print_chunks(state.iter_filtered(dict_index), sum(tier_sizes), headers=len(tier_sizes) > 1)
         wait_for_enter()
 
     def command_save(self, state: State, read_input: str):
         dict_index = self.get_dict_index(state, read_input)
         if dict_index is None:
             return
-        filename = input("Please enter filename: ")
-        with open(filename, "w") as f:
-            for word in state.filtered_dicts[dict_index - 1]:
-                f.write(word + "\n")
+        filename = input("Please enter filename (ending in .gz, .xz or .bz2 to compress): ")
+        if not self.wait_for_dict(state, dict_index):
+            return
+        annotate = False
+        if len(state.count_filtered_tiers(dict_index)) > 1:
+            annotate = input("Append the number of deviations to each entry (separated by a tab)? (y/N) ").strip().lower() == "y"
+        try:
+            with open_dict_file(filename, "utf-8", mode="w") as f:
+                for errors, words in state.iter_filtered(dict_index):
+                    if annotate:
+                        f.write("".join([f"{word}\t{errors}\n" for word in words]))
+                    else:
+                        f.write("\n".join(words) + "\n")
+        except OSError as e:
+            input(f"Could not write {filename}: {e}\nPlease press enter to continue.")
+            return
         input("Success. Please press enter to continue.")
 
+    def command_multiword_anagrams(self, state: State):
+        letters = input("Enter letters: ")
+        try:
+            num_words = int(input("Enter number of words: "))
+            lengths_input = input("Enter the numbers of letters of the words, separated by spaces (empty for any): ").split()
+            lengths = [int(n) for n in lengths_input] if lengths_input else None
+            limit_input = input(f"Enter maximal number of results (empty for {MULTIWORD_ANAGRAM_LIMIT}): ")
+            limit = int(limit_input) if limit_input else MULTIWORD_ANAGRAM_LIMIT
+        except ValueError as e:
+            print(f"Invalid input {e}\nAborting.")
+            wait_for_enter()
+            return
+        if num_words < 1:
+            print(f"Number {num_words} is not meaningful.\nAborting.")
+            wait_for_enter()
+            return
+        if lengths is not None and len(lengths) != num_words:
+            print(f"Expected {num_words} numbers of letters, got {len(lengths)}.\nAborting.")
+            wait_for_enter()
+            return
+        print("Searching. Press Ctrl-C to abort.")
+        found = 0
+        try:
+            # Results are printed as they are found; the search itself can take a while.
+            for combination in state.multiword_anagrams(letters, num_words, lengths=lengths, limit=limit):
+                print(" ".join(combination), flush=True)
+                found += 1
+        except KeyboardInterrupt:
+            print("Aborted.")
+        print(f"{found} combinations found" + (" (limit reached)" if found == limit else ""))
+        wait_for_enter()
+
+    def command_morse_stream(self, state: State):
+        try:
+            stream = parse_stream(input("Enter Morse code without separators (. and -): "))
+            max_words = int(input("Enter maximal number of words: "))
+            max_errors_input = input("Enter the number of wrong symbols allowed (empty for 0): ")
+            max_errors = int(max_errors_input) if max_errors_input else 0
+            limit_input = input(f"Enter maximal number of results (empty for {MORSE_STREAM_LIMIT}): ")
+            limit = int(limit_input) if limit_input else MORSE_STREAM_LIMIT
+        except ValueError as e:
+            print(f"Invalid input {e}\nAborting.")
+            wait_for_enter()
+            return
+        if max_words < 1 or max_errors < 0:
+            print("Numbers are not meaningful.\nAborting.")
+            wait_for_enter()
+            return
+        print("Searching. Press Ctrl-C to abort.")
+        found = 0
+        try:
+            for errors, words in state.decode_morse_stream(stream, max_words=max_words, max_errors=max_errors, limit=limit):
+                print(" ".join(words) + (f"\t({errors} wrong)" if errors else ""), flush=True)
+                found += 1
+        except KeyboardInterrupt:
+            print("Aborted.")
+        print(f"{found} decodings found" + (" (limit reached)" if found == limit else ""))
+        wait_for_enter()
+
     def run_main(self, state: State) -> int:
         while True:
             state.validate()
@@ -129,6 +222,8 @@ class SimpleFrontEnd:
             if state.active:
                 print("p: Print candidates", end="\t\t")
                 print("s: Save candidates to file", end="\n")
+            print("w: Split letters into several words (multi-word anagrams)", end="\n")
+            print("m: Decode Morse code without separators into words", end="\n")
 
             print("Add filter ('f1' means to enter the string 'f1', not the F1 key):")
             for i in range(len(FILTERS)):
@@ -176,6 +271,12 @@ class SimpleFrontEnd:
                 case 's' if state.active:
                     self.command_save(state, read_input)
 
+                case 'w':
+                    self.command_multiword_anagrams(state)
+
+                case 'm':
+                    self.command_morse_stream(state)
+
                 case 'f':
                     read_input = read_input[1:]
                     try:
@@ -212,6 +313,7 @@ class SimpleFrontEnd:
             print("f: Manage filters", end="\t\t")
             print("g: Manage fuzzyness groups", end="\t")
             print("d: Add dict", end="\n")
+            print("m: Show memory usage and load statistics", end="\n")
 
             if state.active:
                 print("p: Print candidates", end="\t\t")
@@ -232,6 +334,12 @@ class SimpleFrontEnd:
                     return _RUN_EXIT
                 case "f":
                     return _RUN_MAIN
+                case "m":
+                    for u in state.unfiltered_dicts:
+                        print(u.memory_report())
+                        if u.load_stats is not None:
+                            print(f"    loading: {u.load_stats}")
+                    wait_for_enter()
                 case "g":
                     return _RUN_GROUPS
                 case 'p' if state.active:
@@ -272,6 +380,16 @@ class SimpleFrontEnd:
 
 
     def run(self, state: State):
+        if self.background:
+            self.evaluator = BackgroundEvaluator(state)
+        try:
+            self.run_loop(state)
+        finally:
+            if self.evaluator is not None:
+                self.evaluator.close(wait=False)
+                self.evaluator = None
+
+    def run_loop(self, state: State):
         runner = _RUN_MAIN
         while True:
             if runner == _RUN_EXIT:
@@ -304,16 +422,29 @@ class SimpleFrontEnd:
         if not state.active:
             print("***Evaluation of filters is currently turned off***")
             self.printseps()
+        num_pending = sum(1 for i in range(1, len(state.dict_specs)+1) if state.is_pending(i))
+        if num_pending > 0:
+            print(f"***Evaluating filters in the background: {len(state.dict_specs) - num_pending} of {len(state.dict_specs)} dictionaries done (press enter to refresh)***")
+            self.printseps()
+        if self.evaluator is not None and self.evaluator.error is not None:
+            print(f"***Error during evaluation: {self.evaluator.error}***")
+            self.evaluator.error = None
+            self.printseps()
         print("Currently loaded dictionaries:")
         for i in range(len(state.dict_specs)):
             s = f"    {i+1}: {state.unfiltered_dicts[i]}"
             unfilteredsize = state.unfiltered_dicts[i].size
-            filteredsize = len(state.filtered_dicts[i])
             if not state.active or not state.unfiltered_dicts[i].is_active:
                 # s += f" ({unfilteredsize} entries)"
                 pass
+            elif state.is_pending(i+1):
+                s += f" (evaluating…, {unfilteredsize} entries)"
             else:
-                s += f" ({filteredsize} out of {unfilteredsize} many entries pass the filters)"
+                tier_sizes = state.count_filtered_tiers(i+1)
+                s += f" ({sum(tier_sizes)} out of {unfilteredsize} many entries pass the filters"
+                if len(tier_sizes) > 1:
+                    s += f"; by number of deviations: {' / '.join(map(str, tier_sizes))}"
+                s += ")"
             print(s)
         self.printseps()
         if len(state.selected_filters) == 0:
@@ -323,6 +454,7 @@ class SimpleFrontEnd:
             grouplabel = 65
             index = 1
             fils_by_gp = state.filter_by_group
+            evaluated_dicts = [(i, u.spec.display) for i, u in enumerate(state.unfiltered_dicts, 1) if state.active and u.is_active and not state.is_pending(i)]
             for gp in fils_by_gp.keys():
                 if gp is state.StrictGroup:
                     pass
@@ -335,8 +467,22 @@ class SimpleFrontEnd:
                     if len(fils_by_gp[gp]) == 0:
                         print(f"        **NO FILTERS IN THIS GROUP**")
                 for fil in fils_by_gp[gp]:
-                    print(f"        {index}: {fil}")
+                    if fil.stats.has_data:
+                        print(f"        {index}: {fil}    [{fil.stats}]")
+                    else:
+                        print(f"        {index}: {fil}")
+                    if fil.active:
+                        for _, display in evaluated_dicts:
+                            if display in fil.stats.runs:
+                                print(f"            on {display}: {fil.stats.runs[display]}")
                     index += 1
+                if len(fils_by_gp[gp]) > 1:
+                    for i, display in evaluated_dicts:
+                        summary = state.group_summary(i, gp)
+                        if summary is not None:
+                            print(f"        all filters above on {display}: {summary}")
+        if state.last_profile is not None:
+            print(f"Profile of the last evaluation written to {state.last_profile}")
         self.printseps()
 
 def filter_from_FilterMaker(fm: FilterMaker) -> Filter | None:
@@ -1,5 +1,7 @@
+import os
 from dictmanager import DictSpecification, UnfilteredDict, normalizeToAscii, normalizeStreets
-from state import State
+from state import State, QueryServer, QueryClient, RemoteState
+from state.server import parse_address
 from frontends import SimpleFrontEnd
 
 NGERMAN = DictSpecification("/usr/share/dict/ngerman", normalizer=normalizeToAscii)
@@ -7,10 +9,39 @@ DORTMUND = DictSpecification( "./dicts/Dortmund.txt", normalizer=normalizeStreet
 
 DICT_SPECS = [NGERMAN, DORTMUND]
 
-STATE = State(DICT_SPECS)
-STATE.validate()
+# RAETSEL_TRIE=1 evaluates positional filters by traversing a trie of each dict (see dictmanager/trie.py)
+UnfilteredDict.use_trie = os.environ.get("RAETSEL_TRIE", "0") == "1"
+# RAETSEL_SERVE=[host:]port loads the dicts once and serves filter queries to clients instead of running the frontend
+# (see state/server.py). RAETSEL_CONNECT=[host:]port runs the frontend on the dicts of such a server (see
+# state/client.py) instead of loading them. The server only binds to loopback addresses unless RAETSEL_SERVE_REMOTE=1
+# and only lets clients add dicts (from any path it can read) if RAETSEL_SERVE_ADD_DICTS=1.
+SERVE = os.environ.get("RAETSEL_SERVE")
+CONNECT = os.environ.get("RAETSEL_CONNECT")
+if SERVE:
+    SERVER = QueryServer(DICT_SPECS, parse_address(SERVE), allow_remote=os.environ.get("RAETSEL_SERVE_REMOTE", "0") == "1",
+                         allow_add_dict=os.environ.get("RAETSEL_SERVE_ADD_DICTS", "0") == "1")
+elif CONNECT:
+    STATE = RemoteState(QueryClient(CONNECT))
+else:
+    # RAETSEL_WORKERS=n evaluates large dicts in n worker processes (see state/pool.py)
+    STATE = State(DICT_SPECS, num_workers=int(os.environ.get("RAETSEL_WORKERS", "0")))
+if not SERVE:
+    # RAETSEL_PROFILE=dir writes a cProfile dump of every evaluation to dir (see State._profiled)
+    STATE.profile_dir = os.environ.get("RAETSEL_PROFILE")
+    STATE.validate()
 
+# RAETSEL_BACKGROUND=0 evaluates the filters in the foreground, blocking the menu (see state/background.py)
+SimpleFrontEnd.background = os.environ.get("RAETSEL_BACKGROUND", "1") == "1"
 FRONTEND = SimpleFrontEnd()
 
 if __name__ == "__main__":
-    FRONTEND.run(STATE)
\ No newline at end of file
+    if SERVE:
+        print(f"Serving {len(SERVER.dicts)} dicts on {SERVER.server_address[0]}:{SERVER.server_address[1]}. Press Ctrl-C to stop.")
+        try:
+            SERVER.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            SERVER.server_close()
+    else:
+        FRONTEND.run(STATE)
\ No newline at end of file
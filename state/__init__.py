@@ -1 +1,4 @@
-from .state import State
\ No newline at end of file
+from .state import State
+from .background import BackgroundEvaluator
+from .server import QueryServer
+from .client import QueryClient, RemoteState, ServerError
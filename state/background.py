@@ -0,0 +1,116 @@
+import threading
+from typing import Optional
+from .evaluation import EvaluationCancelled
+from .state import State
+
+# Background evaluation (used by the frontend, so the menu stays responsive while filters are running):
+# The State is switched to deferred evaluation, so changes to it only record which dicts need to be evaluated (see
+# State.is_pending). A worker thread picks up the pending dicts one by one. It takes a snapshot of the work under the
+# lock of the State, computes the results without holding the lock and only stores them if the State did not change
+# meanwhile (i.e. State.generation is unchanged). Otherwise, the computation is stale: it is aborted at the next check
+# (between groups, between filters and between chunks of entries, see evaluate_filter_groups) and the new pending work
+# is picked up instead. The same happens if someone waits for a different dict (see wait_for).
+
+
+class BackgroundEvaluator:
+    """
+    Evaluates the pending dicts of state in a worker thread until closed.
+    error is the last exception raised by an evaluation (if any); the affected dict gets an empty result.
+    """
+    state: State
+    error: Optional[Exception]
+    _priority: Optional[int]  # (0-indexed) dict that someone is waiting for, which is evaluated first
+    _closed: bool
+    _thread: threading.Thread
+
+    def __init__(self, state: State):
+        self.state = state
+        self.error = None
+        self._priority = None
+        self._closed = False
+        with state.changed:
+            state.deferred = True
+        self._thread = threading.Thread(target=self._run, name="BackgroundEvaluator", daemon=True)
+        self._thread.start()
+
+    @property
+    def busy(self) -> bool:
+        """
+        whether some dict is pending
+        """
+        with self.state.changed:
+            return self._next_dict() is not None
+
+    def _next_dict(self) -> Optional[int]:
+        state = self.state
+        pending = [i for i in range(len(state.unfiltered_dicts)) if state.is_pending(i+1)]
+        if not pending:
+            return None
+        if self._priority in pending:
+            return self._priority
+        return pending[0]
+
+    def _run(self):
+        state = self.state
+        while True:
+            with state.changed:
+                while not self._closed and self._next_dict() is None:
+                    state.changed.wait()
+                if self._closed:
+                    return
+                i = self._next_dict()
+                generation = state.generation
+                needs_full = state._needs_full[i]
+                new_filters = list(state._new_filters[i])
+
+            def check():
+                # Also give way to a dict that someone is waiting for, this one is evaluated again later.
+                if state.generation != generation or self._closed or self._priority not in (None, i):
+                    raise EvaluationCancelled()
+
+            try:
+                with state._profiled("background"):
+                    results = state._compute_results(i, needs_full, new_filters, check)
+            except EvaluationCancelled:
+                continue
+            except Exception as E:
+                # If the state changed, the failure is most likely due to that (e.g. the dict was deleted meanwhile).
+                with state.changed:
+                    if state.generation == generation:
+                        self.error = E
+                        state._store_results(i, {})
+                continue
+            with state.changed:
+                if state.generation == generation:
+                    state._store_results(i, results)
+
+    def wait_for(self, i: int):
+        """
+        blocks until the i'th (1-indexed) dict is evaluated, evaluating it before all other pending dicts.
+        """
+        state = self.state
+        with state.changed:
+            self._priority = i - 1
+            try:
+                while 1 <= i <= len(state.dict_specs) and state.is_pending(i):
+                    # wake up regularly, so that KeyboardInterrupt gets through
+                    state.changed.wait(timeout=0.2)
+            finally:
+                self._priority = None
+
+    def close(self, *, wait: bool = True):
+        """
+        stops the worker thread (after its current filter group) and switches the state back to immediate evaluation.
+        Work that is still pending is done by the next change of the state (or by calling State.evaluate_pending).
+        With wait=False, this does not wait for the worker thread to finish, which is only safe if the state is not
+        used anymore.
+        """
+        state = self.state
+        with state.changed:
+            self._closed = True
+            state.changed.notify_all()
+        if not wait:
+            return
+        self._thread.join()
+        with state.changed:
+            state.deferred = False
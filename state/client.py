@@ -0,0 +1,178 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Callable, Iterator, Optional
+from dictmanager import DictSpecification, UnfilteredDict
+from dictmanager.manager import _STATUS_ACTIVE, _STATUS_INACTIVE, _STATUS_FAILURE
+from filters import Filter, FilterWithGroup, Group
+from utils import bitset
+from .server import parse_address, normalizer_name, to_hex, from_hex
+from .state import State
+
+# Thin client of a query server (see server.py): RemoteState is a State whose dicts are held by the server, so the
+# frontend works unchanged while filters are evaluated (and the dicts and indexes are held) by the server only.
+# The configuration (filters, groups, which dicts are active) stays local to each client.
+
+
+class ServerError(Exception):
+    """
+    raised if the query server reports an error or cannot be reached
+    """
+
+
+class QueryClient:
+    """
+    Connection to a query server at address ("host:port" or "port", see parse_address)
+    """
+    url: str
+
+    def __init__(self, address: str):
+        host, port = parse_address(address)
+        self.url = f"http://{host}:{port}"
+
+    def call(self, command: str, **arguments):
+        """
+        runs a command of the protocol (see server.py) on the server and returns its result
+        """
+        request = urllib.request.Request(f"{self.url}/{command}", data=json.dumps(arguments).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with urllib.request.urlopen(request) as response:
+                reply = json.load(response)
+        except urllib.error.HTTPError as E:
+            try:
+                reply = json.load(E)
+            except ValueError:
+                raise ServerError(f"Query server failed: {E}") from E
+        except OSError as E:
+            raise ServerError(f"Query server at {self.url} cannot be reached: {E}") from E
+        if "error" in reply:
+            raise ServerError(f"Query server failed: {reply['error']}")
+        return reply["result"]
+
+
+def _describe(fil: Filter) -> dict:
+    description = fil.describe()
+    if description is None:
+        raise ServerError(f"Filter {fil} cannot be sent to the query server")
+    return description
+
+
+def _record_stats(display: str, filters: list[Filter], stats: list[list]):
+    """
+    records the statistics of the filters as returned by the server (see pool._stats_of)
+    """
+    for fil, (words_in, words_passed, seconds, tier_sizes) in zip(filters, stats):
+        if words_in > 0:
+            fil.stats.record(words_in, words_passed, seconds, source=display, tier_sizes=tier_sizes)
+
+
+class RemoteDict(UnfilteredDict):
+    """
+    Stand-in for the UnfilteredDict held by the query server with the given index: Only the size, the length offsets,
+    the status and the entries with given ids are available locally, all filters are evaluated by the server.
+    Activating the dict (and reload) makes the server load it if necessary.
+    """
+    client: QueryClient
+    index: int
+    _size: int
+
+    def __init__(self, client: QueryClient, index: int, spec: DictSpecification):
+        self.client = client
+        self.index = index
+        self._size = 0
+        super().__init__(spec)
+
+    def reload(self):
+        self.error = None
+        self.load_stats = None
+        info = self.client.call("dict", dict_index=self.index, load=self.status != _STATUS_INACTIVE)
+        self._size = 0 if self.status == _STATUS_INACTIVE else info["size"]
+        self.length_offsets = [0] if self.status == _STATUS_INACTIVE else info["length_offsets"]
+        if info["error"] is not None:
+            self.status = _STATUS_FAILURE
+            self.error = ServerError(info["error"])
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def words_of(self, bits: int) -> list[str]:
+        return self.client.call("words", dict_index=self.index, ids=bitset.to_ids(bits))
+
+    def iter_words_of(self, bits: int, chunk_size: int = 1 << 16) -> Iterator[list[str]]:
+        for ids in bitset.iter_id_chunks(bits, chunk_size):
+            yield self.client.call("words", dict_index=self.index, ids=ids)
+
+    def memory_report(self) -> str:
+        return self.client.call("memory", dict_index=self.index)
+
+
+class RemoteState(State):
+    """
+    State whose dicts are held by a query server (see server.py). Initially, these are the dicts served by the
+    server; added dicts are loaded by the server (from a path as seen by the server), so they are available to the
+    other clients as well.
+    """
+    client: QueryClient
+    _indices: dict[DictSpecification, int]  # index of the dict of each spec on the server
+
+    def __init__(self, client: QueryClient, selected_filters: list[FilterWithGroup] = None, error_limit: int = 0, do_eval: bool = False, groups: list[Group] = None):
+        self.client = client
+        self._indices = {}
+        specs = []
+        for info in client.call("dicts"):
+            spec = DictSpecification(info["path"], display=info["display"], use_cache=False,
+                                     status=_STATUS_ACTIVE if info["loaded"] else _STATUS_INACTIVE)
+            self._indices[spec] = info["index"]
+            specs += [spec]
+        super().__init__(specs, selected_filters, error_limit, do_eval, groups)
+
+    def _make_dict(self, spec: DictSpecification) -> UnfilteredDict:
+        if spec not in self._indices:
+            self._indices[spec] = self.client.call("add_dict", path=spec.path, normalizer=normalizer_name(spec.normalizer),
+                                                   encoding=spec.encoding, display=spec.display)
+        return RemoteDict(self.client, self._indices[spec], spec)
+
+    def _compute_dict(self, i: int, check: Optional[Callable[[], None]] = None) -> dict[Group, list[int]]:
+        u = self.unfiltered_dicts[i]
+        filters_by_group = self._evaluation_order()
+        groups = [{"max_errors": gp.max_errors, "filters": list(map(_describe, filters))} for gp, filters in filters_by_group.items()]
+        if check is not None:
+            check()
+        reply = self.client.call("evaluate", dict_index=u.index, groups=groups)
+        for filters, stats in zip(filters_by_group.values(), reply["stats"]):
+            _record_stats(u.spec.display, filters, stats)
+        return {gp: list(map(from_hex, tiers)) for gp, tiers in zip(filters_by_group.keys(), reply["tiers"])}
+
+    def _apply_new_filter(self, i: int, results: dict[Group, list[int]], new_filter: FilterWithGroup, check: Optional[Callable[[], None]] = None):
+        u = self.unfiltered_dicts[i]
+        gp = new_filter.g
+        if check is not None:
+            check()
+        reply = self.client.call("apply", dict_index=u.index, filter=_describe(new_filter.f),
+                                 tiers=list(map(to_hex, results[gp])), max_errors=gp.max_errors)
+        _record_stats(u.spec.display, [new_filter.f], reply["stats"])
+        results[gp] = list(map(from_hex, reply["tiers"]))
+        self._narrow_later_groups(results, gp)
+
+    def _estimate_filter_stats(self):
+        with self._lock:
+            sample_source = next((u for u in self.unfiltered_dicts if u.is_active and u.size > 0), None)
+            filters = [fg.f for fg in self.selected_filters if fg.f.active and not fg.f.stats.has_data]
+        if sample_source is None:
+            return
+        for fil in filters:
+            words_in, words_passed, seconds = self.client.call("sample", dict_index=sample_source.index, filter=_describe(fil))
+            fil.stats.record(words_in, words_passed, seconds, sampled=True)
+
+    def _active_indices(self) -> list[int]:
+        return [u.index for u in self.unfiltered_dicts if u.is_active]
+
+    def multiword_anagrams(self, letters: str, num_words: int, *, lengths: Optional[list[int]] = None, limit: Optional[int] = None) -> Iterator[tuple[str, ...]]:
+        combinations = self.client.call("anagrams", dicts=self._active_indices(), letters=letters, num_words=num_words, lengths=lengths, limit=limit)
+        return (tuple(words) for words in combinations)
+
+    def decode_morse_stream(self, stream: str, *, max_words: int = 1, max_errors: int = 0, limit: Optional[int] = None) -> Iterator[tuple[int, tuple[str, ...]]]:
+        decodings = self.client.call("morse", dicts=self._active_indices(), stream=stream, max_words=max_words, max_errors=max_errors, limit=limit)
+        return ((errors, tuple(words)) for errors, words in decodings)
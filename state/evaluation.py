@@ -0,0 +1,32 @@
+from typing import Callable, Optional
+from dictmanager import UnfilteredDict
+from filters import Filter, Group, apply_filters_with_mask_tiers, merge_mask_tiers, split_length_filters
+
+
+class EvaluationCancelled(Exception):
+    """
+    raised (by the check passed to evaluate_filter_groups) to abort an evaluation whose result is no longer needed
+    """
+
+
+def evaluate_filter_groups(source: UnfilteredDict, filters_by_group: dict[Group, list[Filter]], strict_group: Group, *, check: Optional[Callable[[], None]] = None) -> dict[Group, list[int]]:
+    """
+    runs all active filters on the dict source, group by group (in the order of filters_by_group).
+    Returns the error tiers (as bitsets of entry ids) of each group, where each group only sees the output of the
+    previous groups, so the tiers of the last group are the final result.
+    Length filters are not evaluated entry by entry: they are combined into a single range of lengths, which
+    selects a range of ids of the (by length sorted) dict. They may only appear in strict_group.
+    If given, check is called before each group and regularly while running its filters (see
+    apply_filters_with_mask_tiers) and may abort the evaluation by raising an exception (such as EvaluationCancelled).
+    """
+    filters_by_group = dict(filters_by_group)
+    min_length, max_length, filters_by_group[strict_group] = split_length_filters(filters_by_group[strict_group])
+    out = source.bits_in_length_range(min_length, max_length)
+    results = {}
+    for gp, list_of_filters in filters_by_group.items():
+        if check is not None:
+            check()
+        tiers = apply_filters_with_mask_tiers(list_of_filters, source, out, max_errors=gp.max_errors, check=check)
+        results[gp] = tiers
+        out = merge_mask_tiers(tiers)
+    return results
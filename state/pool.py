@@ -0,0 +1,319 @@
+import multiprocessing
+import os
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+from typing import Optional
+from dictmanager import UnfilteredDict
+from filters import Filter, FilterRun, Group, apply_filter_to_mask_tiers, filter_from_description
+from .evaluation import evaluate_filter_groups
+
+# Parallel evaluation of filters (opt-in, see State.set_num_workers):
+# Each dict is split into one shard per worker, where shard k is a contiguous range of ids of the dict. Since the
+# dict is sorted by length, so is every shard, hence a shard is again a valid UnfilteredDict (with ids shifted by the
+# start of the shard). The workers keep their shards (including the indexes built on them) for as long as the dict is
+# registered, so evaluating filters only requires sending the descriptions of the filters (see Filter.describe) and
+# receiving the resulting bitsets, which are then shifted and merged in order.
+# NOTE: Shared memory is only the transport for registering a dict: Each worker decodes its shard into a list of its
+# own and the segment is released right after (see register). So the dict is not shared between the processes. The
+# workers together hold a second copy of it (one shard each, plus the indexes built on the shards), and every worker
+# adds the memory of a Python process of its own.
+
+MIN_ENTRIES_PER_WORKER = 10000  # smaller dicts are evaluated in the main process, as the overhead is not worth it
+
+
+class PoolUnsupported(Exception):
+    """
+    raised if a dict or some filter cannot be evaluated by the worker pool. The caller should evaluate it locally.
+    """
+
+
+class PoolFailure(PoolUnsupported):
+    """
+    raised if a worker process failed or died. The pool is shut down (see WorkerPool.closed), so the caller should
+    evaluate locally from now on.
+    """
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    # The main process owns (and unlinks) the shared memory, so the workers should not track it. Before Python 3.13,
+    # this is not possible, but the workers share the resource tracker of the main process (see WorkerPool), so this
+    # is harmless.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _stats_of(filters: list[Filter]) -> list[tuple[int, int, float, Optional[list[int]]]]:
+    """
+    statistics of filters that were run on a single shard: words in, words passed, seconds and the tier sizes of the
+    run (see FilterStats.runs)
+    """
+    ret = []
+    for fil in filters:
+        run = next(iter(fil.stats.runs.values()), None)
+        ret += [(fil.stats.words_in, fil.stats.words_passed, fil.stats.seconds, run.tier_sizes if run is not None else None)]
+    return ret
+
+
+def _worker_main(conn: Connection):
+    """
+    main loop of a worker process. Every request gets exactly one reply, either ("ok", result) or ("error", message)
+    """
+    shards: dict[int, UnfilteredDict] = {}
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        command = request[0]
+        if command == "exit":
+            return
+        try:
+            if command == "load":
+                _, key, name, start, end, num_entries = request
+                shm = _attach_shared_memory(name)
+                try:
+                    entries = bytes(shm.buf[start:end]).decode("utf-8").split("\n") if num_entries > 0 else []
+                finally:
+                    shm.close()
+                assert len(entries) == num_entries
+                shards[key] = UnfilteredDict.from_entries(entries, display=f"<shard of {key}>")
+                result = None
+            elif command == "drop":
+                shards.pop(request[1], None)
+                result = None
+            elif command == "evaluate":
+                _, key, group_descriptions = request
+                groups = [Group(d["max_errors"]) for d in group_descriptions]
+                filters_by_group = {gp: [filter_from_description(f) for f in d["filters"]] for gp, d in zip(groups, group_descriptions)}
+                results = evaluate_filter_groups(shards[key], filters_by_group, groups[0])
+                result = [results[gp] for gp in groups], [_stats_of(filters_by_group[gp]) for gp in groups]
+            elif command == "apply":
+                _, key, filter_description, tiers, max_errors = request
+                fil = filter_from_description(filter_description)
+                tiers = apply_filter_to_mask_tiers(fil, shards[key], tiers, max_errors=max_errors)
+                result = tiers, _stats_of([fil])
+            else:
+                raise ValueError(f"Unknown command {command}")
+        except Exception as E:
+            conn.send(("error", repr(E)))
+        else:
+            conn.send(("ok", result))
+
+
+class _RegisteredDict:
+    entries: list[str]  # the L of the registered dict, used to detect reloads
+    bounds: list[tuple[int, int]]  # bounds[k] = (start, end): worker k holds the entries with ids start <= id < end
+    display: str  # name of the dict, under which the runs of filters are recorded
+
+    def __init__(self, entries: list[str], bounds: list[tuple[int, int]], display: str):
+        self.entries = entries
+        self.bounds = bounds
+        self.display = display
+
+
+class WorkerPool:
+    """
+    Persistent pool of worker processes that hold (private copies of) shards of dicts and evaluate filters on them in
+    parallel.
+    Dicts are identified by the key returned by register.
+    NOTE: Workers are forked (where available), so the pool should be created before starting any threads.
+    The pool may be used from several threads, but the requests are processed one after another.
+    """
+    num_workers: int
+    _connections: list[Connection]
+    _processes: list[multiprocessing.Process]
+    _dicts: dict[int, _RegisteredDict]
+    _next_key: int
+    _lock: threading.RLock  # held while talking to the workers
+
+    def __init__(self, num_workers: int):
+        assert num_workers >= 1
+        methods = multiprocessing.get_all_start_methods()
+        ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        self.num_workers = num_workers
+        self._connections = []
+        self._processes = []
+        self._dicts = {}
+        self._next_key = 0
+        self._lock = threading.RLock()
+        if os.name == "posix":
+            # start the resource tracker before starting the workers, so they use it instead of starting their own.
+            resource_tracker.ensure_running()
+        for _ in range(num_workers):
+            parent_end, child_end = ctx.Pipe()
+            process = ctx.Process(target=_worker_main, args=(child_end,), daemon=True)
+            process.start()
+            child_end.close()
+            self._connections += [parent_end]
+            self._processes += [process]
+
+    @property
+    def closed(self) -> bool:
+        """
+        whether the pool was shut down (by close or after a failure of a worker)
+        """
+        return not self._processes
+
+    def _broadcast(self, requests: list[tuple]) -> list:
+        """
+        sends requests[k] to worker k (so all workers run concurrently) and collects the results in order.
+        If some worker fails (or died), the pool is shut down and PoolFailure is raised.
+        """
+        with self._lock:
+            if self.closed:
+                raise PoolFailure("The worker pool was shut down")
+            try:
+                for conn, request in zip(self._connections, requests):
+                    conn.send(request)
+                replies = [conn.recv() for conn in self._connections]
+            except (OSError, EOFError) as E:
+                self._shut_down()
+                raise PoolFailure(f"Lost connection to a worker process: {E!r}") from E
+            for status, result in replies:
+                if status != "ok":
+                    self._shut_down()
+                    raise PoolFailure(f"Worker process failed: {result}")
+        return [result for _, result in replies]
+
+    def _shut_down(self):
+        """
+        shuts down the pool after a failure, without waiting for the workers to finish their current requests
+        """
+        for process in self._processes:
+            if process.is_alive():
+                process.terminate()
+        self.close()
+
+    def supports(self, source: UnfilteredDict) -> bool:
+        """
+        whether source is large enough to be worth evaluating in the pool
+        """
+        return source.size >= MIN_ENTRIES_PER_WORKER * min(self.num_workers, 2)
+
+    def is_registered(self, key: Optional[int], source: UnfilteredDict) -> bool:
+        """
+        whether key refers to the current content of source (i.e. source was not reloaded since registering)
+        """
+        return key in self._dicts and self._dicts[key].entries is source.L
+
+    def register(self, source: UnfilteredDict) -> int:
+        """
+        hands the entries of source to the workers and returns the key that identifies it. The entries are copied
+        through a temporary shared memory segment, into a private shard of each worker (see the note above).
+        Raises PoolUnsupported if the entries cannot be transferred.
+        """
+        entries = source.L
+        if any("\n" in entry for entry in entries):
+            raise PoolUnsupported("Entries containing newlines cannot be sent to worker processes")
+        bounds = [(source.size * k // self.num_workers, source.size * (k+1) // self.num_workers) for k in range(self.num_workers)]
+        blobs = ["\n".join(entries[start:end]).encode("utf-8") for start, end in bounds]
+        shm = shared_memory.SharedMemory(create=True, size=max(sum(map(len, blobs)), 1))
+        key = self._next_key
+        self._next_key += 1
+        try:
+            requests = []
+            offset = 0
+            for blob, (start, end) in zip(blobs, bounds):
+                shm.buf[offset:offset+len(blob)] = blob
+                requests += [("load", key, shm.name, offset, offset + len(blob), end - start)]
+                offset += len(blob)
+            # Once the workers have loaded their shards, the shared memory is not needed anymore.
+            self._broadcast(requests)
+        finally:
+            shm.close()
+            shm.unlink()
+        self._dicts[key] = _RegisteredDict(entries, bounds, source.spec.display)
+        return key
+
+    def unregister(self, key: int):
+        """
+        makes the workers drop the shards of the dict with the given key
+        """
+        if key not in self._dicts:
+            return
+        del self._dicts[key]
+        try:
+            self._broadcast([("drop", key)] * self.num_workers)
+        except PoolFailure:
+            pass  # the workers are gone together with their shards
+
+    def _split(self, key: int, bits: int) -> list[int]:
+        return [(bits >> start) & ((1 << (end - start)) - 1) for start, end in self._dicts[key].bounds]
+
+    def _merge(self, key: int, shard_bits: list[int]) -> int:
+        ret = 0
+        for bits, (start, _) in zip(shard_bits, self._dicts[key].bounds):
+            ret |= bits << start
+        return ret
+
+    def _merge_tiers(self, key: int, shard_tiers: list[list[int]]) -> list[int]:
+        return [self._merge(key, [tiers[j] for tiers in shard_tiers]) for j in range(len(shard_tiers[0]))]
+
+    @staticmethod
+    def _describe(fil: Filter) -> dict:
+        description = fil.describe()
+        if description is None:
+            raise PoolUnsupported(f"Filter {fil} cannot be sent to worker processes")
+        return description
+
+    def _record_stats(self, key: int, filters: list[Filter], shard_stats: list[list[tuple[int, int, float, Optional[list[int]]]]]):
+        """
+        records the statistics of the filters from all shards. The recorded run has the wall time of the slowest shard.
+        """
+        for j, fil in enumerate(filters):
+            words_in = sum(stats[j][0] for stats in shard_stats)
+            if words_in > 0:
+                fil.stats.record(words_in, sum(stats[j][1] for stats in shard_stats), sum(stats[j][2] for stats in shard_stats))
+            shard_tier_sizes = [stats[j][3] for stats in shard_stats]
+            if None not in shard_tier_sizes:
+                fil.stats.runs[self._dicts[key].display] = FilterRun(max(stats[j][2] for stats in shard_stats), words_in,
+                                                                 [sum(sizes) for sizes in zip(*shard_tier_sizes)])
+
+    def evaluate(self, key: int, filters_by_group: dict[Group, list[Filter]]) -> list[list[int]]:
+        """
+        parallel version of evaluate_filter_groups on the registered dict with the given key, where the first group
+        is the strict group. Returns the error tiers of each group (in order).
+        Raises PoolUnsupported if some filter cannot be described.
+        """
+        groups = list(filters_by_group.keys())
+        group_descriptions = [{"max_errors": gp.max_errors, "filters": [self._describe(fil) for fil in filters_by_group[gp]]} for gp in groups]
+        replies = self._broadcast([("evaluate", key, group_descriptions)] * self.num_workers)
+        ret = []
+        for g, gp in enumerate(groups):
+            ret += [self._merge_tiers(key, [shard_results[g] for shard_results, _ in replies])]
+            self._record_stats(key, filters_by_group[gp], [shard_stats[g] for _, shard_stats in replies])
+        return ret
+
+    def apply_filter(self, key: int, fil: Filter, tiers: list[int], *, max_errors: int = 0) -> list[int]:
+        """
+        parallel version of apply_filter_to_mask_tiers on the registered dict with the given key.
+        Raises PoolUnsupported if the filter cannot be described.
+        """
+        description = self._describe(fil)
+        shard_tiers = [self._split(key, tier) for tier in tiers]
+        requests = [("apply", key, description, [bits[k] for bits in shard_tiers], max_errors) for k in range(self.num_workers)]
+        replies = self._broadcast(requests)
+        self._record_stats(key, [fil], [shard_stats for _, shard_stats in replies])
+        return self._merge_tiers(key, [shard_result for shard_result, _ in replies])
+
+    def close(self):
+        """
+        shuts down the worker processes
+        """
+        for conn in self._connections:
+            try:
+                conn.send(("exit",))
+            except OSError:
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._processes = []
+        self._dicts = {}
@@ -0,0 +1,265 @@
+import ipaddress
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from dictmanager import DictSpecification, UnfilteredDict, normalizeToAscii, normalizeStreets
+from dictmanager.anagrams import multiword_anagrams
+from dictmanager.morsestream import decode_morse_stream
+from filters import Filter, Group, apply_filter_to_mask_tiers, filter_from_description, sample_filter_stats
+from utils import bitset
+from .evaluation import evaluate_filter_groups
+from .pool import _stats_of
+
+# Query server (opt-in, see main.py): The dicts are loaded (and their indexes built) once in a server process, which
+# answers filter queries of any number of clients (see client.py) over HTTP on a local port.
+# Protocol: A request is a POST to /<command> with a JSON object as body, the reply is a JSON object that is either
+# {"result": ...} or {"error": message} (with HTTP status 400). Commands without arguments may also be sent as GET.
+# Dicts are referred to by their index in the list returned by "dicts". Filters are given by their descriptions (see
+# Filter.describe) and a list of groups by objects {"max_errors": n, "filters": [...]}, where the first group is the
+# strict group (the only one that may contain length filters, see evaluate_filter_groups) and each group only sees the
+# output of the previous ones. Bitsets of entry ids (see utils/bitset.py) are sent as hexadecimal strings.
+# Commands (see the command_ methods of QueryServer for the arguments):
+#   dicts, dict, add_dict:     information about the served dicts, loading further dicts
+#   query:                     all-in-one filter query, returning the passing entries of each dict
+#   evaluate, apply, sample:   the building blocks of State evaluation, used by RemoteState
+#   words, memory:             entries for given ids, memory report of a dict
+#   anagrams, morse:           multi-word anagrams and decoding of Morse streams
+# Every request is handled in its own thread and all of them work on the same UnfilteredDicts, so an index built for
+# one query (by whichever client) is used by all later ones.
+# There is no authentication: Anyone who can connect may query the served dicts. Hence the server only binds to
+# loopback addresses and add_dict only accepts the served dicts unless the server is explicitly told otherwise
+# (allow_remote and allow_add_dict of QueryServer), as add_dict makes the server read a file given by the client.
+
+DEFAULT_PORT = 8737
+QUERY_LIMIT = 1000  # default maximal number of entries per dict returned by the query command
+
+# normalizers that clients can refer to by name when adding dicts (in addition to those of the served dicts)
+NORMALIZERS: dict[str, Callable] = {n.name: n for n in (normalizeToAscii, normalizeStreets)}
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    """
+    parses "host:port" or "port" (meaning localhost) into (host, port)
+    """
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port) if port else DEFAULT_PORT
+
+
+def normalizer_name(normalizer: Callable) -> str:
+    return getattr(normalizer, "name", getattr(normalizer, "__name__", repr(normalizer)))
+
+
+def to_hex(bits: int) -> str:
+    return format(bits, "x")
+
+
+def from_hex(text: str) -> int:
+    return int(text, 16)
+
+
+def _groups_from_descriptions(descriptions: list[dict]) -> dict[Group, list[Filter]]:
+    return {Group(d["max_errors"]): [filter_from_description(f) for f in d["filters"]] for d in descriptions}
+
+
+class _QueryHandler(BaseHTTPRequestHandler):
+    server: "QueryServer"
+
+    def _reply(self, status: int, reply: dict):
+        body = json.dumps(reply).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, body: bytes):
+        try:
+            arguments = json.loads(body) if body else {}
+            result = self.server.run_command(self.path.strip("/"), arguments)
+        except Exception as E:
+            self._reply(400, {"error": repr(E)})
+        else:
+            self._reply(200, {"result": result})
+
+    def do_POST(self):
+        self._handle(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def do_GET(self):
+        self._handle(b"")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    """
+    Serves filter queries on the dicts given by dict_specs (and dicts added by clients) over HTTP, see above.
+    The server only reads the dicts, so clients cannot interfere with each other: Activating or removing dicts is up
+    to each client, only inactive dicts are loaded when a client asks for them.
+    Binding to an address other than a loopback address requires allow_remote, and clients can only add further dicts
+    (from any path readable by the server) if allow_add_dict is set.
+    """
+    daemon_threads = True
+    dicts: list[UnfilteredDict]
+    verbose: bool  # log every request to stderr
+    allow_add_dict: bool  # whether clients may add dicts that are not served yet (see command_add_dict)
+    _keys: list[tuple[str, str, Optional[str]]]  # (absolute path, name of normalizer, encoding) of each dict
+    _locks: list[threading.Lock]  # held while (re-)loading a dict
+    _lock: threading.Lock  # held while adding dicts
+
+    def __init__(self, dict_specs: list[DictSpecification], address: tuple[str, int] = ("127.0.0.1", DEFAULT_PORT), *,
+                 verbose: bool = False, allow_remote: bool = False, allow_add_dict: bool = False):
+        self.dicts = []
+        self._keys = []
+        self._locks = []
+        self._lock = threading.Lock()
+        self.verbose = verbose
+        self.allow_add_dict = allow_add_dict
+        for spec in dict_specs:
+            self._add(spec)
+        super().__init__(address, _QueryHandler)
+        if not allow_remote and not ipaddress.ip_address(self.server_address[0]).is_loopback:
+            self.server_close()
+            raise ValueError(f"Refusing to serve on non-loopback address {self.server_address[0]} without allow_remote")
+
+    @staticmethod
+    def _key(spec: DictSpecification) -> tuple[str, str, Optional[str]]:
+        return os.path.abspath(spec.path), normalizer_name(spec.normalizer), spec.encoding
+
+    def _add(self, spec: DictSpecification) -> int:
+        key = self._key(spec)
+        with self._lock:
+            if key in self._keys:
+                return self._keys.index(key)
+            self.dicts += [UnfilteredDict(spec)]
+            self._keys += [key]
+            self._locks += [threading.Lock()]
+            return len(self.dicts) - 1
+
+    def run_command(self, command: str, arguments: dict):
+        """
+        runs the given command of the protocol and returns its (JSON-compatible) result
+        """
+        method = getattr(self, f"command_{command}", None)
+        if method is None:
+            raise ValueError(f"Unknown command {command}")
+        return method(**arguments)
+
+    def _source(self, i: int) -> UnfilteredDict:
+        """
+        the i'th dict, which must be loaded. Concurrent first queries build its indexes only once (see
+        UnfilteredDict._build).
+        """
+        u = self.dicts[i]
+        if not u.is_active:
+            raise ValueError(f"Dict {u.spec.display} is not loaded")
+        return u
+
+    def _info(self, i: int) -> dict:
+        u = self.dicts[i]
+        return {"index": i, "display": u.spec.display, "path": self._keys[i][0], "normalizer": self._keys[i][1],
+                "size": u.size, "length_offsets": u.length_offsets, "loaded": u.is_active, "error": None if u.error is None else str(u.error)}
+
+    def command_dicts(self) -> list[dict]:
+        return [self._info(i) for i in range(len(self.dicts))]
+
+    def command_dict(self, dict_index: int, load: bool = False) -> dict:
+        """
+        information about a dict, loading it first if load is set
+        """
+        u = self.dicts[dict_index]
+        if load and not u.is_active:
+            with self._locks[dict_index]:
+                if not u.is_active:
+                    u.make_active()
+        return self._info(dict_index)
+
+    def command_add_dict(self, path: str, normalizer: Optional[str] = None, encoding: Optional[str] = None, display: Optional[str] = None) -> int:
+        """
+        adds the dict in the file path (as seen by the server) unless it is served already and returns its index.
+        Dicts that are not served yet can only be added if allow_add_dict is set.
+        """
+        known = NORMALIZERS | {key[1]: u.spec.normalizer for key, u in zip(self._keys, self.dicts)}
+        if normalizer is None:
+            spec = DictSpecification(path, display=display, encoding=encoding)
+        elif normalizer in known:
+            spec = DictSpecification(path, normalizer=known[normalizer], display=display, encoding=encoding)
+        else:
+            raise ValueError(f"Unknown normalizer {normalizer}")
+        if not self.allow_add_dict and self._key(spec) not in self._keys:
+            raise PermissionError(f"Adding dicts is disabled on this server: {path}")
+        return self._add(spec)
+
+    def command_query(self, groups: list[dict], dicts: Optional[list[int]] = None, limit: int = QUERY_LIMIT) -> list[dict]:
+        """
+        evaluates the groups of filters on the given (default: all loaded) dicts. Returns for each dict the number of
+        passing entries with e errors (for each e) and at most limit passing entries, sorted by number of errors, then
+        alphabetically.
+        """
+        if dicts is None:
+            dicts = [i for i, u in enumerate(self.dicts) if u.is_active]
+        out = []
+        for i in dicts:
+            u = self._source(i)
+            filters_by_group = _groups_from_descriptions(groups)
+            tiers = list(evaluate_filter_groups(u, filters_by_group, next(iter(filters_by_group))).values())[-1]
+            entries = []
+            remaining = limit
+            for tier in tiers:
+                words = []
+                for chunk in u.iter_sorted_words_of(tier):
+                    if len(words) >= remaining:
+                        break
+                    words += chunk[:remaining - len(words)]
+                remaining -= len(words)
+                entries += [words]
+            out += [{"dict_index": i, "display": u.spec.display, "tier_sizes": list(map(bitset.count, tiers)), "entries": entries}]
+        return out
+
+    def command_evaluate(self, dict_index: int, groups: list[dict]) -> dict:
+        """
+        evaluate_filter_groups on a dict: the error tiers of each group and the statistics of the filters
+        """
+        u = self._source(dict_index)
+        filters_by_group = _groups_from_descriptions(groups)
+        results = evaluate_filter_groups(u, filters_by_group, next(iter(filters_by_group)))
+        return {"tiers": [list(map(to_hex, results[gp])) for gp in filters_by_group],
+                "stats": [_stats_of(filters) for filters in filters_by_group.values()]}
+
+    def command_apply(self, dict_index: int, filter: dict, tiers: list[str], max_errors: int = 0) -> dict:
+        """
+        apply_filter_to_mask_tiers on a dict: the new error tiers and the statistics of the filter
+        """
+        u = self._source(dict_index)
+        fil = filter_from_description(filter)
+        new_tiers = apply_filter_to_mask_tiers(fil, u, list(map(from_hex, tiers)), max_errors=max_errors)
+        return {"tiers": list(map(to_hex, new_tiers)), "stats": _stats_of([fil])}
+
+    def command_sample(self, dict_index: int, filter: dict) -> list:
+        """
+        sample_filter_stats on a dict: entries in, entries passed and seconds
+        """
+        u = self._source(dict_index)
+        fil = filter_from_description(filter)
+        sample_filter_stats(fil, u)
+        return [fil.stats.words_in, fil.stats.words_passed, fil.stats.seconds]
+
+    def command_words(self, dict_index: int, ids: list[int]) -> list[str]:
+        L = self._source(dict_index).L
+        return [L[i] for i in ids]
+
+    def command_memory(self, dict_index: int) -> str:
+        u = self.dicts[dict_index]
+        report = u.memory_report()
+        if u.load_stats is not None:
+            report += f"\n    loading: {u.load_stats}"
+        return report
+
+    def command_anagrams(self, dicts: list[int], letters: str, num_words: int, lengths: Optional[list[int]] = None, limit: Optional[int] = QUERY_LIMIT) -> list[list[str]]:
+        return [list(words) for words in multiword_anagrams([self._source(i) for i in dicts], letters, num_words, lengths=lengths, limit=limit)]
+
+    def command_morse(self, dicts: list[int], stream: str, max_words: int = 1, max_errors: int = 0, limit: Optional[int] = QUERY_LIMIT) -> list[list]:
+        return [[errors, list(words)] for errors, words in decode_morse_stream([self._source(i) for i in dicts], stream, max_words=max_words, max_errors=max_errors, limit=limit)]
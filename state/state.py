@@ -1,11 +1,66 @@
-from typing import Tuple, Union
+import cProfile
+import os
+import threading
+from contextlib import contextmanager
+from collections.abc import Sequence
+from typing import Callable, Iterator, Optional, Tuple, Union
 from dictmanager import DictSpecification, UnfilteredDict
-from filters import Filter, apply_filter_groups, FilterWithGroup, Group
+from dictmanager.anagrams import multiword_anagrams
+from dictmanager.morsestream import decode_morse_stream
+from filters import Filter, FilterRun, FilterWithGroup, Group, sample_filter_stats, apply_filter_to_mask_tiers, merge_mask_tiers
+from utils import bitset
+from .evaluation import evaluate_filter_groups
+from .pool import WorkerPool, PoolUnsupported
+
+class FilteredDicts(Sequence):
+    """
+    Read-only view of the filtered dicts of a State (see State.filtered_dicts), where the entries of a dict are only
+    turned into strings when that dict is accessed.
+    """
+    def __init__(self, state: "State"):
+        self._state = state
+
+    def __len__(self) -> int:
+        return len(self._state.dict_specs)
+
+    def __getitem__(self, i: int) -> list[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._state.filtered_entries(i+1)
+
 
 class State:
     dict_specs: list[DictSpecification]
-    filtered_dicts: list[list[str]]
     unfiltered_dicts: list[UnfilteredDict]
+    # group_results[i][gp] are the error tiers (bitsets of entry ids, as output by apply_filters_with_mask_tiers) of
+    # group gp for the i'th dict. This is kept to allow incremental evaluation when filters are added.
+    group_results: list[dict[Group, list[int]]]
+    # filtered_masks[i] are the error tiers (as bitsets) of the entries of the i'th dict that pass all filters.
+    filtered_masks: list[list[int]]
+    _filtered_words: list[Optional[list[str]]]  # filtered_masks turned into lists of strings, computed when needed.
+    _pool: Optional[WorkerPool]  # worker processes for parallel evaluation, None if evaluating in this process
+    _pool_keys: list[Optional[int]]  # _pool_keys[i] is the key of the i'th dict in _pool (if registered)
+    # Opt-in profiling: if profile_dir is set, every evaluation is run under cProfile and the profile is written to a
+    # new file in profile_dir (see _profiled). last_profile is the file written last.
+    profile_dir: Optional[str] = None
+    last_profile: Optional[str]
+    _num_profiles: int
+    _profiling: bool
+    # Evaluation is split into changing the configuration (filters, groups, dicts) and running the filters: Every
+    # change records the work it makes necessary for each dict in _needs_full and _new_filters and increments
+    # generation. By default, this work is done right away. With deferred set, it is left to whoever calls
+    # evaluate_pending, such as a BackgroundEvaluator (see background.py) in another thread. Changes are made while
+    # holding _lock, and results computed outside of it are only stored if generation did not change meanwhile.
+    deferred: bool
+    generation: int
+    _needs_full: list[bool]  # _needs_full[i]: the i'th dict needs to be evaluated from scratch
+    _new_filters: list[list[FilterWithGroup]]  # filters that still need to be applied (incrementally) to the i'th dict
+    _lock: threading.RLock
+    changed: threading.Condition  # notified (with _lock held) whenever generation changes or results are stored
 
     active: bool
 
@@ -14,15 +69,29 @@ class State:
     DefaultGroup: Group
     StrictGroup: Group
 
-    def __init__(self, dict_specs: list[DictSpecification], selected_filters: list[FilterWithGroup] = None, error_limit: int = 0, do_eval: bool = False, groups: list[Group] = None):
+    def __init__(self, dict_specs: list[DictSpecification], selected_filters: list[FilterWithGroup] = None, error_limit: int = 0, do_eval: bool = False, groups: list[Group] = None, num_workers: int = 0):
         """
         Initialize the state using the given dict specification and the selected set of filters.
+        num_workers > 0 enables parallel evaluation, see set_num_workers.
         NOTE: This does not actually run the filters (to allow users to deactivate filters in case of error / too slow execution)
         """
         self.dict_specs = dict_specs
-        self.unfiltered_dicts = [UnfilteredDict(spec) for spec in dict_specs]
-        self.filtered_dicts = [[] for _ in dict_specs]  # default to ensure invariant that is has the right length.
+        self._pool = WorkerPool(num_workers) if num_workers > 0 else None
+        self._pool_keys = [None for _ in dict_specs]
+        self.unfiltered_dicts = [self._make_dict(spec) for spec in dict_specs]
+        self.filtered_masks = [[] for _ in dict_specs]  # default to ensure invariant that is has the right length.
+        self._filtered_words = [None for _ in dict_specs]
+        self.group_results = [{} for _ in dict_specs]
         self.active = do_eval
+        self.last_profile = None
+        self._num_profiles = 0
+        self._profiling = False
+        self.deferred = False
+        self.generation = 0
+        self._needs_full = [False for _ in dict_specs]
+        self._new_filters = [[] for _ in dict_specs]
+        self._lock = threading.RLock()
+        self.changed = threading.Condition(self._lock)
         self.DefaultGroup = Group(error_limit)
         self.StrictGroup = Group(0)
 
@@ -46,17 +115,29 @@ class State:
         self.compute_filtered_dicts()
         self.validate()
 
+    def _make_dict(self, spec: DictSpecification) -> UnfilteredDict:
+        """
+        creates (and loads) the dict for spec
+        """
+        return UnfilteredDict(spec)
+
     def validate(self):
-        assert len(self.dict_specs) == len(self.filtered_dicts)
-        assert len(self.dict_specs) == len(self.unfiltered_dicts)
-        assert self.DefaultGroup is not None
-        for fil in self.selected_filters:
-            assert fil.g in self.groups or fil.g is self.DefaultGroup or fil.g is self.StrictGroup
-            if fil.f.allow_errors:
-                assert fil.g is not self.StrictGroup
-            else:
-                assert fil.g is self.StrictGroup
-        assert self.StrictGroup.max_errors == 0
+        with self._lock:
+            assert len(self.dict_specs) == len(self.filtered_masks)
+            assert len(self.dict_specs) == len(self._filtered_words)
+            assert len(self.dict_specs) == len(self.unfiltered_dicts)
+            assert len(self.dict_specs) == len(self.group_results)
+            assert len(self.dict_specs) == len(self._pool_keys)
+            assert len(self.dict_specs) == len(self._needs_full)
+            assert len(self.dict_specs) == len(self._new_filters)
+            assert self.DefaultGroup is not None
+            for fil in self.selected_filters:
+                assert fil.g in self.groups or fil.g is self.DefaultGroup or fil.g is self.StrictGroup
+                if fil.f.allow_errors:
+                    assert fil.g is not self.StrictGroup
+                else:
+                    assert fil.g is self.StrictGroup
+            assert self.StrictGroup.max_errors == 0
 
     @property
     def filter_by_group(self) -> dict[Group, list[Filter]]:
@@ -70,31 +151,320 @@ class State:
             d[fg.g] += [fg.f]
         return d
 
+    @property
+    def filtered_dicts(self) -> FilteredDicts:
+        """
+        filtered_dicts[i] is the list of entries of the i'th dict that pass all filters (sorted by number of errors,
+        then alphabetically).
+        NOTE: The entries of a dict are only turned into strings when filtered_dicts[i] is accessed. To get the number
+        of entries, count_filtered is much cheaper.
+        """
+        return FilteredDicts(self)
+
+    def filtered_entries(self, i: int) -> list[str]:
+        """
+        the entries of the i'th (1-indexed) dict that pass all filters (sorted by number of errors, then alphabetically),
+        see filtered_dicts.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        with self._lock:
+            words = self._filtered_words[i-1]
+            if words is None:
+                u = self.unfiltered_dicts[i-1]
+                words = []
+                for tier in self.filtered_masks[i-1]:
+                    words += sorted(u.words_of(tier))
+                self._filtered_words[i-1] = words
+            return words
+
+    def iter_filtered(self, i: int, chunk_size: int = 1 << 16) -> Iterator[tuple[int, list[str]]]:
+        """
+        the entries of the i'th (1-indexed) dict that pass all filters as pairs (number of errors, chunk of entries),
+        in the same order as filtered_entries, but without turning all of them into strings at once.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        with self._lock:
+            u = self.unfiltered_dicts[i-1]
+            tiers = self.filtered_masks[i-1]
+        for errors, tier in enumerate(tiers):
+            for words in u.iter_sorted_words_of(tier, chunk_size):
+                yield errors, words
+
+    def count_filtered(self, i: int) -> int:
+        """
+        number of entries of the i'th (1-indexed) dict that pass all filters, without turning them into strings.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        return sum(map(bitset.count, self.filtered_masks[i-1]))
+
+    def count_filtered_tiers(self, i: int) -> list[int]:
+        """
+        number of entries of the i'th (1-indexed) dict that pass all filters with exactly e errors, for each e.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        return list(map(bitset.count, self.filtered_masks[i-1]))
+
+    def _set_filtered_masks(self, i: int, tiers: list[int]):
+        self.filtered_masks[i] = tiers
+        self._filtered_words[i] = None
+
     def make_active(self):
-        self.active = True
-        self.compute_filtered_dicts()
+        with self._lock:
+            self.active = True
+            self.compute_filtered_dicts()
 
     def make_inactive(self):
-        self.active = False
-        self.compute_filtered_dicts()
+        with self._lock:
+            self.active = False
+            self.compute_filtered_dicts()
 
     def compute_filtered_dicts(self):
         """
         runs all active filters on all dicts
         """
+        with self._lock:
+            self.filtered_masks = [[] for _ in self.unfiltered_dicts]
+            self._filtered_words = [None for _ in self.unfiltered_dicts]
+            self.group_results = [{} for _ in self.unfiltered_dicts]
+            self._needs_full = [self.active for _ in self.unfiltered_dicts]
+            self._new_filters = [[] for _ in self.unfiltered_dicts]
+            self._schedule("compute_filtered_dicts")
 
-        if self.active:
-            self.filtered_dicts = [apply_filter_groups(self.filter_by_group, unfiltered_dict.L) for unfiltered_dict in self.unfiltered_dicts]
-        else:
-            self.filtered_dicts = [[] for _ in self.unfiltered_dicts]
+    def is_pending(self, i: int) -> bool:
+        """
+        whether the i'th (1-indexed) dict still needs to be evaluated, i.e. its filtered results are outdated.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        return self._needs_full[i-1] or len(self._new_filters[i-1]) > 0
+
+    def _mark_full(self, i: int):
+        """
+        marks the i'th (0-indexed!) dict for evaluation from scratch
+        """
+        self._needs_full[i] = True
+        self._new_filters[i] = []
+
+    def _schedule(self, what: str):
+        """
+        called after every change: Unless evaluation is deferred, the pending work is done right away.
+        """
+        self.generation += 1
+        if self.deferred:
+            self.changed.notify_all()
+            return
+        if not any(self._needs_full) and not any(self._new_filters):
+            return
+        with self._profiled(what):
+            self.evaluate_pending()
+
+    def evaluate_pending(self):
+        """
+        evaluates all dicts that are pending (see is_pending)
+        """
+        with self._lock:
+            for i in range(len(self.unfiltered_dicts)):
+                if self._needs_full[i] or self._new_filters[i]:
+                    self._store_results(i, self._compute_results(i, self._needs_full[i], self._new_filters[i]))
+
+    def _compute_results(self, i: int, needs_full: bool, new_filters: list[FilterWithGroup], check: Optional[Callable[[], None]] = None) -> dict[Group, list[int]]:
+        """
+        computes the new group results for the i'th (0-indexed!) dict, either from scratch or by applying new_filters to
+        the current group results. This does not modify the state.
+        check is called regularly and may raise an exception to abort the computation, see evaluate_filter_groups.
+        """
+        self._estimate_filter_stats()
+        if needs_full or not self._has_valid_group_results(i):
+            return self._compute_dict(i, check)
+        results = dict(self.group_results[i])
+        for new_filter in new_filters:
+            if check is not None:
+                check()
+            self._apply_new_filter(i, results, new_filter, check)
+        return results
+
+    def _store_results(self, i: int, results: dict[Group, list[int]]):
+        """
+        stores the group results of the i'th (0-indexed!) dict, which is no longer pending afterwards.
+        """
+        self.group_results[i] = results
+        self._set_filtered_masks(i, list(results.values())[-1] if results else [])
+        self._needs_full[i] = False
+        self._new_filters[i] = []
+        self.changed.notify_all()
+
+    @contextmanager
+    def _profiled(self, what: str):
+        """
+        runs the body under cProfile if profile_dir is set and writes the profile to profile_dir/<number>-<what>.prof,
+        which can be inspected with the pstats module (or e.g. snakeviz). Nested uses only create a single profile.
+        NOTE: Work done by the worker processes (see set_num_workers) is not included.
+        """
+        if self.profile_dir is None or self._profiling:
+            yield
+            return
+        profiler = cProfile.Profile()
+        self._profiling = True
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self._profiling = False
+            os.makedirs(self.profile_dir, exist_ok=True)
+            self._num_profiles += 1
+            self.last_profile = os.path.join(self.profile_dir, f"{self._num_profiles:04d}-{what}.prof")
+            profiler.dump_stats(self.last_profile)
+
+    def group_summary(self, i: int, gp: Group) -> Optional[FilterRun]:
+        """
+        Summary of the last evaluation of the group gp on the i'th (1-indexed) dict: The total time of the filters of gp,
+        the number of entries the group was applied to and the number of entries in each error tier of its output.
+        Returns None if there are no results for gp.
+        NOTE: Length filters are evaluated by selecting a range of entries and do not count towards the time.
+        """
+        assert 1 <= i <= len(self.dict_specs)
+        u = self.unfiltered_dicts[i-1]
+        results = self.group_results[i-1]
+        if gp not in results:
+            return None
+        words_in = u.size
+        for previous_gp, tiers in results.items():
+            if previous_gp is gp:
+                break
+            words_in = sum(map(bitset.count, tiers))
+        seconds = 0.0
+        for fg in self.selected_filters:
+            if fg.g is gp and fg.f.active and u.spec.display in fg.f.stats.runs:
+                seconds += fg.f.stats.runs[u.spec.display].seconds
+        return FilterRun(seconds, words_in, list(map(bitset.count, results[gp])))
+
+    def set_num_workers(self, num_workers: int):
+        """
+        Opt-in parallel evaluation: With num_workers > 0, large dicts are split into num_workers shards that are held
+        by persistent worker processes (see pool.py), which evaluate the filters in parallel.
+        num_workers = 0 evaluates everything in this process.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+        self._pool_keys = [None for _ in self.unfiltered_dicts]
+        if num_workers > 0:
+            self._pool = WorkerPool(num_workers)
+
+    @property
+    def num_workers(self) -> int:
+        return 0 if self._pool is None or self._pool.closed else self._pool.num_workers
+
+    def _pool_key(self, i: int) -> Optional[int]:
+        """
+        key of the i'th (0-indexed!) dict in the worker pool (registering it if needed), or None if the dict should
+        be evaluated in this process.
+        """
+        with self._lock:
+            u = self.unfiltered_dicts[i]
+            if self._pool is not None and self._pool.closed:
+                # a worker failed (see PoolFailure), so everything is evaluated in this process from now on.
+                self._pool = None
+                self._pool_keys = [None for _ in self.unfiltered_dicts]
+            if self._pool is None or not self._pool.supports(u):
+                self._release_pool_dict(i)
+                return None
+            if self._pool.is_registered(self._pool_keys[i], u):
+                return self._pool_keys[i]
+            self._release_pool_dict(i)
+            try:
+                self._pool_keys[i] = self._pool.register(u)
+            except PoolUnsupported:
+                return None
+            return self._pool_keys[i]
+
+    def _release_pool_dict(self, i: int):
+        """
+        makes the worker processes drop the i'th (0-indexed!) dict
+        """
+        if self._pool is not None and self._pool_keys[i] is not None:
+            self._pool.unregister(self._pool_keys[i])
+        self._pool_keys[i] = None
+
+    def _compute_dict(self, i: int, check: Optional[Callable[[], None]] = None) -> dict[Group, list[int]]:
+        """
+        runs all active filters on the i'th (0-indexed!) dict and returns the results of each group.
+        """
+        u = self.unfiltered_dicts[i]
+        filters_by_group = self._evaluation_order()
+        key = self._pool_key(i)
+        if key is not None:
+            try:
+                return dict(zip(filters_by_group.keys(), self._pool.evaluate(key, filters_by_group)))
+            except PoolUnsupported:
+                pass
+        return evaluate_filter_groups(u, filters_by_group, self.StrictGroup, check=check)
+
+    @staticmethod
+    def _narrow_later_groups(results: dict[Group, list[int]], gp: Group):
+        """
+        After the results of group gp got smaller, restrict the results of all groups that come after gp to the new
+        output of gp (modifying results).
+        NOTE: This relies on the fact that whether an entry passes a group is independent of the other groups.
+        """
+        survivors = merge_mask_tiers(results[gp])
+        found = False
+        for later_gp in results.keys():
+            if found:
+                results[later_gp] = [tier & survivors for tier in results[later_gp]]
+            elif later_gp is gp:
+                found = True
+
+    def _has_valid_group_results(self, i: int) -> bool:
+        """
+        checks whether the cached group results for the i'th (0-indexed!) dict can be used for incremental updates.
+        """
+        results = self.group_results[i]
+        if list(results.keys()) != list(self.filter_by_group.keys()):
+            return False
+        return all(len(tiers) == gp.max_errors + 1 for gp, tiers in results.items())
+
+    def _evaluate_new_filter(self, new_filter: FilterWithGroup):
+        """
+        Updates the filtered dicts after new_filter was added (or activated), without recomputing everything:
+        The new filter only needs to be run on the current output of its own group, which is then used to narrow
+        the results of all later groups (see _apply_new_filter).
+        """
+        if not self.active:
+            return
+        with self._lock:
+            for i in range(len(self.unfiltered_dicts)):
+                if not self._needs_full[i]:
+                    self._new_filters[i] += [new_filter]
+            self._schedule("add_filter")
+
+    def _apply_new_filter(self, i: int, results: dict[Group, list[int]], new_filter: FilterWithGroup, check: Optional[Callable[[], None]] = None):
+        """
+        updates the group results of the i'th (0-indexed!) dict (modifying results) for the newly added new_filter.
+        check is passed on to apply_filter_to_mask_tiers.
+        """
+        gp = new_filter.g
+        new_tiers = None
+        key = self._pool_key(i)
+        if key is not None:
+            try:
+                new_tiers = self._pool.apply_filter(key, new_filter.f, results[gp], max_errors=gp.max_errors)
+            except PoolUnsupported:
+                pass
+        if new_tiers is None:
+            new_tiers = apply_filter_to_mask_tiers(new_filter.f, self.unfiltered_dicts[i], results[gp], max_errors=gp.max_errors, check=check)
+        results[gp] = new_tiers
+        self._narrow_later_groups(results, gp)
 
     def reload(self):
         """
         reloads all dicts and runs all filters on all dicts
         """
-        for u in self.unfiltered_dicts:
-            u.reload()
-        self.compute_filtered_dicts()
+        with self._lock:
+            for i, u in enumerate(self.unfiltered_dicts):
+                self._release_pool_dict(i)
+                u.reload()
+            self.compute_filtered_dicts()
 
     def activate_dict(self, i: int):
         """
@@ -102,10 +472,12 @@ class State:
         """
         assert i >= 1
         assert i <= len(self.dict_specs)
-        self.dict_specs[i-1].make_active()
-        self.unfiltered_dicts[i-1].make_active()
-        if self.active:
-            self.filtered_dicts[i-1] = apply_filter_groups(self.filter_by_group, self.unfiltered_dicts[i-1].L)
+        with self._lock:
+            self.dict_specs[i-1].make_active()
+            self.unfiltered_dicts[i-1].make_active()
+            if self.active:
+                self._mark_full(i-1)
+                self._schedule("activate_dict")
 
     def deactivate_dict(self, i: int):
         """
@@ -113,9 +485,12 @@ class State:
         """
         assert i >= 1
         assert i <= len(self.dict_specs)
-        self.dict_specs[i-1].make_inactive()
-        self.unfiltered_dicts[i-1].make_inactive()
-        self.filtered_dicts[i-1] = []  # Do this unconditionally
+        with self._lock:
+            self.dict_specs[i-1].make_inactive()
+            self.unfiltered_dicts[i-1].make_inactive()
+            self._release_pool_dict(i-1)
+            self._store_results(i-1, {})  # Do this unconditionally
+            self._schedule("deactivate_dict")
 
     def toggle_dict(self, i: int):
         assert 1 <= i <= len(self.dict_specs)
@@ -130,18 +505,34 @@ class State:
         """
         assert i >= 1
         assert i <= len(self.dict_specs)
-        del self.dict_specs[i-1]
-        del self.unfiltered_dicts[i-1]
-        del self.filtered_dicts[i-1]
+        with self._lock:
+            self._release_pool_dict(i-1)
+            del self._pool_keys[i-1]
+            del self.dict_specs[i-1]
+            del self.unfiltered_dicts[i-1]
+            del self.filtered_masks[i-1]
+            del self._filtered_words[i-1]
+            del self.group_results[i-1]
+            del self._needs_full[i-1]
+            del self._new_filters[i-1]
+            self._schedule("delete_dict")
 
     def add_dict(self, new_dict_spec):
         """
         Adds new dict and evaluates all active filters on it.
+        Only the new dict is evaluated.
         """
-        self.dict_specs += [new_dict_spec]
-        new_unfiltered_dict = UnfilteredDict(new_dict_spec)
-        self.unfiltered_dicts += [new_unfiltered_dict]
-        self.compute_filtered_dicts()
+        new_unfiltered_dict = self._make_dict(new_dict_spec)
+        with self._lock:
+            self.dict_specs += [new_dict_spec]
+            self.unfiltered_dicts += [new_unfiltered_dict]
+            self.filtered_masks += [[]]
+            self._filtered_words += [None]
+            self.group_results += [{}]
+            self._pool_keys += [None]
+            self._needs_full += [self.active]
+            self._new_filters += [[]]
+            self._schedule("add_dict")
 
     def add_filter(self, new_filter: Union[Filter, FilterWithGroup]):
         """
@@ -153,17 +544,20 @@ class State:
             else:
                 new_filter = FilterWithGroup(new_filter, self.StrictGroup)
         assert isinstance(new_filter, FilterWithGroup)
-        self.selected_filters += [new_filter]
-        self.sort_filters()
-        self.compute_filtered_dicts()  # could simplify by only computing current
+        with self._lock:
+            self.selected_filters += [new_filter]
+            self.sort_filters()
+            if new_filter.f.active:
+                self._evaluate_new_filter(new_filter)
 
     def delete_filter(self, i: int):
         """
         Removes the i'th filter (1-indexed)
         """
         assert 1 <= i <= len(self.selected_filters)
-        del self.selected_filters[i-1]
-        self.compute_filtered_dicts()
+        with self._lock:
+            del self.selected_filters[i-1]
+            self.compute_filtered_dicts()
 
 
     def toggle_filter(self, i: int):
@@ -171,74 +565,159 @@ class State:
         toggles activity of the i'th filter (1-indexed)
         """
         assert 1 <= i <= len(self.selected_filters)
-        self.selected_filters[i - 1].toggle_active()
-        self.compute_filtered_dicts()
+        with self._lock:
+            self.selected_filters[i - 1].toggle_active()
+            if self.selected_filters[i - 1].f.active:
+                self._evaluate_new_filter(self.selected_filters[i - 1])
+            else:
+                self.compute_filtered_dicts()
+
     def activate_filter(self, i: int):
         """
         Activates the i'th filter (1-indexed)
         """
         assert 1 <= i <= len(self.selected_filters)
-        self.selected_filters[i-1].make_active()
-        self.compute_filtered_dicts()
+        with self._lock:
+            if self.selected_filters[i-1].f.active:
+                return
+            self.selected_filters[i-1].make_active()
+            self._evaluate_new_filter(self.selected_filters[i-1])
 
     def deactivate_filter(self, i: int):
         """
         Deactivates the i'th filter (1-indexed)
         """
         assert 1 <= i <= len(self.selected_filters)
-        self.selected_filters[i-1].make_inactive()
-        self.compute_filtered_dicts()
+        with self._lock:
+            self.selected_filters[i-1].make_inactive()
+            self.compute_filtered_dicts()
+
+    @staticmethod
+    def _cost_order(filters: list[Filter]) -> list[Filter]:
+        """
+        the filters (of one group) sorted by their measured expected cost (see FilterStats). If some active filter has
+        no statistics yet, there is nothing to compare it with, so the static priorities are kept.
+        """
+        if not all(fil.stats.has_data for fil in filters if fil.active):
+            return list(filters)
+        return sorted(filters, key=lambda fil: (fil.stats.expected_cost, fil.priority))
+
+    def _estimate_filter_stats(self):
+        """
+        Estimates the statistics of active filters that were not run yet on a sample of the first active dict.
+        This is part of evaluation (see _compute_results), so it runs in the background with a BackgroundEvaluator: The
+        first sample of a filter may build an index of the dict, which can take a while.
+        """
+        with self._lock:
+            sample_source = next((u for u in self.unfiltered_dicts if u.is_active and u.size > 0), None)
+            filters = [fg.f for fg in self.selected_filters if fg.f.active and not fg.f.stats.has_data]
+        if sample_source is None:
+            return
+        for fil in filters:
+            sample_filter_stats(fil, sample_source)
+
+    def _evaluation_order(self) -> dict[Group, list[Filter]]:
+        """
+        filter_by_group, with the filters of each group in the order in which they are evaluated, see _cost_order.
+        Unlike sort_filters, this does not reorder selected_filters (whose order the frontend uses to refer to filters).
+        """
+        return {gp: self._cost_order(filters) for gp, filters in self.filter_by_group.items()}
 
     def sort_filters(self):
-        d = self.filter_by_group
-        for gp in d.keys():
-            d[gp].sort(key=lambda x: x.priority)
-        # self.selected_filters.sort(key=lambda x: x.f.priority)
-        new_filter_list = [FilterWithGroup(fil, self.StrictGroup) for fil in d[self.StrictGroup]]
-        new_filter_list += [FilterWithGroup(fil, self.DefaultGroup) for fil in d[self.DefaultGroup]]
-        for gp in self.groups:
-            new_filter_list += [FilterWithGroup(fil, gp) for fil in d[gp]]
-        self.selected_filters = new_filter_list
-        self.validate()
+        """
+        Sorts the filters by group and within each group by priority. This is the order in which the frontend lists
+        (and refers to) the filters, so it does not depend on measured statistics, see _evaluation_order.
+        Holds the lock of the state, as the frontend calls this while a BackgroundEvaluator may be running.
+        """
+        with self._lock:
+            d = self.filter_by_group
+            for gp in d.keys():
+                d[gp].sort(key=lambda x: x.priority)
+            # self.selected_filters.sort(key=lambda x: x.f.priority)
+            new_filter_list = [FilterWithGroup(fil, self.StrictGroup) for fil in d[self.StrictGroup]]
+            new_filter_list += [FilterWithGroup(fil, self.DefaultGroup) for fil in d[self.DefaultGroup]]
+            for gp in self.groups:
+                new_filter_list += [FilterWithGroup(fil, gp) for fil in d[gp]]
+            self.selected_filters = new_filter_list
+            self.validate()
 
     def add_group(self, max_errors):
-        new_group = Group(max_errors)
-        self.groups += [new_group]
-
+        """
+        Adds a new (empty) group that allows max_errors errors
+        """
+        with self._lock:
+            self.groups += [Group(max_errors)]
 
     def delete_group(self, i: int):
         """
         Deletes the i'th group (1-indexed)
         """
-        assert 1 <= i <=len(self.groups)
-        gp = self.groups[i-1]
-        for fil in self.selected_filters:
-            if fil.g is gp:
-                fil.g = self.DefaultGroup
-        del self.groups[i-1]
-        self.validate()
-        self.compute_filtered_dicts()
+        with self._lock:
+            assert 1 <= i <=len(self.groups)
+            gp = self.groups[i-1]
+            for fil in self.selected_filters:
+                if fil.g is gp:
+                    fil.g = self.DefaultGroup
+            del self.groups[i-1]
+            self.validate()
+            self.compute_filtered_dicts()
 
     def add_filter_to_group(self, filter_index: int, group_index: int):
-        assert 1 <= filter_index <= len(self.selected_filters)
-        assert 1 <= group_index <= len(self.groups)
-        assert self.selected_filters[filter_index-1].f.allow_errors
-        self.selected_filters[filter_index-1].g = self.groups[group_index-1]
-        self.validate()
-        self.sort_filters()
-        self.validate()
-        self.compute_filtered_dicts()
+        """
+        Moves the filter_index'th filter to the group_index'th group (both 1-indexed)
+        """
+        with self._lock:
+            assert 1 <= filter_index <= len(self.selected_filters)
+            assert 1 <= group_index <= len(self.groups)
+            assert self.selected_filters[filter_index-1].f.allow_errors
+            self.selected_filters[filter_index-1].g = self.groups[group_index-1]
+            self.validate()
+            self.sort_filters()
+            self.validate()
+            self.compute_filtered_dicts()
 
     def remove_filter_from_group(self, filter_index: int):
-        assert 1 <= filter_index <= len(self.selected_filters)
-        assert self.selected_filters[filter_index-1].g is not self.StrictGroup
-        self.selected_filters[filter_index-1].g = self.DefaultGroup
-        self.validate()
-        self.sort_filters()
-        self.validate()
-        self.compute_filtered_dicts()
+        """
+        Moves the filter_index'th filter (1-indexed) back to the default group
+        """
+        with self._lock:
+            assert 1 <= filter_index <= len(self.selected_filters)
+            assert self.selected_filters[filter_index-1].g is not self.StrictGroup
+            self.selected_filters[filter_index-1].g = self.DefaultGroup
+            self.validate()
+            self.sort_filters()
+            self.validate()
+            self.compute_filtered_dicts()
 
     def set_max_errors(self, max_errors: int = 0):
-        # We actually modify the existing object, because comparison is done via "is"
-        self.DefaultGroup.max_errors = max_errors
-        self.compute_filtered_dicts()
+        with self._lock:
+            # We actually modify the existing object, because comparison is done via "is"
+            old_max_errors = self.DefaultGroup.max_errors
+            self.DefaultGroup.max_errors = max_errors
+            if max_errors > old_max_errors or not self.active:
+                self.compute_filtered_dicts()
+                return
+            # Allowing fewer errors just drops the highest error tiers (which is cheap enough to do right away).
+            for i in range(len(self.unfiltered_dicts)):
+                results = self.group_results[i]
+                if self._needs_full[i] or self._new_filters[i] or self.DefaultGroup not in results or len(results[self.DefaultGroup]) != old_max_errors + 1:
+                    self._mark_full(i)
+                    continue
+                results = dict(results)
+                results[self.DefaultGroup] = results[self.DefaultGroup][:max_errors+1]
+                self._narrow_later_groups(results, self.DefaultGroup)
+                self._store_results(i, results)
+            self._schedule("set_max_errors")
+
+    def multiword_anagrams(self, letters: str, num_words: int, *, lengths: Optional[list[int]] = None, limit: Optional[int] = None) -> Iterator[tuple[str, ...]]:
+        """
+        combinations of num_words entries of the active dicts that consist of exactly the given letters, see
+        dictmanager/anagrams.py
+        """
+        return multiword_anagrams(self.unfiltered_dicts, letters, num_words, lengths=lengths, limit=limit)
+
+    def decode_morse_stream(self, stream: str, *, max_words: int = 1, max_errors: int = 0, limit: Optional[int] = None) -> Iterator[tuple[int, tuple[str, ...]]]:
+        """
+        decodings of a Morse stream without separators into entries of the active dicts, see dictmanager/morsestream.py
+        """
+        return decode_morse_stream(self.unfiltered_dicts, stream, max_words=max_words, max_errors=max_errors, limit=limit)
@@ -0,0 +1,75 @@
+import os
+import random
+import sys
+import pytest
+
+# The packages of the repository (dictmanager, filters, state, ...) are imported from its top directory.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dictmanager import UnfilteredDict
+from dictmanager.cache import CACHE_DIR_ENV
+from dictmanager.npbackend import np
+
+# The evaluation paths that must give the same results: (use_numpy, use_trie) of UnfilteredDict.
+ENGINES = {
+    "list": (False, False),
+    "numpy": (True, False),
+    "list-trie": (False, True),
+    "numpy-trie": (True, True),
+}
+
+
+def _make_entries() -> list[str]:
+    rng = random.Random(2024)
+    entries = {"".join(rng.choice("aeinrstlmokb") for _ in range(rng.randint(1, 9))) for _ in range(400)}
+    entries |= {"anna", "otto", "eisen", "reisen", "rasten", "tarnen", "ratten", "leinsart", "salter", "morse", "sos",
+                "kanne", "nennen", "eta", "ae", "tee", "see"}
+    return sorted(entries, key=lambda w: (len(w), w))
+
+
+ENTRIES = _make_entries()
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """
+    keeps the on-disk cache of normalized dicts of the tests out of the cache of the user
+    """
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture(params=list(ENGINES), ids=list(ENGINES))
+def engine(request, monkeypatch) -> str:
+    """
+    runs the test for each evaluation path of ENGINES
+    """
+    use_numpy, use_trie = ENGINES[request.param]
+    if use_numpy and np is None:
+        pytest.skip("numpy is not available")
+    monkeypatch.setattr(UnfilteredDict, "use_numpy", use_numpy)
+    monkeypatch.setattr(UnfilteredDict, "use_trie", use_trie)
+    return request.param
+
+
+@pytest.fixture
+def entries() -> list[str]:
+    """
+    fixed list of (normalized) entries, sorted as UnfilteredDict.L
+    """
+    return list(ENTRIES)
+
+
+@pytest.fixture
+def source(engine, entries) -> UnfilteredDict:
+    return UnfilteredDict.from_entries(entries)
+
+
+@pytest.fixture
+def dict_file(tmp_path, entries) -> str:
+    """
+    dict file with the entries (in a different order)
+    """
+    path = tmp_path / "entries.txt"
+    path.write_text("\n".join(reversed(entries)) + "\n")
+    return str(path)
@@ -0,0 +1,38 @@
+import itertools
+import pytest
+from dictmanager import UnfilteredDict
+from dictmanager.anagrams import multiword_anagrams
+from dictmanager.indexes import letter_histogram
+
+# The multi-word anagram solver must find the same combinations of entries as brute force.
+
+
+def _brute_force_anagrams(source: UnfilteredDict, letters: str, num_words: int) -> set[tuple[str, ...]]:
+    target = letter_histogram(letters)
+    words = [w for w in source.L if all(a <= b for a, b in zip(letter_histogram(w), target))]
+    out = set()
+    for combination in itertools.combinations_with_replacement(words, num_words):
+        if tuple(map(sum, zip(*map(letter_histogram, combination)))) == target:
+            out.add(tuple(sorted(combination)))
+    return out
+
+
+@pytest.mark.parametrize("letters, num_words", [("rasten", 1), ("leinsart", 1), ("annaotto", 2), ("eisenrate", 2), ("seetee", 2)])
+def test_multiword_anagrams(source, letters, num_words):
+    found = [tuple(sorted(words)) for words in multiword_anagrams([source], letters, num_words)]
+    assert len(found) == len(set(found))
+    assert set(found) == _brute_force_anagrams(source, letters, num_words)
+
+
+def test_lengths_and_limit(source):
+    everything = set(multiword_anagrams([source], "ottosee", 2))
+    with_lengths = set(multiword_anagrams([source], "ottosee", 2, lengths=[4, 3]))
+    assert with_lengths and with_lengths == {words for words in everything if sorted(map(len, words)) == [3, 4]}
+    assert len(everything) > 2 and len(list(multiword_anagrams([source], "ottosee", 2, limit=2))) == 2
+
+
+def test_several_dicts(entries):
+    first, second = UnfilteredDict.from_entries(entries[::2]), UnfilteredDict.from_entries(entries[1::2])
+    combined = UnfilteredDict.from_entries(entries)
+    found = {tuple(sorted(words)) for words in multiword_anagrams([first, second], "ottosee", 2)}
+    assert len(found) > 1 and found == _brute_force_anagrams(combined, "ottosee", 2)
@@ -0,0 +1,68 @@
+import pytest
+from dictmanager import DictSpecification, normalizeToAscii
+from filters import apply_filters_with_mask_tiers, apply_filter_to_mask_tiers, filter_from_description
+from filters import defs
+from state import BackgroundEvaluator, State
+from state.evaluation import EvaluationCancelled
+from utils import bitset
+
+DESCRIPTIONS = [
+    {"type": "contains", "substring": "ei"},
+    {"type": "position", "pos": 2, "options": "aeiou"},
+    {"type": "regexp", "regexp": "^[^aeiou]*e.*"},
+    {"type": "morse", "pattern": "3 .- * 2"},
+]
+
+
+def test_background_matches_immediate(engine, dict_file):
+    specs = [DictSpecification(dict_file, normalizer=normalizeToAscii), DictSpecification(dict_file, normalizer=normalizeToAscii)]
+    background, immediate = State(specs, do_eval=True), State(list(specs), do_eval=True)
+    evaluator = BackgroundEvaluator(background)
+    try:
+        for description in DESCRIPTIONS:
+            for state in (background, immediate):
+                state.add_filter(filter_from_description(description))
+        for state in (background, immediate):
+            state.set_max_errors(2)
+            state.toggle_filter(2)
+        for i in (2, 1):
+            evaluator.wait_for(i)
+            assert background.filtered_entries(i) == immediate.filtered_entries(i)
+        assert evaluator.error is None
+    finally:
+        evaluator.close()
+    assert not background.deferred
+
+
+def _cancel_after(num_calls: int):
+    calls = []
+
+    def check():
+        calls.append(None)
+        if len(calls) > num_calls:
+            raise EvaluationCancelled()
+    return check, calls
+
+
+def test_check_between_chunks(source, monkeypatch):
+    monkeypatch.setattr(defs, "CHECK_CHUNK", 40)
+    filters = [filter_from_description(description) for description in DESCRIPTIONS]
+    candidates = bitset.from_ids(range(source.size), source.size)
+    check, calls = _cancel_after(source.size)
+    for max_errors in range(3):
+        tiers = [candidates] + [0] * max_errors
+        expected = apply_filters_with_mask_tiers(filters, source, candidates, max_errors=max_errors)
+        assert apply_filters_with_mask_tiers(filters, source, candidates, max_errors=max_errors, check=check) == expected
+        for fil in filters:
+            tiers = apply_filter_to_mask_tiers(fil, source, tiers, max_errors=max_errors, check=check)
+        assert tiers == expected
+    assert len(calls) > 3 * source.size // 40
+
+
+def test_cancel_within_a_filter(source, monkeypatch):
+    monkeypatch.setattr(defs, "CHECK_CHUNK", 40)
+    fil = filter_from_description(DESCRIPTIONS[0])
+    check, calls = _cancel_after(2)
+    with pytest.raises(EvaluationCancelled):
+        apply_filter_to_mask_tiers(fil, source, [bitset.from_ids(range(source.size), source.size)], check=check)
+    assert len(calls) == 3
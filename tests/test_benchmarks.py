@@ -0,0 +1,28 @@
+import pytest
+from benchmarks.__main__ import parse_size
+from benchmarks.suite import compare_results, run_benchmarks
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks([500], str(tmp_path), repeat=1, log=lambda s: None)
+    assert results["meta"]["sizes"] == [500]
+    assert all(name.endswith("/n=500") and seconds >= 0 for name, seconds in results["results"].items())
+    for name in ["reload/normalizeToAscii", "reload_cached/normalizeToAscii", "index/position_index",
+                 "filter/Match regular expression/e=0", "combined/mask_tiers/e=3", "state/compute_filtered_dicts"]:
+        assert f"{name}/n=500" in results["results"]
+
+
+def test_run_some_areas(tmp_path):
+    results = run_benchmarks([200], str(tmp_path), repeat=1, areas=["filters"], log=lambda s: None)
+    assert results["results"] and all(name.startswith("filter/") for name in results["results"])
+
+
+def test_compare_results():
+    baseline = {"results": {"a": 1.0, "b": 1.0, "c": 1e-4, "d": 1.0}}
+    current = {"results": {"a": 1.1, "b": 2.0, "c": 1e-3 / 2, "e": 5.0}}
+    assert compare_results(baseline, current, threshold=1.2) == [("b", 1.0, 2.0)]
+
+
+@pytest.mark.parametrize("s, n", [("500", 500), ("10k", 10**4), ("1M", 10**6), ("2.5m", 2500000)])
+def test_parse_size(s, n):
+    assert parse_size(s) == n
@@ -0,0 +1,38 @@
+import random
+import pytest
+from utils import bitset
+
+SIZE = 1000
+
+
+@pytest.fixture(params=["numpy", "python"])
+def implementation(request, monkeypatch):
+    """
+    runs the test with and without the numpy versions of from_ids and to_ids
+    """
+    if request.param == "numpy" and bitset.np is None:
+        pytest.skip("numpy is not available")
+    if request.param == "python":
+        monkeypatch.setattr(bitset, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("ids", [[], [0], [SIZE - 1], [7, 8, 9, 63, 64, 65], sorted(random.Random(3).sample(range(SIZE), 300))], ids=len)
+def test_round_trip(implementation, ids):
+    bits = bitset.from_ids(ids, SIZE)
+    assert bits == sum(1 << i for i in ids)
+    assert bitset.to_ids(bits) == ids
+    assert bitset.count(bits) == len(ids)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 8, 10, 64, 1 << 16])
+def test_iter_id_chunks(chunk_size):
+    ids = sorted(random.Random(5).sample(range(SIZE), 200))
+    chunks = list(bitset.iter_id_chunks(bitset.from_ids(ids, SIZE), chunk_size))
+    assert all(chunks)
+    assert [i for chunk in chunks for i in chunk] == ids
+
+
+@pytest.mark.parametrize("start, end", [(0, 0), (0, 1), (5, 3), (3, 70), (0, SIZE)])
+def test_range_bits(start, end):
+    assert bitset.to_ids(bitset.range_bits(start, end)) == list(range(start, end))
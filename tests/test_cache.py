@@ -0,0 +1,41 @@
+import pytest
+from dictmanager import DictSpecification, UnfilteredDict, normalizeToAscii, normalizeStreets
+from dictmanager import manager
+
+
+def _fail_loading(*args):
+    raise AssertionError("the dict file should have been read from the cache")
+
+
+def test_second_load_uses_cache(entries, dict_file, cache_dir, monkeypatch):
+    first = UnfilteredDict(DictSpecification(dict_file, normalizer=normalizeToAscii))
+    assert first.L == entries
+    assert len(list(cache_dir.glob("*.dict"))) == 1
+    monkeypatch.setattr(manager, "load_entries", _fail_loading)
+    second = UnfilteredDict(DictSpecification(dict_file, normalizer=normalizeToAscii))
+    assert second.L == entries
+    assert second.length_offsets == first.length_offsets
+    assert str(second.load_stats) == str(first.load_stats)
+
+
+@pytest.mark.parametrize("change", ["contents", "normalizer"])
+def test_cache_is_not_used_for_other_input(dict_file, monkeypatch, change):
+    UnfilteredDict(DictSpecification(dict_file, normalizer=normalizeToAscii))
+    normalizer = normalizeToAscii
+    if change == "contents":
+        with open(dict_file, "a") as f:
+            f.write("Zusatz\n")
+    else:
+        normalizer = normalizeStreets
+    loads = []
+    original = manager.load_entries
+    monkeypatch.setattr(manager, "load_entries", lambda *args: loads.append(args) or original(*args))
+    u = UnfilteredDict(DictSpecification(dict_file, normalizer=normalizer))
+    assert len(loads) == 1
+    assert ("zusatz" in u.L) == (change == "contents")
+
+
+def test_without_cache(entries, dict_file, cache_dir):
+    u = UnfilteredDict(DictSpecification(dict_file, normalizer=normalizeToAscii, use_cache=False))
+    assert u.L == entries
+    assert not cache_dir.exists() or not list(cache_dir.glob("*.dict"))
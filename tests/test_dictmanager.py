@@ -0,0 +1,25 @@
+import pytest
+from dictmanager import DictSpecification, UnfilteredDict, normalizeToAscii
+from utils import bitset
+
+
+def test_entries_sorted_by_length(entries, dict_file):
+    u = UnfilteredDict(DictSpecification(dict_file, normalizer=normalizeToAscii, use_cache=False))
+    assert u.L == sorted(entries, key=lambda w: (len(w), w))
+    for n in range(len(u.length_offsets) - 1):
+        assert all(len(w) == n for w in u.L[u.length_offsets[n]:u.length_offsets[n+1]])
+
+
+@pytest.mark.parametrize("min_length, max_length", [(None, None), (3, None), (None, 4), (2, 5), (5, 2), (0, 100), (20, None)])
+def test_bits_in_length_range(entries, min_length, max_length):
+    u = UnfilteredDict.from_entries(entries)
+    expected = [w for w in u.L if (min_length is None or len(w) >= min_length) and (max_length is None or len(w) <= max_length)]
+    assert u.words_of(u.bits_in_length_range(min_length, max_length)) == expected
+
+
+def test_iter_sorted_words_of(entries):
+    u = UnfilteredDict.from_entries(entries)
+    bits = bitset.from_ids(range(0, u.size, 3), u.size)
+    chunks = list(u.iter_sorted_words_of(bits, chunk_size=50))
+    assert all(0 < len(chunk) <= 50 for chunk in chunks)
+    assert [w for chunk in chunks for w in chunk] == sorted(u.words_of(bits))
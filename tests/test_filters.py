@@ -0,0 +1,108 @@
+import random
+import pytest
+from dictmanager import UnfilteredDict
+from filters import apply_filters_with_mask_tiers, apply_filter_to_mask_tiers, apply_filters_with_tiers, filter_from_description
+from filters.defs import tiers_from_error_counts
+from filters.simplefilters import AnagramFilter
+from utils import bitset
+
+# Every filter must give the same tiers on every evaluation path (see ENGINES) as its reference implementation,
+# apply_with_errors on the list of entries.
+
+MAX_ERRORS = 3
+
+DESCRIPTIONS = [
+    {"type": "length", "display": "Length is at least 3.", "min_length": 3, "max_length": None},
+    {"type": "length", "display": "Length is at most 7.", "min_length": None, "max_length": 7},
+    {"type": "contains", "substring": "ei"},
+    {"type": "contains", "substring": "nnee"},
+    {"type": "anagram", "letters": "leinsart"},
+    {"type": "anagram", "letters": "rate"},
+    {"type": "position", "pos": 2, "options": "aeiou"},
+    {"type": "position", "pos": 9, "options": "kn"},
+    {"type": "pattern", "pos1": 1, "pos2": 3},
+    {"type": "isomorph", "pattern": "abcb"},
+    {"type": "isomorph", "pattern": "abca.$"},
+    {"type": "regexp", "regexp": "^[^aeiou]*e"},
+    {"type": "regexp", "regexp": "(re|sa)i?s.n"},
+    {"type": "regexp", "regexp": "[kt].{2,4}e[rn]"},
+    {"type": "morse", "pattern": "3 .- * 2"},
+    {"type": "morse", "pattern": "* 1 .- 3"},
+    {"type": "morse", "pattern": "1 * 4"},
+]
+
+
+def _find(description_type: str, k: int = 0) -> dict:
+    return [d for d in DESCRIPTIONS if d["type"] == description_type][k]
+
+
+COMBINATIONS = [
+    [_find("contains"), _find("position"), _find("pattern")],
+    [_find("length"), _find("length", 1), _find("regexp")],
+    [_find("position", 1), _find("morse")],
+    [_find("anagram", 1), _find("morse")],
+    [_find("length"), _find("length", 1), _find("anagram"), _find("regexp")],
+    [_find("anagram"), _find("isomorph")],
+    [_find("pattern"), _find("isomorph", 1), _find("morse", 1)],
+]
+
+
+def _description_id(description: dict) -> str:
+    return f"{description['type']}-{list(description.values())[1]}"
+
+
+def _candidate_sets(source: UnfilteredDict) -> list[int]:
+    rng = random.Random(7)
+    return [bitset.from_ids(range(source.size), source.size),
+            bitset.from_ids(sorted(rng.sample(range(source.size), source.size // 3)), source.size)]
+
+
+def _reference_mask_tiers(fil, source: UnfilteredDict, candidates: int, max_errors: int) -> list[int]:
+    tiers = fil.apply_with_errors(source.words_of(candidates), max_errors=max_errors)
+    return [source.bitset_of(tiers[j]) if j < len(tiers) else 0 for j in range(max_errors+1)]
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS, ids=_description_id)
+def test_mask_tiers(source, description):
+    fil = filter_from_description(description)
+    for candidates in _candidate_sets(source):
+        for max_errors in range(MAX_ERRORS + 1):
+            expected = _reference_mask_tiers(fil, source, candidates, max_errors)
+            assert fil.mask_tiers(source, candidates, max_errors=max_errors) == expected
+
+
+@pytest.mark.parametrize("description", DESCRIPTIONS, ids=_description_id)
+def test_error_counts(source, description):
+    if source.charmatrix is None:
+        pytest.skip("error counts need the numpy backend")
+    fil = filter_from_description(description)
+    for candidates in _candidate_sets(source):
+        ids = bitset.to_id_array(candidates)
+        for max_errors in range(MAX_ERRORS + 1):
+            errors = fil.error_counts(source, ids, max_errors=max_errors)
+            tiers = tiers_from_error_counts(ids, errors, size=source.size, max_errors=max_errors)
+            assert tiers == _reference_mask_tiers(fil, source, candidates, max_errors)
+
+
+
+@pytest.mark.parametrize("lookups", [True, False], ids=["lookups", "scan"])
+def test_anagram_lookups(source, monkeypatch, lookups):
+    # both ways of evaluating an anagram filter, regardless of which one is estimated to be cheaper
+    monkeypatch.setattr(AnagramFilter, "_prefer_lookups", lambda self, source, num_candidates, max_errors: lookups)
+    test_mask_tiers(source, _find("anagram"))
+    if source.charmatrix is not None:
+        test_error_counts(source, _find("anagram", 1))
+
+
+@pytest.mark.parametrize("combination", COMBINATIONS, ids=lambda c: "+".join(d["type"] for d in c))
+def test_apply_filters_with_mask_tiers(source, combination):
+    filters = [filter_from_description(description) for description in combination]
+    candidates = bitset.from_ids(range(source.size), source.size)
+    for max_errors in range(MAX_ERRORS + 1):
+        expected = [source.bitset_of(tier) for tier in apply_filters_with_tiers(filters, source.L, max_errors=max_errors)]
+        assert apply_filters_with_mask_tiers(filters, source, candidates, max_errors=max_errors) == expected
+        # one filter after the other, as State does for new filters
+        tiers = [candidates] + [0] * max_errors
+        for fil in filters:
+            tiers = apply_filter_to_mask_tiers(fil, source, tiers, max_errors=max_errors)
+        assert tiers == expected
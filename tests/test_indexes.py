@@ -0,0 +1,73 @@
+import pytest
+from dictmanager.indexes import count_nearby_histograms, letter_histogram, morse_lengths, nearby_histograms, word_shape
+from utils import bitset, morse
+
+
+def _distance(hist1: tuple[int, ...], hist2: tuple[int, ...]) -> int:
+    return sum(abs(a - b) for a, b in zip(hist1, hist2))
+
+
+@pytest.mark.parametrize("pos", [1, 2, 5, 9, 10])
+def test_position_index(source, pos):
+    index = source.position_index
+    for c in "aek":
+        expected = [i for i, w in enumerate(source.L) if len(w) >= pos and w[pos-1] == c]
+        assert bitset.to_ids(index.bitsets_at(pos).get(c, 0)) == expected
+    assert index.any_of(pos, "aek") == index.any_of(pos, "a") | index.any_of(pos, "e") | index.any_of(pos, "k")
+
+
+@pytest.mark.parametrize("min_length, max_length", [(None, None), (3, None), (None, 4), (2, 5), (5, 2), (20, None)])
+def test_length_between(source, min_length, max_length):
+    assert source.position_index.length_between(min_length, max_length) == source.bits_in_length_range(min_length, max_length)
+
+
+@pytest.mark.parametrize("letters, max_distance", [("", 2), ("anna", 2), ("leinsart", 3)])
+def test_nearby_histograms(entries, letters, max_distance):
+    hist = letter_histogram(letters)
+    nearby = nearby_histograms(hist, max_distance)
+    everything = [h for hists in nearby for h in hists]
+    assert len(everything) == len(set(everything)) <= count_nearby_histograms(hist, max_distance)
+    for d, hists in enumerate(nearby):
+        assert all(_distance(h, hist) == d for h in hists)
+    for word in entries:
+        d = _distance(letter_histogram(word), hist)
+        if d <= max_distance:
+            assert letter_histogram(word) in nearby[d]
+
+
+@pytest.mark.parametrize("letters", ["rasten", "tee", "xyz", "leinsart"])
+def test_anagram_index(source, letters):
+    hist = letter_histogram(letters)
+    tiers = source.anagram_index.tier_ids(hist, 2)
+    for d in range(3):
+        assert sorted(tiers[d]) == [i for i, w in enumerate(source.L) if _distance(letter_histogram(w), hist) == d]
+
+
+def test_word_shape():
+    assert word_shape("otto") == word_shape("anna") == bytes([0, 1, 1, 0])
+    assert word_shape("reisen", 4) == word_shape("reisen")[:4] == bytes([0, 1, 2, 3])
+    assert word_shape("tee") != word_shape("see", 2)
+
+
+@pytest.mark.parametrize("length", [1, 3, 5, 12])
+def test_shape_index(source, length):
+    groups = source.shape_index.groups(length)
+    assert groups.start == source.length_range(length)[0]
+    for g, key in enumerate(groups.keys):
+        expected = [i for i in range(groups.start, source.size) if word_shape(source.L[i], length) == key]
+        assert sorted(groups.ids_of([g])) == expected
+        assert groups.bits_of([g], source.size) == bitset.from_ids(expected, source.size)
+
+
+def test_morse_lengths():
+    assert morse_lengths("eta") == bytes([len(morse.MORSECODE[c]) for c in "eta"]) == bytes([1, 1, 2])
+    assert morse_lengths("morse", 2) == bytes([2, 3])
+
+
+@pytest.mark.parametrize("length", [1, 4, 12])
+def test_morse_index(source, length):
+    groups = source.morse_index.groups(length)
+    assert groups.start == source.length_range(length)[0]
+    for g, key in enumerate(groups.keys):
+        expected = [i for i in range(groups.start, source.size) if morse_lengths(source.L[i], length) == key]
+        assert sorted(groups.ids_of([g])) == expected
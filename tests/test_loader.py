@@ -0,0 +1,34 @@
+import pytest
+from dictmanager import normalizeToAscii
+from dictmanager import loader
+from dictmanager.loader import load_entries, open_dict_file
+
+LINES = ["Eisen", "reisen", "", "Öl", "eisen", "Straße", "tee", "Tee", "--", "a b c"]
+
+
+def _write(path: str, lines: list[str]):
+    with open_dict_file(path, "utf-8", "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz", ".xz", ".bz2"])
+def test_compressed_files(tmp_path, suffix):
+    plain, compressed = str(tmp_path / "plain.txt"), str(tmp_path / f"compressed.txt{suffix}")
+    _write(plain, LINES)
+    _write(compressed, LINES)
+    entries, stats = load_entries(compressed, "utf-8", normalizeToAscii)
+    assert entries == load_entries(plain, "utf-8", normalizeToAscii)[0]
+    assert str(stats) == str(load_entries(plain, "utf-8", normalizeToAscii)[1])
+
+
+def test_sorted_and_deduplicated(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, "CHUNK_SIZE", 3)
+    path = str(tmp_path / "dict.txt")
+    _write(path, LINES)
+    entries, stats = load_entries(path, "utf-8", normalizeToAscii)
+    expected = {entry for line in LINES for entry in normalizeToAscii(line)}
+    assert entries == sorted(expected, key=lambda w: (len(w), w))
+    assert stats.lines == len(LINES)
+    assert stats.rejected == sum(1 for line in LINES if not normalizeToAscii(line))
+    assert stats.unique == len(entries)
+    assert stats.duplicates == stats.entries - len(entries)
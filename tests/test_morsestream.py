@@ -0,0 +1,61 @@
+import itertools
+import pytest
+from dictmanager import UnfilteredDict
+from dictmanager.indexes import MorseTrie, morse_code
+from dictmanager.morsestream import decode_morse_stream, parse_stream
+
+# Decoding Morse streams must find the same sequences of entries as brute force.
+
+
+def _brute_force_morse(source: UnfilteredDict, stream: str, max_words: int, max_errors: int) -> set[tuple[int, tuple[str, ...]]]:
+    words = [w for w in source.L if len(morse_code(w)) <= len(stream)]
+    out = set()
+    for num_words in range(1, max_words + 1):
+        for combination in itertools.product(words, repeat=num_words):
+            code = "".join(map(morse_code, combination))
+            if len(code) == len(stream):
+                errors = sum(a != b for a, b in zip(code, stream))
+                if errors <= max_errors:
+                    out.add((errors, combination))
+    return out
+
+
+@pytest.mark.parametrize("words, max_words, max_errors", [(["sos"], 1, 0), (["eta", "ae"], 2, 0), (["morse"], 1, 2), (["tee", "see"], 2, 1)])
+def test_decode_morse_stream(source, words, max_words, max_errors):
+    stream = "".join(map(morse_code, words))
+    found = list(decode_morse_stream([source], stream, max_words=max_words, max_errors=max_errors))
+    assert len(found) == len(set(found))
+    assert [errors for errors, _ in found] == sorted(errors for errors, _ in found)
+    assert set(found) == _brute_force_morse(source, stream, max_words, max_errors)
+
+
+def test_order_and_limit(source):
+    stream = "".join(map(morse_code, ["tee", "see"]))
+    found = list(decode_morse_stream([source], stream, max_words=2, max_errors=1))
+    assert len(found) > 3
+    for errors in {errors for errors, _ in found}:
+        # longer first words (i.e. Morse codes) come first
+        first_lengths = [len(morse_code(words[0])) for e, words in found if e == errors]
+        assert first_lengths == sorted(first_lengths, reverse=True)
+    assert list(decode_morse_stream([source], stream, max_words=2, max_errors=1, limit=3)) == found[:3]
+
+
+@pytest.mark.parametrize("max_errors", [0, 1, 2])
+def test_morse_trie_matches(entries, max_errors):
+    trie = MorseTrie(entries)
+    stream = "".join(map(morse_code, ["reisen", "tee"]))
+    for start in (0, 5):
+        expected = set()
+        for k, code in enumerate(trie.codes):
+            piece = stream[start:start+len(code)]
+            errors = sum(a != b for a, b in zip(piece, code))
+            if len(piece) == len(code) and errors <= max_errors:
+                expected.add((start + len(code), errors, k))
+        found = trie.matches(stream, start, max_errors)
+        assert len(found) == len(set(found)) and set(found) == expected
+
+
+def test_parse_stream():
+    assert parse_stream(" ...---\n... ") == "...---..."
+    with pytest.raises(ValueError):
+        parse_stream("..x-")
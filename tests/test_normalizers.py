@@ -0,0 +1,41 @@
+import pytest
+from dictmanager import normalizeToAscii, normalizeStreets
+from dictmanager.normalizers import TableNormalizer
+
+LINES = ["Eisen\n", "Öl\n", "a b c\n", "Hauptstraße\n", "Am Hbf.\n", "Café/Bar\n", "\n", "-\n", "日本\n", "Ærø\n", "Tee"]
+
+
+@pytest.mark.parametrize("normalizer", [normalizeToAscii, normalizeStreets], ids=repr)
+def test_normalize_many(normalizer):
+    assert normalizer.normalize_many(LINES) == [normalizer(line) for line in LINES]
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Eisen\n", ["eisen"]),
+    ("Öl", ["oel"]),
+    ("a b c", ["abc", "a", "b", "c"]),
+    ("Café/Bar", ["cafebar", "cafe", "bar"]),
+    ("Ærø", ["aero"]),
+    ("日本", []),
+    ("-", []),
+])
+def test_normalize_to_ascii(line, expected):
+    assert normalizeToAscii(line) == expected
+
+
+def test_normalize_streets():
+    assert normalizeStreets("Hauptstraße") == ["hauptstrasse", "hauptstr"]
+    # every matching rule gives a variant ("hbf" also ends in "bf")
+    assert normalizeStreets("Am Hbf.") == ["amhbf", "am", "hbf", "amhauptbahnhof", "amhbahnhof", "hauptbahnhof", "hbahnhof"]
+
+
+def test_unknown_characters():
+    with pytest.raises(ValueError):
+        normalizeToAscii("tee!")
+
+
+def test_identity():
+    same = TableNormalizer("normalizeToAscii", transliterate=normalizeToAscii.transliterate, delete=normalizeToAscii.delete, split_on=normalizeToAscii.split_on)
+    other = TableNormalizer("normalizeToAscii", transliterate=normalizeToAscii.transliterate, delete=normalizeToAscii.delete, split_on="/")
+    assert same.identity == normalizeToAscii.identity
+    assert other.identity != normalizeToAscii.identity
@@ -0,0 +1,35 @@
+import io
+import pytest
+from frontends.pager import layout_pages, page_output, tier_header
+
+
+def _chunks(entries: list[str], chunk_size: int) -> list[tuple[int, list[str]]]:
+    return [(0, entries[k:k+chunk_size]) for k in range(0, len(entries), chunk_size)]
+
+
+@pytest.mark.parametrize("width, rows", [(80, 10), (20, 3), (5, 2)])
+@pytest.mark.parametrize("chunk_size", [7, 1000])
+def test_layout_pages(entries, width, rows, chunk_size):
+    pages = list(layout_pages(_chunks(entries, chunk_size), width, rows))
+    lines = [line for page in pages for line in page.split("\n")]
+    assert [entry for line in lines for entry in line.split()] == entries
+    for page in pages:
+        assert len(page.split("\n")) <= rows
+        assert all(len(line) <= width or len(line.split()) == 1 for line in page.split("\n"))
+
+
+def test_headers(entries):
+    chunks = [(0, entries[:30]), (0, entries[30:50]), (2, entries[50:200])]
+    lines = "\n".join(layout_pages(chunks, 60, 8, headers=True)).split("\n")
+    assert [line for line in lines if line.startswith("---")] == [tier_header(0), tier_header(2)]
+    assert [entry for line in lines if not line.startswith("---") for entry in line.split()] == entries[:200]
+
+
+def test_page_output():
+    out = io.StringIO()
+    answers = iter(["", "q"])
+    assert not page_output(["a", "b", "c", "d"], interactive=True, ask=lambda prompt: next(answers), out=out)
+    assert out.getvalue() == "a\nb\n"
+    out = io.StringIO()
+    assert page_output(["a", "b"], interactive=False, out=out)
+    assert out.getvalue() == "a\nb\n"
@@ -0,0 +1,54 @@
+import pytest
+from dictmanager import DictSpecification, normalizeToAscii
+from filters import filter_from_description
+from state import State, pool
+
+DESCRIPTIONS = [
+    {"type": "contains", "substring": "ei"},
+    {"type": "pattern", "pos1": 1, "pos2": 3},
+    {"type": "morse", "pattern": "3 .- * 2"},
+]
+
+
+@pytest.fixture
+def states(dict_file, monkeypatch):
+    """
+    a State evaluating in two worker processes (even though the test dict is small) and one evaluating locally
+    """
+    monkeypatch.setattr(pool, "MIN_ENTRIES_PER_WORKER", 10)
+    specs = [DictSpecification(dict_file, normalizer=normalizeToAscii)]
+    parallel, local = State(specs, do_eval=True, num_workers=2), State(list(specs), do_eval=True)
+    yield parallel, local
+    parallel.set_num_workers(0)
+
+
+def _add_filter(states, description: dict):
+    for state in states:
+        state.add_filter(filter_from_description(description))
+
+
+def _results(state: State) -> tuple[list[str], list[int]]:
+    return state.filtered_entries(1), state.count_filtered_tiers(1)
+
+
+def test_pool_matches_local(states):
+    parallel, local = states
+    for description in DESCRIPTIONS:
+        _add_filter(states, description)
+        assert _results(parallel) == _results(local)
+    for state in states:
+        state.set_max_errors(2)
+    assert _results(parallel) == _results(local)
+    assert parallel.num_workers == 2 and parallel._pool_keys[0] is not None
+
+
+def test_fallback_when_a_worker_fails(states):
+    parallel, local = states
+    _add_filter(states, DESCRIPTIONS[0])
+    parallel._pool._processes[0].kill()
+    parallel._pool._processes[0].join()
+    _add_filter(states, DESCRIPTIONS[1])
+    assert _results(parallel) == _results(local)
+    assert parallel.num_workers == 0
+    _add_filter(states, DESCRIPTIONS[2])
+    assert _results(parallel) == _results(local)
@@ -0,0 +1,49 @@
+import re
+import pytest
+from filters.regexanalysis import analyze_regexp
+
+PATTERNS = ["^[^aeiou]*e", "an+a", "ei.*n$", "(re|sa)i?s.n", "[kt].{2,4}e[rn]", "o(tt|ss)o", "(?i)ANNA", "s?e+", ".*", "a|ee|sos",
+            "(ab)*rat", "[a-e]x?[^a]{3}$"]
+
+
+def _satisfies(entry: str, analysis) -> bool:
+    if len(entry) < analysis.min_length or (analysis.max_length is not None and len(entry) > analysis.max_length):
+        return False
+    if not entry.startswith(analysis.prefix) or not entry.endswith(analysis.suffix):
+        return False
+    if not all(literal in entry for literal in analysis.literals):
+        return False
+    if any(len(entry) < pos or entry[pos-1] not in chars for pos, chars in analysis.positions.items()):
+        return False
+    return all(len(entry) >= pos and entry[-pos] in chars for pos, chars in analysis.end_positions.items())
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_conditions_are_necessary(entries, pattern):
+    analysis = analyze_regexp(pattern)
+    compiled = re.compile(pattern)
+    for entry in entries:
+        if compiled.fullmatch(entry):
+            assert _satisfies(entry, analysis), (entry, str(analysis))
+
+
+def test_analysis():
+    analysis = analyze_regexp("re.*ss(en|on)t.s")
+    assert (analysis.min_length, analysis.max_length) == (9, None)
+    assert (analysis.prefix, analysis.suffix) == ("re", "s")
+    assert analysis.literals == ["ss"]
+    assert analysis.positions == {1: "r", 2: "e"}
+    assert analysis.end_positions == {1: "s", 3: "t"}
+
+
+def test_bounded_length():
+    analysis = analyze_regexp("[kt].{2,4}e[rn]")
+    assert (analysis.min_length, analysis.max_length) == (5, 7)
+    assert {pos: set(chars) for pos, chars in analysis.positions.items()} == {1: {"k", "t"}}
+    assert {pos: set(chars) for pos, chars in analysis.end_positions.items()} == {1: {"n", "r"}, 2: {"e"}}
+
+
+def test_ignorecase_gives_no_characters():
+    analysis = analyze_regexp("(?i)anna")
+    assert (analysis.min_length, analysis.max_length) == (4, 4)
+    assert not analysis.positions and not analysis.literals and analysis.prefix == ""
@@ -0,0 +1,74 @@
+import threading
+import pytest
+from dictmanager import DictSpecification, normalizeToAscii
+from filters import filter_from_description
+from state import QueryClient, QueryServer, RemoteState, ServerError, State
+
+DESCRIPTIONS = [
+    {"type": "length", "display": "Length is at least 3.", "min_length": 3, "max_length": None},
+    {"type": "contains", "substring": "ei"},
+    {"type": "anagram", "letters": "leinsart"},
+    {"type": "morse", "pattern": "3 .- * 2"},
+]
+
+
+@pytest.fixture
+def server(dict_file):
+    """
+    a query server for the test dict on a free local port, running in a thread
+    """
+    server = QueryServer([DictSpecification(dict_file, normalizer=normalizeToAscii)], ("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def states(server, dict_file):
+    """
+    a RemoteState of the server and a local State with the same dict
+    """
+    remote = RemoteState(QueryClient(str(server.server_address[1])), do_eval=True)
+    return remote, State([DictSpecification(dict_file, normalizer=normalizeToAscii)], do_eval=True)
+
+
+def _same_results(remote: RemoteState, local: State):
+    assert remote.filtered_entries(1) == local.filtered_entries(1)
+    assert remote.count_filtered_tiers(1) == local.count_filtered_tiers(1)
+    assert [w for _, words in remote.iter_filtered(1, 50) for w in words] == local.filtered_entries(1)
+
+
+def test_remote_matches_local(states):
+    remote, local = states
+    _same_results(remote, local)
+    for description in DESCRIPTIONS:
+        for state in states:
+            state.add_filter(filter_from_description(description))
+        _same_results(remote, local)
+    for state in states:
+        state.set_max_errors(2)
+    _same_results(remote, local)
+    for state in states:
+        state.toggle_filter(3)
+    _same_results(remote, local)
+
+
+def test_solvers(states):
+    remote, local = states
+    assert list(remote.multiword_anagrams("ottosee", 2)) == list(local.multiword_anagrams("ottosee", 2))
+    assert list(remote.decode_morse_stream("...---...", max_words=2, max_errors=1)) == list(local.decode_morse_stream("...---...", max_words=2, max_errors=1))
+
+
+def test_errors(server, dict_file):
+    client = QueryClient(str(server.server_address[1]))
+    with pytest.raises(ServerError):
+        client.call("evaluate", dict_index=0, groups=[{"max_errors": 0, "filters": [{"type": "bogus"}]}])
+    with pytest.raises(ServerError):
+        client.call("add_dict", path=dict_file + ".other")
+
+
+def test_only_local_addresses(dict_file):
+    with pytest.raises(ValueError):
+        QueryServer([DictSpecification(dict_file, normalizer=normalizeToAscii)], ("0.0.0.0", 0))
@@ -0,0 +1,147 @@
+import pstats
+import pytest
+from dictmanager import DictSpecification, normalizeToAscii
+from filters import apply_filters_with_tiers, merge_tiers, filter_from_description
+from state import State
+
+# Incremental updates of State (adding filters, changing max_errors, ...) must give the same results as evaluating
+# everything from scratch and as the plain list implementation of the filters (apply_filters_with_tiers).
+
+DESCRIPTIONS = [
+    {"type": "length", "display": "Length is at least 3.", "min_length": 3, "max_length": None},
+    {"type": "contains", "substring": "ei"},
+    {"type": "position", "pos": 2, "options": "aeiou"},
+    {"type": "pattern", "pos1": 1, "pos2": 3},
+    {"type": "regexp", "regexp": "^[^aeiou]*e.*"},
+    {"type": "morse", "pattern": "3 .- * 2"},
+]
+
+
+def _make_state(dict_file: str) -> State:
+    return State([DictSpecification(dict_file, normalizer=normalizeToAscii)], do_eval=True)
+
+
+def _reference_entries(state: State, entries: list[str]) -> list[str]:
+    out = entries
+    for gp, filters in state.filter_by_group.items():
+        out = merge_tiers(apply_filters_with_tiers(filters, out, max_errors=gp.max_errors))
+    return out
+
+
+def test_incremental_matches_full(engine, entries, dict_file):
+    state = _make_state(dict_file)
+    assert state.unfiltered_dicts[0].L == entries
+
+    def check():
+        incremental = (list(state.filtered_entries(1)), state.count_filtered_tiers(1))
+        assert sorted(incremental[0]) == sorted(_reference_entries(state, entries))
+        state.compute_filtered_dicts()
+        assert (list(state.filtered_entries(1)), state.count_filtered_tiers(1)) == incremental
+
+    for k in (0, 2, 5, 3):
+        state.add_filter(filter_from_description(DESCRIPTIONS[k]))
+        check()
+    for max_errors in (2, 1, 3):
+        state.set_max_errors(max_errors)
+        check()
+    state.toggle_filter(2)
+    check()
+    state.add_filter(filter_from_description(DESCRIPTIONS[4]))
+    check()
+    state.delete_filter(1)
+    check()
+    state.toggle_filter(1)
+    check()
+    state.add_filter(filter_from_description(DESCRIPTIONS[1]))
+    check()
+
+
+def test_add_dict(engine, entries, dict_file):
+    state = _make_state(dict_file)
+    state.add_filter(filter_from_description(DESCRIPTIONS[1]))
+    state.add_dict(DictSpecification(dict_file, normalizer=normalizeToAscii))
+    assert state.filtered_entries(2) == state.filtered_entries(1)
+    state.toggle_dict(1)
+    assert state.filtered_entries(1) == []
+    state.toggle_dict(1)
+    assert state.filtered_entries(1) == state.filtered_entries(2)
+
+
+
+def test_filtered_entries_in_alphabetical_order(engine, dict_file):
+    state = _make_state(dict_file)
+    state.add_filter(filter_from_description(DESCRIPTIONS[1]))
+    state.set_max_errors(1)
+    entries = state.filtered_entries(1)
+    num_exact, num_fuzzy = state.count_filtered_tiers(1)
+    assert num_exact > 0 and num_fuzzy > 0
+    assert entries == sorted(entries[:num_exact]) + sorted(entries[num_exact:])
+
+
+def test_measured_costs_do_not_reorder_filters(engine, dict_file):
+    state = _make_state(dict_file)
+    for description in reversed(DESCRIPTIONS):
+        state.add_filter(filter_from_description(description))
+    state.sort_filters()
+    assert all(fg.f.stats.has_data for fg in state.selected_filters)
+    listed = [fg.f for fg in state.selected_filters]
+    for filters in state.filter_by_group.values():
+        assert [fil.priority for fil in filters] == sorted(fil.priority for fil in filters)
+    state.compute_filtered_dicts()
+    state.sort_filters()
+    assert [fg.f for fg in state.selected_filters] == listed
+    for filters in state._evaluation_order().values():
+        costs = [fil.stats.expected_cost for fil in filters]
+        assert costs == sorted(costs)
+
+
+def test_filter_runs_per_dict(engine, dict_file):
+    state = _make_state(dict_file)
+    for description in DESCRIPTIONS[1:]:
+        state.add_filter(filter_from_description(description))
+    state.set_max_errors(1)
+    state.compute_filtered_dicts()
+    display = state.unfiltered_dicts[0].spec.display
+    for fg in state.selected_filters:
+        run = fg.f.stats.runs[display]
+        assert len(run.tier_sizes) == fg.g.max_errors + 1 and sum(run.tier_sizes) <= run.words_in
+    summaries = [state.group_summary(1, gp) for gp in state.group_results[0]]
+    assert summaries[0].words_in == state.unfiltered_dicts[0].size
+    assert summaries[-1].tier_sizes == state.count_filtered_tiers(1)
+
+
+def test_profile(dict_file, tmp_path):
+    state = _make_state(dict_file)
+    state.profile_dir = str(tmp_path / "profiles")
+    state.add_filter(filter_from_description(DESCRIPTIONS[1]))
+    assert state.last_profile is not None and state.last_profile.startswith(state.profile_dir)
+    pstats.Stats(state.last_profile)
+
+
+def test_lazy_filtered_dicts(engine, dict_file):
+    state = _make_state(dict_file)
+    state.add_dict(DictSpecification(dict_file, normalizer=normalizeToAscii))
+    state.add_filter(filter_from_description(DESCRIPTIONS[3]))
+    state.set_max_errors(1)
+    assert state.count_filtered(1) == sum(state.count_filtered_tiers(1)) > 0
+    assert state._filtered_words == [None, None]
+    filtered = state.filtered_dicts
+    assert len(filtered) == 2 and filtered[-1] == filtered[0] == state.filtered_entries(1)
+    assert state._filtered_words[1] is not None
+    assert len(filtered[0]) == state.count_filtered(1)
+    assert filtered[:] == [filtered[0], filtered[1]]
+    with pytest.raises(IndexError):
+        filtered[2]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 25, 1 << 16])
+def test_iter_filtered(engine, dict_file, chunk_size):
+    state = _make_state(dict_file)
+    state.add_filter(filter_from_description(DESCRIPTIONS[1]))
+    state.set_max_errors(2)
+    chunks = list(state.iter_filtered(1, chunk_size))
+    assert all(0 < len(words) <= chunk_size for _, words in chunks)
+    assert [errors for errors, _ in chunks] == sorted(errors for errors, _ in chunks)
+    assert [w for _, words in chunks for w in words] == state.filtered_entries(1)
+    for errors, size in enumerate(state.count_filtered_tiers(1)):
+        assert sum(len(words) for e, words in chunks if e == errors) == size
@@ -0,0 +1,42 @@
+from filters import filter_from_description
+from filters.stats import FilterStats, sample_filter_stats
+
+
+def test_measurements_replace_estimates():
+    stats = FilterStats()
+    stats.record(100, 10, 0.5, sampled=True)
+    assert stats.sampled and stats.pass_rate == 0.1
+    stats.record(1000, 500, 0.1, source="dict", tier_sizes=[500])
+    assert not stats.sampled and stats.words_in == 1000 and stats.pass_rate == 0.5
+    # estimates do not replace measurements
+    stats.record(100, 100, 1.0, sampled=True)
+    assert not stats.sampled and stats.words_in == 1000
+    stats.record(1000, 0, 0.1, source="dict", tier_sizes=[0])
+    assert stats.words_in == 2000 and stats.pass_rate == 0.25
+    assert stats.runs["dict"].tier_sizes == [0]
+
+
+def test_expected_cost():
+    cheap, expensive = FilterStats(), FilterStats()
+    cheap.record(1000, 100, 0.001)
+    expensive.record(1000, 100, 0.01)
+    assert cheap.expected_cost < expensive.expected_cost
+    useless = FilterStats()
+    useless.record(1000, 1000, 0.001)
+    assert useless.expected_cost > expensive.expected_cost
+
+
+def test_sample_filter_stats(source):
+    fil = filter_from_description({"type": "contains", "substring": "e"})
+    sample_filter_stats(fil, source, sample_size=100)
+    assert fil.stats.sampled and fil.stats.words_in == 100
+    expected = sum("e" in w for w in source.L)
+    assert 0 < fil.stats.words_passed < 100 and abs(fil.stats.pass_rate - expected / source.size) < 0.2
+
+
+def test_empty_run_keeps_estimate():
+    stats = FilterStats()
+    stats.record(100, 10, 0.5, sampled=True)
+    stats.record(0, 0, 0.0, source="dict", tier_sizes=[0, 0])
+    assert stats.sampled and stats.words_in == 100
+    assert stats.runs["dict"].words_in == 0
@@ -0,0 +1,42 @@
+import pytest
+from dictmanager.trie import CharCondition, Trie
+
+CONDITIONS = [
+    [],
+    [CharCondition(1, chars="aeiou")],
+    [CharCondition(2, chars="e"), CharCondition(4, chars="nst")],
+    [CharCondition(3, same_as=1), CharCondition(4, same_as=2)],
+    [CharCondition(1, chars="r"), CharCondition(2, chars="e"), CharCondition(8, same_as=1)],
+]
+
+
+def _violations(word: str, conditions: list[CharCondition]) -> int:
+    errors = 0
+    for cond in conditions:
+        if len(word) < cond.pos:
+            errors += 1
+        elif cond.chars is not None:
+            errors += word[cond.pos-1] not in cond.chars
+        else:
+            errors += word[cond.pos-1] != word[cond.same_as-1]
+    return errors
+
+
+def test_structure(entries):
+    trie = Trie(entries)
+    assert len(trie.term_ids) == len(entries)
+    assert trie.size[0] == trie.num_nodes
+    assert sorted(trie.term_ids) == list(range(len(entries)))
+    # the entries in preorder are sorted alphabetically
+    assert [entries[i] for i in trie.term_ids] == sorted(entries)
+
+
+@pytest.mark.parametrize("conditions", CONDITIONS, ids=lambda c: f"{len(c)} conditions")
+@pytest.mark.parametrize("min_length", [0, 4])
+def test_search(entries, conditions, min_length):
+    trie = Trie(entries)
+    for max_errors in range(3):
+        found = trie.search(conditions, min_length=min_length, max_errors=max_errors)
+        for errors in range(max_errors + 1):
+            expected = [i for i, w in enumerate(entries) if len(w) >= min_length and _violations(w, conditions) == errors]
+            assert sorted(found[errors]) == expected
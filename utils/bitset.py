@@ -0,0 +1,93 @@
+from typing import Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Bitsets over entry ids of a dict, represented as Python ints: bit i is set iff the entry with id i is contained.
+# Python ints are immutable and support &, |, ^ and bit_count in C, so set operations on large dicts are cheap.
+# Note that we never use ~ on its own (the result would be negative); use a & ~b or universe ^ a instead.
+
+_BITS_OF_BYTE: list[list[int]] = [[j for j in range(8) if (b >> j) & 1] for b in range(256)]
+
+
+def from_ids(ids: Iterable[int], size: int) -> int:
+    """
+    creates a bitset from the given ids, which must be in range(size)
+    """
+    if np is not None:
+        return from_id_array(np.fromiter(ids, dtype=np.int64), size)
+    data = bytearray((size >> 3) + 1)
+    for i in ids:
+        data[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(data, "little")
+
+
+def to_ids(bits: int) -> list[int]:
+    """
+    returns the (sorted) list of ids contained in the bitset
+    """
+    if np is not None:
+        return to_id_array(bits).tolist()
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    out = []
+    bits_of_byte = _BITS_OF_BYTE
+    for k in range(len(data)):
+        byte = data[k]
+        if byte:
+            base = k << 3
+            out += [base + j for j in bits_of_byte[byte]]
+    return out
+
+
+def iter_id_chunks(bits: int, chunk_size: int = 1 << 16) -> Iterator[list[int]]:
+    """
+    yields the (sorted) ids contained in the bitset in consecutive chunks, where each chunk covers a range of
+    chunk_size (rounded up to a multiple of 8) possible ids. Empty chunks are skipped.
+    This avoids creating the list of all ids at once.
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    step = max((chunk_size + 7) >> 3, 1)
+    for k in range(0, len(data), step):
+        window = int.from_bytes(data[k:k+step], "little")
+        if window:
+            base = k << 3
+            yield [base + i for i in to_ids(window)]
+
+
+def from_bool_array(mask: "np.ndarray") -> int:
+    """
+    creates a bitset from a numpy boolean array, where mask[i] tells whether i is contained.
+    """
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def to_id_array(bits: int) -> "np.ndarray":
+    """
+    numpy version of to_ids
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, "little")
+    return np.flatnonzero(np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little"))
+
+
+def from_id_array(ids: "np.ndarray", size: int) -> int:
+    """
+    numpy version of from_ids
+    """
+    mask = np.zeros(size, dtype=bool)
+    mask[ids] = True
+    return from_bool_array(mask)
+
+
+def range_bits(start: int, end: int) -> int:
+    """
+    bitset containing exactly start, ..., end - 1
+    """
+    if end <= start:
+        return 0
+    return ((1 << (end - start)) - 1) << start
+
+
+def count(bits: int) -> int:
+    return bits.bit_count()